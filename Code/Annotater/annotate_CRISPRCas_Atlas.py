@@ -1,36 +1,108 @@
+import os
 import time
+from contextlib import ExitStack
 from pathlib import Path
+from Helper import fastaio
+from Helper import jsonio
+from Helper import filter_JSON
+from Helper import json_to_fasta
+from Annotater import annotate_headers
 
 
 def annotate_crispr_cas_atlas(input_file, output_file):
     output_file = Path(output_file)
 
     output_file.parent.mkdir(parents=True, exist_ok=True)
-    output_file.touch(exist_ok=True)
+
+    print(f"Looking at {input_file}")
+    fastaio.write_fasta(_annotated_records(input_file), output_file)
     print(f"{output_file} created.")
 
-    with open(output_file, 'w')as outfile:
-        print(f"{outfile} opened.")
-        #for file in input_file.glob('*.fasta'):
-
-        #for file in input_file:
-        print(f"Looking at {input_file}")
-        with open(input_file, 'r') as infile:
-            print(f"{infile} opened.")
-            for line in infile:
-
-                if line.startswith(">"):
-                    parts = line.split("|")
-                    # accession contains '>' already
-                    accession = parts[0]
-                    gene_name = parts[1]
-                    gene_name = gene_name.split("gene_name=")[1]
-
-                    header = f"{accession}|{gene_name}|CRISPR-Cas_Atlas"
-                    outfile.write(header + "\n")
-                    
-                else:
-                    outfile.write(line)
+
+def annotate_atlas_json(input_file, output_file, keyword="cas12", unfiltered_output_file=None, operon_folder=None, line_length=60, pack_operons=False):
+    """
+    Converts the CRISPR-Cas Atlas JSON directly into annotated FASTA files in a single pass.
+
+    Replaces the chain filter_JSON -> json_to_fasta -> merge_fasta -> filter_JSON_FASTA ->
+    format_fasta -> annotate_crispr_cas_atlas. The atlas is streamed one operon at a time,
+    Type V operons are kept, the Cas proteins are annotated and written wrapped to
+    `line_length`. No intermediate JSON or per-operon files are written unless requested.
+
+    Args:
+        input_file (str or Path): Path to the CRISPR-Cas Atlas JSON file.
+        output_file (str or Path): Annotated FASTA with the proteins whose raw header
+                                   contains `keyword` (case-insensitive).
+        keyword (str): Keyword to search for in the raw headers (default: "cas12").
+        unfiltered_output_file (str or Path): Optional annotated FASTA with all Cas
+                                              proteins of the Type V operons.
+        operon_folder (str or Path): Optional folder for the per-operon FASTA files as
+                                     written by json_to_fasta.json_to_fasta_simple.
+        line_length (int): Maximum characters per sequence line.
+        pack_operons (bool): Write the per-operon side output as one concatenated
+                             FASTA file with an offset index (json_to_fasta.OperonPack)
+                             instead of one file per operon.
+    Returns:
+        int: Number of records written to `output_file`.
+    """
+    outputs = [Path(output_file)]
+    if unfiltered_output_file is not None:
+        outputs.append(Path(unfiltered_output_file))
+    for path in outputs:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    if operon_folder is not None:
+        os.makedirs(operon_folder, exist_ok=True)
+    write_operon_files = operon_folder is not None and not pack_operons
+
+    print(f"Looking at {input_file}")
+    operons = 0
+    with ExitStack() as stack:
+        writers = [stack.enter_context(fastaio.FastaWriter(path, line_length)) for path in outputs]
+        pack = None
+        if operon_folder is not None and pack_operons:
+            pack = stack.enter_context(json_to_fasta.OperonPack(os.path.join(operon_folder, json_to_fasta.PACKED_FILE_NAME)))
+        for entry in jsonio.iter_json_items(input_file):
+            if not filter_JSON.is_type_v(entry):
+                continue
+            records = json_to_fasta.operon_records(entry)
+            if not records:
+                continue
+            operons += 1
+            operon_id = entry.get("operon_id", "unknown_operon")
+            if pack is not None:
+                pack.add(operon_id, records)
+            elif write_operon_files:
+                fastaio.write_fasta(records, os.path.join(operon_folder, f"{operon_id}.fasta"), line_length=None)
+            for header, sequence in records:
+                annotated = annotate_header(header)
+                if keyword in header.lower():
+                    writers[0].write(annotated, sequence)
+                if unfiltered_output_file is not None:
+                    writers[1].write(annotated, sequence)
+
+    print(f"Processed {operons} Type V operons with cas proteins")
+    for path, writer in zip(outputs, writers):
+        print(f"{writer.count} records written to {path}")
+    return writers[0].count
+
+
+def annotate_header(header):
+    """
+    Unifies a CRISPR-Cas Atlas header to 'accession|gene_name|CRISPR-Cas_Atlas',
+    see the 'crispr_cas_atlas' rules in annotate_headers.
+
+    Args:
+        header (str): Header as written by json_to_fasta, without the leading '>'.
+    Returns:
+        str: The unified header.
+    """
+    return annotate_headers.annotate_header("crispr_cas_atlas", header)[0]
+
+
+def _annotated_records(input_file):
+    """
+    Yields the records of a formatted CRISPR-Cas Atlas FASTA file with unified headers.
+    """
+    return annotate_headers.annotated_records("crispr_cas_atlas", input_file)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 import time
 from pathlib import Path
+from Helper import fastaio
+from Annotater import annotate_headers
 
 def annotate_marcus_fasta(input_file, output_file):
     """
@@ -14,32 +16,15 @@ def annotate_marcus_fasta(input_file, output_file):
     output_file = Path(output_file)
 
     output_file.parent.mkdir(parents=True, exist_ok=True)
-    output_file.touch(exist_ok=True)
 
-    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-        for line in infile:
-            line = line.strip()
-            
-            if line.startswith('>'):
-                # Parse the header line
-                # Expected format: >WP_106260488.1 | subtype=cas12k
-                
-                # Split by ' | subtype=' to get accession and subtype
-                if ' | subtype=' in line:
-                    parts = line.split(' | subtype=')
-                    accession = parts[0][1:]  # Remove the '>' character
-                    subtype = parts[1]
-                    
-                    # Create new header format: >accession|subtype|Marcus
-                    new_header = f">{accession}|{subtype}|Marcus"
-                    outfile.write(new_header + '\n')
-                else:
-                    # If header doesn't match expected format, keep original
-                    print(f"Warning: Header doesn't match expected format: {line}")
-                    outfile.write(line + '\n')
-            else:
-                # Write sequence lines unchanged
-                outfile.write(line + '\n')
+    fastaio.write_fasta(_annotated_records(input_file), output_file)
+
+def _annotated_records(input_file):
+    """
+    Yields the records of a formatted Marcus FASTA file with unified headers,
+    see the 'marcus' rules in annotate_headers.
+    """
+    return annotate_headers.annotated_records("marcus", input_file)
 
 
 if __name__ == "__main__":
@@ -1,17 +1,34 @@
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pandas as pd
-from Bio import SeqIO
+from Helper import fastaio
+from Annotater import annotate_headers
+
+# Maps cas subtypes. Source: Classification and Nomenclature of CRISPR-Cas Systems: Where from Here?
+CAS12_MAP = {
+    "CAS-V-A": "Cas12a",
+    "CAS-V-B": "Cas12b",
+    "CAS-V-C": "Cas12c",
+    "CAS-V-D": "Cas12d",
+    "CAS-V-E": "Cas12e",
+    "CAS-V-F": "Cas12f"
+}
+
+# Subtype mapping of the worker processes, set once per worker by _init_worker
+_worker_mapping = None
 
 def load_subtype_mapping(csv_path):
+    """
+    Builds the accession -> Cas12 subtype mapping from the cassette summary CSV
+    (accession in the first, subtype in the seventh column) with column operations.
+    Later rows win over earlier rows with the same accession.
+    """
     dataframe = pd.read_csv(csv_path)
-    mapping = {}
-    for _, row in dataframe.iterrows():
-        accession = str(row.iloc[0])
-        subtype_raw = str(row.iloc[6])
-        subtype_mapped = detect_cas_subtype(subtype_raw)
-        mapping[accession] = subtype_mapped
-    return mapping
+    accessions = dataframe.iloc[:, 0].astype(str)
+    subtypes = dataframe.iloc[:, 6].astype(str).map(CAS12_MAP).fillna("Unknown")
+    return dict(zip(accessions, subtypes))
 
 def extract_accession_number(sequence_id: str) -> str:
     """
@@ -25,51 +42,92 @@ def detect_cas_subtype(title: str) -> str:
     """
     Maps cas subtypes. Source: Classification and Nomenclature of CRISPR-Cas Systems: Where from Here?
     """
-    cas12_map = {
-    "CAS-V-A": "Cas12a",
-    "CAS-V-B": "Cas12b",
-    "CAS-V-C": "Cas12c",
-    "CAS-V-D": "Cas12d",
-    "CAS-V-E": "Cas12e",
-    "CAS-V-F": "Cas12f"
-}
-    if title in cas12_map:
-        return cas12_map[title]
-    else:
-        return "Unknown"
+    return CAS12_MAP.get(title, "Unknown")
 
-def process_fasta_file(fasta_file, csv_file, output_dir):
-    """"""
+def process_fasta_file(fasta_file, csv_file, output_dir, subtype_mapping=None):
+    """
+    Annotates one NCBI .faa file with the subtypes of the cassette summary CSV.
+
+    Args:
+        fasta_file (str or Path): Path to the .faa file.
+        csv_file (str or Path): Path to the cassette summary CSV. Only read if
+                                subtype_mapping is not given.
+        output_dir (str or Path): Output folder for '<stem>_subtyped.fasta'.
+        subtype_mapping (dict): Mapping from load_subtype_mapping, to build it only
+                                once for many files.
+    Returns:
+        tuple: (number of records, number of records whose accession was not found)
+    """
     print(f"\nProcessing file: {fasta_file}")
-    print(f"Using {csv_file} for mapping.")
 
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    subtype_mapping= load_subtype_mapping(csv_file)
-    print(f"Loaded {len(subtype_mapping)} entries from {csv_file}")
+    if subtype_mapping is None:
+        print(f"Using {csv_file} for mapping.")
+        subtype_mapping = load_subtype_mapping(csv_file)
+        print(f"Loaded {len(subtype_mapping)} entries from {csv_file}")
 
-    records = list(SeqIO.parse(fasta_file, "fasta"))
     output_file = output_dir / (Path(fasta_file).stem + "_subtyped.fasta")
 
-    annotated_records = []
+    not_found = [0]
+    written = fastaio.write_fasta(_annotated_records(fasta_file, subtype_mapping, not_found), output_file)
+    print(f"Annotated FASTA saved: {output_file} ({written} records, {not_found[0]} accessions not found in CSV)")
+    return written, not_found[0]
+
+def process_fasta_files(fasta_files, csv_file, output_dir, subtype_mapping=None, workers=None):
+    """
+    Annotates many NCBI .faa files in a process pool. The subtype mapping is built
+    once and handed to every worker process once, not per file.
+
+    Args:
+        fasta_files (iterable): Paths to the .faa files.
+        csv_file (str or Path): Path to the cassette summary CSV. Only read if
+                                subtype_mapping is not given.
+        output_dir (str or Path): Output folder for the annotated files.
+        subtype_mapping (dict): Mapping from load_subtype_mapping.
+        workers (int): Number of files processed in parallel (default: number of CPUs).
+    Returns:
+        tuple: (number of records, number of records whose accession was not found)
+    """
+    fasta_files = list(fasta_files)
+    if subtype_mapping is None:
+        subtype_mapping = load_subtype_mapping(csv_file)
+        print(f"Loaded {len(subtype_mapping)} entries from {csv_file}")
+
+    workers = min(workers or os.cpu_count() or 1, max(len(fasta_files), 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(subtype_mapping,)) as executor:
+        results = list(executor.map(_process_worker_file, fasta_files, [output_dir] * len(fasta_files)))
 
-    for record in records:
-        accession = extract_accession_number(record.id)
+    written = sum(result[0] for result in results)
+    not_found = sum(result[1] for result in results)
+    print(f"Annotated {written} records in {len(fasta_files)} files, {not_found} accessions not found in CSV")
+    return written, not_found
 
-        if accession in subtype_mapping:
-            subtype = subtype_mapping[accession]
-            print(f"Found {accession} -> {subtype}")
-        else:
-            subtype = "NotFound"
-            print(f"Accession {accession} not found in CSV")
+def process_fasta_folder(fasta_folder, csv_file, output_dir, subtype_mapping=None, workers=None):
+    """
+    Annotates all .faa files of a folder, see process_fasta_files. The folder is
+    listed when the function runs, so it can be the output of an earlier pipeline step.
+    """
+    return process_fasta_files(sorted(Path(fasta_folder).glob("*.faa")), csv_file, output_dir, subtype_mapping, workers)
 
-        record.id = f"{accession}|{subtype}|NCBI"
-        record.description = ""
-        annotated_records.append(record)
+def _init_worker(subtype_mapping):
+    global _worker_mapping
+    _worker_mapping = subtype_mapping
 
-    SeqIO.write(annotated_records, output_file, "fasta")
-    print(f"Annotated FASTA saved: {output_file}")
+def _process_worker_file(fasta_file, output_dir):
+    return process_fasta_file(fasta_file, None, output_dir, _worker_mapping)
+
+def _annotated_records(fasta_file, subtype_mapping, not_found):
+    """
+    Yields the records of an NCBI .faa file with headers of the form accession|subtype|NCBI,
+    see the 'ncbi' rules in annotate_headers.
+    Accessions missing from the mapping get the subtype 'NotFound' and are counted in not_found[0].
+    """
+    state = {"subtype_mapping": subtype_mapping}
+    for header, sequence in fastaio.read_fasta(fasta_file):
+        yield annotate_headers.annotate_header("ncbi", header, state)[0], sequence
+    not_found[0] = state.get("not_found", 0)
 
 if __name__ == "__main__":
     # Record start time for performance tracking
@@ -81,8 +139,7 @@ if __name__ == "__main__":
     csv_file = "../DB/NCBI/Complete_Cassette_summary.csv"
     output_dir=f"../DB/NCBI/NCBI_subtyped/"
 
-    for fasta_file in Path(fasta_folder).glob("*.faa"):
-        process_fasta_file(fasta_file, csv_file, output_dir)
+    process_fasta_files(Path(fasta_folder).glob("*.faa"), csv_file, output_dir)
 
     # Calculate and display execution time
     end_time = time.time()
@@ -0,0 +1,235 @@
+import csv
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from Helper import fastaio
+
+# =============================================================================
+# HEADER RULES
+# =============================================================================
+# Every source is a list of (compiled pattern, build function) rules. The first
+# rule whose pattern matches the header (re.search) builds the unified fields
+# (accession, subtype, source) from the match, the header and the per-file state.
+# A build function returning None keeps the original header unchanged.
+
+MATCH_ALL = re.compile(r"")
+ATLAS_HEADER = re.compile(r"^(?P<accession>[^|]*)\|[^|]*?gene_name=(?P<subtype>[^|]*)")
+MARCUS_HEADER = re.compile(r"^(?P<accession>.*?) \| subtype=(?P<subtype>.*?)(?: \| subtype=|$)")
+CASPEDIA_BLAST_HEADER = re.compile(r"subject_sequence_id=")
+CASPEDIA_HIT_HEADER = re.compile(r"^hit")
+UNIPROT_CAS12 = re.compile(r"cas12([a-zA-Z])", re.IGNORECASE)
+
+
+def _atlas(match, header, state):
+    # Expected format: >id|gene_name=cas12a|length=...|...
+    return match.group("accession"), match.group("subtype"), "CRISPR-Cas_Atlas"
+
+
+def _marcus(match, header, state):
+    # Expected format: >WP_106260488.1 | subtype=cas12k
+    return match.group("accession"), match.group("subtype"), "Marcus"
+
+
+def _unmatched(match, header, state):
+    # If header doesn't match expected format, keep original
+    print(f"Warning: Header doesn't match expected format: >{header}")
+    return None
+
+
+def _caspedia_blast(match, header, state):
+    parts = header.split('|')
+    return parts[1].split('=')[1], parts[2].split('=')[1], parts[17]
+
+
+def _caspedia_hit(match, header, state):
+    parts = header.split('|')
+    return parts[3], "no_gene_name", parts[10]
+
+
+def _caspedia_other(match, header, state):
+    parts = header.split('|')
+    # Entries without accession are numbered per file
+    state["accession_number_counter"] = state.get("accession_number_counter", 0) + 1
+    accession = "no_accession_number" + str(state["accession_number_counter"])
+    gene_name = "TnpB" if "TnpB" in header else parts[0]
+    return accession, gene_name, parts[1]
+
+
+def _uniprot(match, header, state):
+    parts = header.split("|")
+    database = parts[0]
+    accession = parts[1]
+
+    gene_name = None
+    if "GN=" in header:
+        gene_part = header.split("GN=")[1]
+        if "cas12" in gene_part.lower():
+            gene_name = gene_part.split("|")[0]
+    if gene_name is None and "cas12" in header.lower():
+        subtype_match = UNIPROT_CAS12.search(header)
+        gene_name = "Cas12" + subtype_match.group(1) if subtype_match else "Cas12"
+
+    if gene_name is None:
+        gene_name = "no_subtype_found"
+        print(f"{accession}, subtype not found.")
+
+    return accession, gene_name, f"uniprot_{database}"
+
+
+def _ncbi(match, header, state):
+    # Example: AE000511_330588_330872 -> AE000511
+    record_id = header.split(maxsplit=1)[0] if header else ""
+    accession = record_id.split('_')[0]
+    subtype = state["subtype_mapping"].get(accession)
+    if subtype is None:
+        subtype = "NotFound"
+        state["not_found"] = state.get("not_found", 0) + 1
+    return accession, subtype, "NCBI"
+
+
+SOURCES = {
+    "crispr_cas_atlas": [(ATLAS_HEADER, _atlas), (MATCH_ALL, _unmatched)],
+    "marcus": [(MARCUS_HEADER, _marcus), (MATCH_ALL, _unmatched)],
+    "caspedia": [
+        (CASPEDIA_BLAST_HEADER, _caspedia_blast),
+        (CASPEDIA_HIT_HEADER, _caspedia_hit),
+        (MATCH_ALL, _caspedia_other),
+    ],
+    "uniprot": [(MATCH_ALL, _uniprot)],
+    # Needs 'subtype_mapping' (accession -> subtype) in the context, see annotate_NCBI
+    "ncbi": [(MATCH_ALL, _ncbi)],
+}
+
+# Columns of the metadata side table
+METADATA_COLUMNS = ["accession", "subtype", "source", "original_header"]
+
+
+# =============================================================================
+# ENGINE
+# =============================================================================
+
+def annotate_header(source, header, state=None):
+    """
+    Unifies one header to 'accession|subtype|source' with the rules of a source.
+
+    Args:
+        source (str): Key of SOURCES.
+        header (str): Header without the leading '>'.
+        state (dict): Per-file state of the rules (counters, context like the
+                      NCBI subtype mapping). A new one is used if not given.
+    Returns:
+        tuple: (unified header, (accession, subtype, source)). The fields are None
+               if the header was kept unchanged.
+    """
+    state = {} if state is None else state
+    for pattern, build in SOURCES[source]:
+        match = pattern.search(header)
+        if match is not None:
+            fields = build(match, header, state)
+            if fields is None:
+                return header, None
+            return "|".join(fields), fields
+    return header, None
+
+
+def annotated_records(source, input_file, context=None, metadata=None):
+    """
+    Streams the records of a FASTA file with unified headers.
+
+    Args:
+        source (str): Key of SOURCES.
+        input_file (str or Path): Path to the FASTA file.
+        context (dict): Extra state for the rules, e.g. {'subtype_mapping': ...} for 'ncbi'.
+        metadata (csv.writer): Optional writer receiving one METADATA_COLUMNS row per record.
+    Returns:
+        generator: Generator of (header, sequence) tuples.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Unknown annotation source '{source}', expected one of {sorted(SOURCES)}")
+    state = dict(context or {})
+    for header, sequence in fastaio.read_fasta(input_file):
+        unified, fields = annotate_header(source, header, state)
+        if metadata is not None:
+            metadata.writerow(list(fields or ("", "", "")) + [header])
+        yield unified, sequence
+
+
+def annotate_file(source, input_file, output_file, metadata_file=None, context=None):
+    """
+    Writes a FASTA file with unified headers in one streaming pass.
+
+    Args:
+        source (str): Key of SOURCES.
+        input_file (str or Path): Path to the input FASTA file.
+        output_file (str or Path): Path to the annotated FASTA file.
+        metadata_file (str or Path): Optional TSV side table with the parsed fields
+                                     and the original header of every record.
+        context (dict): Extra state for the rules, see annotated_records.
+    Returns:
+        int: Number of records written.
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    if metadata_file is None:
+        return fastaio.write_fasta(annotated_records(source, input_file, context), output_file)
+
+    metadata_file = Path(metadata_file)
+    metadata_file.parent.mkdir(parents=True, exist_ok=True)
+    with fastaio.atomic_output(metadata_file) as temp_file, open(temp_file, "w", newline="", encoding="utf-8") as handle:
+        metadata = csv.writer(handle, delimiter="\t")
+        metadata.writerow(METADATA_COLUMNS)
+        return fastaio.write_fasta(annotated_records(source, input_file, context, metadata), output_file)
+
+
+def annotate_files(jobs, workers=None, context=None):
+    """
+    Annotates any number of FASTA files from any sources concurrently, one
+    streaming pass per file.
+
+    Args:
+        jobs (list): List of (source, input_file, output_file) or
+                     (source, input_file, output_file, metadata_file) tuples.
+        workers (int): Number of files processed in parallel (default: number of CPUs).
+        context (dict): Extra state for the rules, shared by all jobs.
+    Returns:
+        list: Number of records written per job.
+    """
+    jobs = [tuple(job) + (None,) * (4 - len(job)) for job in jobs]
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(annotate_file, source, input_file, output_file, metadata_file, context)
+            for source, input_file, output_file, metadata_file in jobs
+        ]
+        counts = []
+        for (source, input_file, output_file, _), future in zip(jobs, futures):
+            counts.append(future.result())
+            print(f"{counts[-1]} {source} records from {input_file} unified to {output_file}")
+    return counts
+
+
+if __name__ == "__main__":
+    # Record start time for performance tracking
+    start_time = time.time()
+
+    annotate_files([
+        ("marcus", "../FASTA/Marcus_File/marcus_file_formatted.fasta", "../FASTA/Marcus_File/marcus_annotated.fasta"),
+    ])
+
+    # Calculate and display execution time
+    end_time = time.time()
+    elapsed_time = int(end_time - start_time)
+
+    # Format elapsed time as hh:mm:ss
+    hours, remainder = divmod(elapsed_time, 3600)
+    minutes, seconds = divmod(remainder, 60)
+
+    # Print execution summary
+    print(f"Start Time: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}")
+    print(f"End Time: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}\n")
+    print("--------------------------------------------------------------------------------")
+    print (f"Finished total time: {hours:02d}:{minutes:02d}:{seconds:02d}")
+    print("--------------------------------------------------------------------------------")
@@ -1,56 +1,21 @@
 import time
 from pathlib import Path
-import re
+from Helper import fastaio
+from Annotater import annotate_headers
 
 def annotate_uniprot_fasta(input_file, output_file):
 
     output_file.parent.mkdir(parents=True, exist_ok=True)
-    output_file.touch(exist_ok=True)
 
-    with open(output_file, 'w') as outfile:
-            with open(input_file, 'r') as infile:
-                for line in infile:
-                    line = line.strip()
+    fastaio.write_fasta(_annotated_records(input_file), output_file)
 
-                    if line.startswith(">"):
-                        parts = line.split("|")
-
-                        database = parts[0][1:]
-                        accession = parts[1]
-
-                        if "GN=" in line:
-                            parts = line.split("GN=")[1]
-                            if "cas12" in parts.lower():
-                                gene_name = parts.split("|")[0]
-
-                                header = f">{accession}|{gene_name}|uniprot_{database}"
-                                outfile.write(header + '\n')
-                            else:
-                                if "cas12" in line.lower():
-                                    match = re.search(r'cas12([a-zA-Z])', line, re.IGNORECASE)
-                                    if match:
-                                        gene_name = "Cas12" + match.group(1)
-                                    else:
-                                        gene_name = "Cas12"
-
-                                    header = f">{accession}|{gene_name}|uniprot_{database}"
-                                    outfile.write(header + '\n')
-                        elif "cas12" in line.lower():
-                            match = re.search(r'cas12([a-zA-Z])', line, re.IGNORECASE)
-                            if match:
-                                gene_name = "Cas12" + match.group(1)
-                            else:
-                                gene_name = "Cas12"
-
-                            header = f">{accession}|{gene_name}|uniprot_{database}"
-                            outfile.write(header + '\n')
-                        else:
-                            header = f">{accession}|no_subtype_found|uniprot_{database}"
-                            outfile.write(header + '\n')
-                            print(f"{accession}, subtype not found.")
-
-                    else:
-                        outfile.write(line + '\n')
+def _annotated_records(input_file):
+    """
+    Yields the records of a formatted UniProt FASTA file with unified headers,
+    see the 'uniprot' rules in annotate_headers.
+    Records without a recognizable Cas12 subtype are annotated as 'no_subtype_found'.
+    """
+    return annotate_headers.annotated_records("uniprot", input_file)
 
 if __name__ == "__main__":
     # Record start time for performance tracking
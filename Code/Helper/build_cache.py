@@ -0,0 +1,164 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+from pathlib import Path
+from Helper import fasta_index
+from Helper import fastaio
+
+# Packages of the repository whose modules are part of a task's code
+LOCAL_PACKAGES = ("Helper", "Annotater")
+# Files larger than this (bytes) are fingerprinted by size and modification time instead of their content
+HASH_LIMIT = 64 * 1024 * 1024
+
+
+def code_files(function):
+    """
+    Returns the source files a task function depends on: the file of its module
+    and of every Helper or Annotater module reachable from it through imported
+    modules, functions and classes.
+
+    Args:
+        function (callable): Task function.
+    Returns:
+        list: Sorted source file paths (empty for builtins).
+    """
+    start = inspect.getmodule(function)
+    if start is None or getattr(start, "__file__", None) is None:
+        return []
+    seen = {start.__name__: start}
+    queue = [start]
+    while queue:
+        module = queue.pop()
+        for value in list(vars(module).values()):
+            used = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+            if (used is None or used.__name__ in seen or getattr(used, "__file__", None) is None
+                    or used.__name__.split(".")[0] not in LOCAL_PACKAGES):
+                continue
+            seen[used.__name__] = used
+            queue.append(used)
+    return sorted(module.__file__ for module in seen.values())
+
+
+class BuildCache:
+    """
+    Remembers which pipeline tasks have been run with which inputs and parameters,
+    so tasks whose fingerprint did not change can be skipped.
+
+    The fingerprint of a task covers the function (name, and the source files of
+    its module and of all Helper and Annotater modules it uses), its arguments (e.g. pe_threshold, keyword, line_length) and the content of all
+    input files. File contents are hashed with SHA-256; the hashes are cached in
+    the manifest together with size and modification time, so unchanged files are
+    not read again. Files above `hash_limit` (raw downloads, merged FASTA files)
+    are only fingerprinted by size and modification time: the fingerprints are
+    computed in the scheduler loop of TaskGraph, where reading gigabytes would
+    hold up all other tasks. Touching such a file reruns the tasks reading it.
+    A task is current if its fingerprint matches the manifest and all its
+    outputs still exist unchanged.
+
+    Args:
+        manifest_file (str or Path): JSON manifest, created if it does not exist.
+        hash_limit (int): Size in bytes up to which files are hashed by content.
+                          None hashes every file by content.
+    """
+
+    def __init__(self, manifest_file, hash_limit=HASH_LIMIT):
+        self.manifest_file = Path(manifest_file)
+        self.hash_limit = hash_limit
+        self.hashes = {}
+        self.tasks = {}
+        if self.manifest_file.exists():
+            with open(self.manifest_file, "r", encoding="utf-8") as handle:
+                manifest = json.load(handle)
+            self.hashes = manifest.get("hashes", {})
+            self.tasks = manifest.get("tasks", {})
+
+    def file_digest(self, path):
+        """
+        Returns the content hash of a file or folder, or None if it does not exist.
+        A folder is hashed over the relative paths and hashes of all files below it,
+        except the record indexes that readers write next to FASTA files (fasta_index).
+        Files above `hash_limit` get "size:mtime" instead of a content hash.
+        """
+        path = Path(path)
+        if path.is_dir():
+            digest = hashlib.sha256()
+            for file_path in sorted(p for p in path.rglob("*") if p.is_file() and p.suffix != fasta_index.INDEX_SUFFIX):
+                digest.update(str(file_path.relative_to(path)).encode())
+                digest.update(self.file_digest(file_path).encode())
+            return digest.hexdigest()
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if self.hash_limit is not None and stat.st_size > self.hash_limit:
+            return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+        key = str(path.resolve())
+        cached = self.hashes.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(fastaio.BLOCK_SIZE), b""):
+                digest.update(block)
+        self.hashes[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprint(self, task):
+        """
+        Computes the fingerprint of a task from its function, arguments and inputs.
+
+        Returns:
+            str: Hex digest, or None if an input is missing.
+        """
+        function = task.function
+        parts = [
+            f"{function.__module__}.{function.__qualname__}",
+            *(f"{source}={self.file_digest(source)}" for source in code_files(function)),
+            repr(task.args),
+            repr(sorted(task.kwargs.items())),
+        ]
+        for path in task.inputs:
+            digest = self.file_digest(path)
+            if digest is None:
+                return None
+            parts.append(f"{path}={digest}")
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def is_current(self, task, fingerprint):
+        """
+        Checks whether a task was already run with this fingerprint and its outputs
+        are unchanged since.
+        """
+        entry = self.tasks.get(task.name)
+        if fingerprint is None or entry is None or entry["fingerprint"] != fingerprint:
+            return False
+        return all(
+            self.file_digest(path) == entry["outputs"].get(str(path))
+            for path in task.outputs
+        )
+
+    def record(self, task, fingerprint):
+        """Stores the fingerprint and output hashes of a finished task and saves the manifest."""
+        if fingerprint is None:
+            return
+        self.tasks[task.name] = {
+            "fingerprint": fingerprint,
+            "outputs": {str(path): self.file_digest(path) for path in task.outputs},
+        }
+        self.save()
+
+    def forget(self, task):
+        """Removes a task from the manifest, e.g. after it failed."""
+        if self.tasks.pop(task.name, None) is not None:
+            self.save()
+
+    def save(self):
+        """Writes the manifest; a temporary file is renamed so the manifest is never half written."""
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.manifest_file.with_name(self.manifest_file.name + ".tmp")
+        with open(temp_file, "w", encoding="utf-8") as handle:
+            json.dump({"hashes": self.hashes, "tasks": self.tasks}, handle, indent=1)
+        os.replace(temp_file, self.manifest_file)
@@ -1,30 +1,117 @@
-import time
 import re
+import time
 from pathlib import Path
+from Helper import compressed_io
+from Helper import fastaio
+
+# Editable alias map next to this module
+ALIAS_FILE = Path(__file__).with_name("cas_aliases.tsv")
+# Cas12 variant kept from a translated header (e.g. Cas12f, Cas12m, ...)
+CAS12_VARIANT = re.compile(r"Cas12[a-zA-Z]")
+
+
+def load_aliases(alias_file=ALIAS_FILE):
+    """
+    Loads the alias map from a tab-separated file with one '<alias>\t<replacement>'
+    pair per line. Empty lines and lines starting with '#' are ignored.
+
+    Args:
+        alias_file (str or Path): Path to the alias file.
+    Returns:
+        dict: Mapping lowercase alias -> replacement.
+    """
+    aliases = {}
+    with open(alias_file, "r", encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split("\t")
+            if len(fields) != 2 or not fields[0]:
+                raise ValueError(f"{alias_file}:{line_number}: expected '<alias>\\t<replacement>', got {line!r}")
+            aliases[fields[0].lower()] = fields[1]
+    return aliases
+
+
+def compile_aliases(aliases):
+    """
+    Compiles an alias map into one alternation and a dispatch table.
 
-def translator(input_file: str, output_file: str):
+    Args:
+        aliases (dict): Mapping lowercase alias -> replacement.
+    Returns:
+        tuple: (alias pattern, dispatch table). The alias pattern matches every
+               alias case-insensitively at the start of a word, longest alias
+               first, so e.g. 'U1' inside an accession like A0A2U1ABC4 is left alone.
+    """
+    names = sorted(aliases, key=len, reverse=True)
+    alias_pattern = re.compile(
+        r"(?<![A-Za-z0-9])(?:" + "|".join(map(re.escape, names)) + r")",
+        re.IGNORECASE,
+    )
+    return alias_pattern, aliases
 
+
+def translate_header(header, compiled):
+    """
+    Translates the Cas names of one header and reduces it to the Cas12 variant if
+    one is found.
+
+    Args:
+        header (str): Header line without the leading '>' and line break.
+        compiled (tuple): Result of compile_aliases.
+    Returns:
+        str: The Cas12 variant, or the header with its aliases replaced.
+    """
+    alias_pattern, table = compiled
+    header = alias_pattern.sub(lambda match: table[match.group().lower()], header)
+    match = CAS12_VARIANT.search(header)
+    return match.group() if match else header
+
+
+def translator(input_file: str, output_file: str, alias_file=ALIAS_FILE):
+    """
+    Streams a FASTA file and translates old Cas names in its headers with the alias
+    map. Headers containing a Cas12 variant are reduced to it; sequence lines are
+    copied unchanged.
+
+    Args:
+        input_file (str or Path): Path to the input FASTA file.
+        output_file (str or Path): Path to the translated FASTA file.
+        alias_file (str or Path): Path to the alias map (default: cas_aliases.tsv).
+    Returns:
+        int: Number of records written.
+    """
+    output_file = Path(output_file)
     output_file.parent.mkdir(parents=True, exist_ok=True)
+    compiled = compile_aliases(load_aliases(alias_file))
+
+    count = 0
+    chunk = []
+    chunk_size = 0
+    texts = fastaio.iter_record_texts(fastaio.read_blocks(input_file))
+    compression = compressed_io.from_suffix(output_file)
+    with fastaio.atomic_output(output_file) as temp_file, compressed_io.open_text_output(temp_file, compression) as outfile:
+        # Lines in front of the first header are copied unchanged
+        # Record texts end without the line break in front of the next header
+        preamble = next(texts)[1:]
+        if preamble and not preamble.endswith("\n"):
+            preamble += "\n"
+        chunk.append(preamble)
+        for text in texts:
+            header, _, body = text.partition("\n")
+            if body and not body.endswith("\n"):
+                body += "\n"
+            chunk.append(f">{translate_header(header, compiled)}\n{body}")
+            chunk_size += len(body)
+            count += 1
+            if chunk_size >= fastaio.BLOCK_SIZE:
+                outfile.write("".join(chunk))
+                chunk = []
+                chunk_size = 0
+        outfile.write("".join(chunk))
+    return count
 
-    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-        for line in infile:
-            if line.startswith('>'):
-                line = re.sub(r'cas14', 'Cas12f', line, flags=re.IGNORECASE)
-                line = re.sub(r'u1', 'Cas12m', line, flags=re.IGNORECASE)
-                line = re.sub(r'u2', 'Cas12u2', line, flags=re.IGNORECASE)
-                line = re.sub(r'u3', 'Cas12u3', line, flags=re.IGNORECASE)
-                line = re.sub(r'u4', 'Cas12n', line, flags=re.IGNORECASE)
-                line = re.sub(r'u5', 'Cas12k', line, flags=re.IGNORECASE)
-                line = re.sub(r'tnpb', 'TnpB', line, flags=re.IGNORECASE)
-                # Keep only the Cas12 variant (e.g. Cas12f, Cas12m, ...)
-                match = re.search(r'(Cas12[a-zA-Z])', line)
-                if match:
-                    line = match.group(1) + '\n'
-                    outfile.write(">" + line)
-                else:
-                    outfile.write(line)
-            else:
-                outfile.write(line)
 
 if __name__ == "__main__":
     start_time = time.time()
@@ -42,4 +129,4 @@ if __name__ == "__main__":
     print(f"End Time: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}\n")
     print("--------------------------------------------------------------------------------")
     print(f"Finished total time: {hours:02d}:{minutes:02d}:{seconds:02d}")
-    print("--------------------------------------------------------------------------------")
\ No newline at end of file
+    print("--------------------------------------------------------------------------------")
@@ -0,0 +1,116 @@
+import json
+import os
+import time
+from pathlib import Path
+
+
+class CheckpointJournal:
+    """
+    Append-only journal of a pipeline run, used to resume a run after a failure.
+
+    Every run starts with a 'start' entry, every successful task adds a 'done'
+    entry with the size and modification time of its outputs and a finished run
+    ends with a 'complete' entry. Each entry is one JSON line that is flushed and
+    fsynced before the next task starts, so the journal survives a crash.
+
+    If the last run did not complete, the next run resumes it: tasks that are
+    journaled as done and whose outputs are still exactly as written are not run
+    again. Stage outputs are written atomically (see fastaio.atomic_output), so an
+    existing output is always complete.
+
+    Args:
+        journal_file (str or Path): JSON Lines journal, created if it does not exist.
+    """
+
+    def __init__(self, journal_file):
+        self.journal_file = Path(journal_file)
+        self.done = {}
+        self.resumed = False
+        self._handle = None
+
+    def open(self, fresh=False):
+        """
+        Opens the journal for a run.
+
+        Args:
+            fresh (bool): Start a new run even if the last one did not complete.
+        Returns:
+            bool: True if an unfinished run is resumed.
+        """
+        entries = [] if fresh else self._read()
+        unfinished = entries and entries[0]["event"] == "start" and entries[-1]["event"] != "complete"
+        self.done = {entry["task"]: entry["outputs"] for entry in entries if entry["event"] == "done"} if unfinished else {}
+        self.resumed = bool(unfinished)
+
+        self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = open(self.journal_file, "a" if self.resumed else "w", encoding="utf-8")
+        self._append({"event": "resume" if self.resumed else "start"})
+        return self.resumed
+
+    def is_done(self, task):
+        """Checks whether the resumed run already finished a task and its outputs are unchanged."""
+        outputs = self.done.get(task.name)
+        if outputs is None or None in outputs.values():
+            return False
+        return outputs == _output_stats(task.outputs)
+
+    def task_done(self, task):
+        """Journals a successful task together with the state of its outputs."""
+        self.done[task.name] = _output_stats(task.outputs)
+        self._append({"event": "done", "task": task.name, "outputs": self.done[task.name]})
+
+    def task_failed(self, task, reason):
+        """Journals a failed task. It is run again when the pipeline is resumed."""
+        self.done.pop(task.name, None)
+        self._append({"event": "failed", "task": task.name, "reason": reason})
+
+    def close(self, complete):
+        """
+        Closes the journal.
+
+        Args:
+            complete (bool): All tasks finished, the next run starts from scratch.
+        """
+        if complete:
+            self._append({"event": "complete"})
+        self._handle.close()
+        self._handle = None
+
+    def _append(self, entry):
+        entry["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        self._handle.write(json.dumps(entry) + "\n")
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def _read(self):
+        if not self.journal_file.exists():
+            return []
+        entries = []
+        with open(self.journal_file, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash while writing leaves at most the last line incomplete
+                    break
+        return entries
+
+
+def _output_stats(outputs):
+    """
+    Returns [size, mtime_ns] of every output file, or None for a missing output.
+    A folder is described by the stats of all files below it.
+    """
+    stats = {}
+    for path in outputs:
+        if path.is_dir():
+            stats[str(path)] = sorted(
+                [str(file_path.relative_to(path)), file_path.stat().st_size, file_path.stat().st_mtime_ns]
+                for file_path in path.rglob("*") if file_path.is_file()
+            )
+        elif path.exists():
+            stat = path.stat()
+            stats[str(path)] = [stat.st_size, stat.st_mtime_ns]
+        else:
+            stats[str(path)] = None
+    return stats
@@ -0,0 +1,218 @@
+import gzip
+import io
+import os
+import shutil
+import struct
+import subprocess
+import zlib
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .zst files if the zstd tool is not installed
+    zstandard = None
+
+# Magic numbers at the start of compressed files
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Output compression chosen from the file name
+SUFFIXES = {".gz": "gzip", ".bgz": "bgzip", ".zst": "zstd"}
+# Largest uncompressed block of a BGZF file (as written by bgzip)
+BGZF_BLOCK_SIZE = 0xff00
+# Empty BGZF block marking the end of a BGZF file
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def sniff(input_file):
+    """
+    Detects the compression of a file from its first bytes, independent of its name.
+
+    Args:
+        input_file (str or Path): Path to the file.
+    Returns:
+        str: 'gzip', 'bgzip' (gzip made of BGZF blocks), 'zstd' or None for plain files.
+    """
+    with open(input_file, "rb") as handle:
+        head = handle.read(16)
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    if head.startswith(GZIP_MAGIC):
+        # BGZF: FEXTRA flag set and a 'BC' extra subfield
+        if len(head) >= 14 and head[3] & 4 and head[12:14] == b"BC":
+            return "bgzip"
+        return "gzip"
+    return None
+
+
+def from_suffix(output_file):
+    """Returns the compression implied by the suffix of a file name, or None."""
+    return SUFFIXES.get(Path(output_file).suffix.lower())
+
+
+def threads():
+    """Number of threads handed to the (de)compression tools."""
+    return os.cpu_count() or 1
+
+
+def open_input(input_file):
+    """
+    Opens a plain or compressed file for reading bytes.
+
+    Compressed files are decompressed on the fly: by pigz, bgzip or zstd in a
+    separate process if the tool is installed (pigz and bgzip use several threads),
+    otherwise in Python with gzip or zstandard.
+
+    Args:
+        input_file (str or Path): Path to the file.
+    Returns:
+        file object: Binary stream of the decompressed content.
+    """
+    kind = sniff(input_file)
+    if kind is None:
+        return open(input_file, "rb")
+    if kind == "bgzip" and shutil.which("bgzip"):
+        return io.BufferedReader(_ProcessStream(["bgzip", "-@", str(threads()), "-dc", str(input_file)]))
+    if kind in ("gzip", "bgzip"):
+        if shutil.which("pigz"):
+            return io.BufferedReader(_ProcessStream(["pigz", "-dc", str(input_file)]))
+        return gzip.open(input_file, "rb")
+    if shutil.which("zstd"):
+        return io.BufferedReader(_ProcessStream(["zstd", "-dcq", str(input_file)]))
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(open(input_file, "rb"), closefd=True, read_across_frames=True)
+    raise RuntimeError(f"{input_file} is zstd compressed, but neither the zstd tool nor the zstandard module is available")
+
+
+def open_output(output_file, compression=None, mode="w"):
+    """
+    Opens a file for writing bytes, optionally compressed.
+
+    Appending to a compressed file adds a new gzip member or zstd frame, which
+    every decompressor reads as continuation of the file.
+
+    Args:
+        output_file (str or Path): Path to the file.
+        compression (str): 'gzip', 'bgzip', 'zstd' or None for a plain file.
+        mode (str): 'w' to overwrite or 'a' to append.
+    Returns:
+        file object: Binary stream; the data is compressed when it is written.
+    """
+    if compression is None:
+        return open(output_file, f"{mode}b")
+    if compression == "gzip":
+        if shutil.which("pigz"):
+            return io.BufferedWriter(_ProcessStream(["pigz", "-p", str(threads()), "-c"], output_file, mode))
+        return gzip.open(output_file, f"{mode}b", compresslevel=6)
+    if compression == "bgzip":
+        if shutil.which("bgzip"):
+            return io.BufferedWriter(_ProcessStream(["bgzip", "-@", str(threads()), "-c"], output_file, mode))
+        return io.BufferedWriter(_BgzfWriter(open(output_file, f"{mode}b")))
+    if compression == "zstd":
+        if shutil.which("zstd"):
+            return io.BufferedWriter(_ProcessStream(["zstd", f"-T{threads()}", "-cq"], output_file, mode))
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(threads=-1).stream_writer(open(output_file, f"{mode}b"), closefd=True)
+        raise RuntimeError(f"Cannot write {output_file}: neither the zstd tool nor the zstandard module is available")
+    raise ValueError(f"Unknown compression '{compression}', expected one of {sorted(SUFFIXES.values())}")
+
+
+def open_text_output(output_file, compression=None, mode="w"):
+    """
+    Opens a file for writing UTF-8 text, optionally compressed, see open_output.
+    """
+    if compression is None:
+        return open(output_file, mode, encoding="utf-8")
+    return io.TextIOWrapper(open_output(output_file, compression, mode), encoding="utf-8")
+
+
+class _ProcessStream(io.RawIOBase):
+    """
+    Reads the standard output of a (de)compression tool, or writes to its standard
+    input while its standard output goes to `output_file`.
+    """
+
+    def __init__(self, command, output_file=None, mode="w"):
+        self._target = None
+        if output_file is None:
+            self._process = subprocess.Popen(command, stdout=subprocess.PIPE)
+            self._pipe = self._process.stdout
+        else:
+            self._target = open(output_file, f"{mode}b")
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=self._target)
+            self._pipe = self._process.stdin
+        self._command = command[0]
+        self._eof = False
+
+    def readable(self):
+        return self._target is None
+
+    def writable(self):
+        return self._target is not None
+
+    def readinto(self, buffer):
+        count = self._pipe.readinto(buffer)
+        if not count:
+            self._eof = True
+        return count
+
+    def write(self, data):
+        self._pipe.write(data)
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        try:
+            self._pipe.close()
+        except BrokenPipeError:
+            pass
+        if self._target is None and not self._eof:
+            # The reader stopped early, the rest of the output is not needed
+            self._process.terminate()
+            self._process.wait()
+            return
+        returncode = self._process.wait()
+        if self._target is not None:
+            self._target.close()
+        if returncode:
+            raise OSError(f"{self._command} failed with exit code {returncode}")
+
+
+class _BgzfWriter(io.RawIOBase):
+    """
+    Writes BGZF (the blocked gzip of bgzip/htslib) in Python, for when the bgzip
+    tool is not installed. Every block is a complete gzip member with the block
+    size in a 'BC' extra field; an empty block marks the end of the file.
+    """
+
+    def __init__(self, handle):
+        self._handle = handle
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= BGZF_BLOCK_SIZE:
+            self._write_block(bytes(self._buffer[:BGZF_BLOCK_SIZE]))
+            del self._buffer[:BGZF_BLOCK_SIZE]
+        return len(data)
+
+    def _write_block(self, data):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+        # Header (18 bytes) + deflated data + CRC32 and size (8 bytes), minus one
+        block_size = 18 + len(deflated) + 8 - 1
+        header = struct.pack("<4BI2BH2BHH", 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord("B"), ord("C"), 2, block_size)
+        self._handle.write(header + deflated + struct.pack("<II", zlib.crc32(data), len(data)))
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        if self._buffer:
+            self._write_block(bytes(self._buffer))
+        self._handle.write(BGZF_EOF)
+        self._handle.close()
@@ -1,8 +1,12 @@
 
 
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import csv
+import hashlib
+import os
 from datetime import datetime
+from Helper import fastaio
 
 def find_fasta_files(root_dir):
     """
@@ -22,40 +26,62 @@ def parse_fasta(file_path):
     Returns:
         list: List of tuples containing header and sequence strings.
     """
-    entries = []
-    header = None
-    seq_lines = []
-    with open(file_path, 'r') as f:
-        for line in f:
-            if line.startswith('>'):
-                if header is not None:
-                    sequence = ''.join(seq_lines).replace('\n', '').replace('\r', '')
-                    entries.append((header, sequence))
-                header = line[1:].strip()
-                seq_lines = []
-            else:
-                seq_lines.append(line.strip())
-        if header is not None:
-            sequence = ''.join(seq_lines).replace('\n', '').replace('\r', '')
-            entries.append((header, sequence))
-    return entries
+    return list(fastaio.read_fasta(file_path))
 
-def write_counts_to_csv(header_stats, csv_path):
+def write_counts_to_csv(header_stats, csv_path, representatives=None):
     """
     Writes header and sequence count statistics to a CSV file.
     Args:
         header_stats (dict): Dictionary with header statistics and sequence counts.
         csv_path (str or Path): Output path for the CSV file.
+        representatives (dict): If given, the sequences in header_stats are digests
+                                and this dict maps them to their sequence.
     """
     csv_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(csv_path, 'w', newline='') as csvfile:
+    with fastaio.atomic_output(csv_path) as temp_file, open(temp_file, 'w', newline='') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['duplikat', 'header', 'header_count', 'sequence_count', 'sequence'])
         for header, stat in header_stats.items():
             for seq, seq_count in stat['sequences'].items():
+                if representatives is not None:
+                    seq = representatives[seq]
                 duplikat = 'duplicate' if seq_count > 1 else 'no'
                 writer.writerow([duplikat, header, stat['header_count'], seq_count, seq])
 
+def sequence_digest(sequence):
+    """
+    Returns a fixed-width digest of a sequence, used as dictionary key instead of the sequence.
+    Args:
+        sequence (str): Sequence without line breaks.
+    Returns:
+        bytes: 16-byte BLAKE2b digest.
+    """
+    return hashlib.blake2b(sequence.encode(), digest_size=16).digest()
+
+def count_file(fasta_file, csv_path):
+    """
+    Counts the headers and the sequences per header of one FASTA file and writes them to a CSV file.
+    The records are streamed; sequences are counted by digest and every distinct
+    sequence is stored only once as representative for the CSV output.
+    Args:
+        fasta_file (str or Path): Path to the FASTA file.
+        csv_path (str or Path): Output path for the CSV file.
+    Returns:
+        Path: The CSV path.
+    """
+    header_stats = {}
+    representatives = {}
+    for header, sequence in fastaio.read_fasta(fasta_file):
+        digest = sequence_digest(sequence)
+        representatives.setdefault(digest, sequence)
+        stat = header_stats.get(header)
+        if stat is None:
+            stat = header_stats[header] = {'header_count': 0, 'sequences': {}}
+        stat['header_count'] += 1
+        stat['sequences'][digest] = stat['sequences'].get(digest, 0) + 1
+    write_counts_to_csv(header_stats, csv_path, representatives)
+    return csv_path
+
 def log_message(message, logfile):
     """
     Logs a message with a timestamp to both the console and a log file.
@@ -69,13 +95,14 @@ def log_message(message, logfile):
     with open(logfile, 'a') as f:
         f.write(log_entry + '\n')
 
-def main(root_dir, out_dir, logfile):
+def main(root_dir, out_dir, logfile, workers=None):
     """
     Main function to process all FASTA files in a directory, count distinct headers and sequences, and write results to CSV files.
     Args:
         root_dir (str or Path): Directory containing input FASTA files.
         out_dir (str or Path): Directory to write CSV files with header and sequence counts.
         logfile (str or Path): Path to the log file.
+        workers (int): Number of files processed in parallel (default: number of CPUs).
     """
     root_dir = Path(root_dir)
     out_dir = Path(out_dir)
@@ -86,19 +113,16 @@ def main(root_dir, out_dir, logfile):
         log_path.touch()
     fasta_files = list(find_fasta_files(root_dir))
     log_message(f"Starte Verarbeitung von {len(fasta_files)} FASTA-Dateien.", logfile)
-    for i, fasta_file in enumerate(fasta_files, 1):
-        log_message(f"[{i}/{len(fasta_files)}] Verarbeite: {fasta_file}", logfile)
-        entries = parse_fasta(fasta_file)
-        header_stats = {}
-        for header, sequence in entries:
-            if header not in header_stats:
-                header_stats[header] = {'header_count': 0, 'sequences': {}}
-            header_stats[header]['header_count'] += 1
-            header_stats[header]['sequences'][sequence] = header_stats[header]['sequences'].get(sequence, 0) + 1
-        rel_path = fasta_file.relative_to(root_dir).with_suffix('.csv')
-        csv_path = out_dir / rel_path
-        write_counts_to_csv(header_stats, csv_path)
-        log_message(f"CSV geschrieben: {csv_path}", logfile)
+    csv_paths = [out_dir / fasta_file.relative_to(root_dir).with_suffix('.csv') for fasta_file in fasta_files]
+    workers = min(workers or os.cpu_count() or 1, max(len(fasta_files), 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(count_file, fasta_file, csv_path): fasta_file
+            for fasta_file, csv_path in zip(fasta_files, csv_paths)
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            log_message(f"[{i}/{len(fasta_files)}] Verarbeitet: {futures[future]}", logfile)
+            log_message(f"CSV geschrieben: {future.result()}", logfile)
     log_message("Fertig!", logfile)
 
 if __name__ == '__main__':
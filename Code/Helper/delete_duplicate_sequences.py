@@ -0,0 +1,120 @@
+import csv
+import hashlib
+from pathlib import Path
+from Helper import fastaio
+from Helper.count_distinct_headers_and_sequences import find_fasta_files, log_message
+
+# Width of the record digests in bytes (128 bit)
+DIGEST_SIZE = 16
+# File name of the duplicate report written to the output directory
+REPORT_NAME = "duplicates.tsv"
+
+def normalize_sequence(sequence):
+    """
+    Normalizes a sequence for the duplicate check: upper case, no whitespace
+    and no trailing stop symbol.
+    Args:
+        sequence (str): Sequence without line breaks.
+    Returns:
+        str: The normalized sequence.
+    """
+    if " " in sequence or "\t" in sequence:
+        sequence = "".join(sequence.split())
+    return sequence.upper().rstrip("*")
+
+def record_digest(header, sequence, by_sequence=False):
+    """
+    Computes the fixed-width digest a record is identified by.
+    Args:
+        header (str): Header without the leading '>'.
+        sequence (str): Sequence without line breaks.
+        by_sequence (bool): Identify records by their sequence only, ignoring the header.
+    Returns:
+        bytes: Digest of DIGEST_SIZE bytes.
+    """
+    digest = hashlib.blake2b(normalize_sequence(sequence).encode(), digest_size=DIGEST_SIZE)
+    if not by_sequence:
+        # The separator keeps 'AB' + 'C' and 'A' + 'BC' apart
+        digest.update(b"\0")
+        digest.update(header.strip().encode())
+    return digest.digest()
+
+def _unique_records(fasta_file, file_index, seen, report_duplicate, by_sequence):
+    """
+    Yields the records of a FASTA file whose digest has not been seen before and
+    passes the others to report_duplicate(header, digest, first file index).
+    """
+    for header, sequence in fastaio.read_fasta(fasta_file):
+        digest = record_digest(header, sequence, by_sequence)
+        if digest in seen:
+            report_duplicate(header, digest, seen[digest])
+            continue
+        seen[digest] = file_index
+        yield header, sequence
+
+def main(input_dir, output_dir, logfile, by_sequence=False, exclude=None):
+    """
+    Removes duplicate records from all FASTA files in a directory tree.
+
+    The files are streamed one by one. Every record is identified by a fixed-width
+    digest of its normalized sequence and header, and only these digests are kept
+    in memory, so the memory use does not depend on the sequence lengths. The first
+    occurrence of a record is kept; the cleaned files are written to `output_dir`
+    with the same relative paths and all removed records are listed in a report.
+
+    Args:
+        input_dir (str or Path): Directory containing input FASTA files.
+        output_dir (str or Path): Directory for the cleaned FASTA files and the report.
+        logfile (str or Path): Path to the log file.
+        by_sequence (bool): Treat records with the same sequence but different
+                            headers as duplicates as well.
+        exclude (list): Directories below `input_dir` that are not read, e.g. earlier
+                        check results. The output directory is always excluded.
+    Returns:
+        int: Number of removed duplicates.
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    log_path = Path(logfile)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    if not log_path.exists():
+        log_path.touch()
+
+    excluded = [output_dir.resolve()] + [Path(folder).resolve() for folder in exclude or []]
+    fasta_files = sorted(
+        fasta_file for fasta_file in find_fasta_files(input_dir)
+        if not any(fasta_file.resolve().is_relative_to(folder) for folder in excluded)
+    )
+    log_message(f"Starte Duplikatsuche in {len(fasta_files)} FASTA-Dateien.", logfile)
+
+    # digest -> index of the file with the first occurrence
+    seen = {}
+    removed = 0
+    report_path = output_dir / REPORT_NAME
+    with fastaio.atomic_output(report_path) as temp_file, open(temp_file, "w", newline="") as report:
+        writer = csv.writer(report, delimiter="\t")
+        writer.writerow(["file", "header", "digest", "first_file"])
+        for file_index, fasta_file in enumerate(fasta_files):
+            log_message(f"[{file_index + 1}/{len(fasta_files)}] Verarbeite: {fasta_file}", logfile)
+            output_file = output_dir / fasta_file.relative_to(input_dir)
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            removed_before = removed
+
+            # Duplicates go straight to the report instead of being collected
+            def report_duplicate(header, digest, first):
+                nonlocal removed
+                writer.writerow([fasta_file, header, digest.hex(), fasta_files[first]])
+                removed += 1
+
+            kept = fastaio.write_fasta(
+                _unique_records(fasta_file, file_index, seen, report_duplicate, by_sequence), output_file
+            )
+            log_message(f"{kept} Sequenzen behalten, {removed - removed_before} Duplikate entfernt: {output_file}", logfile)
+
+    log_message(f"{removed} Duplikate entfernt, Bericht geschrieben: {report_path}", logfile)
+    log_message("Fertig!", logfile)
+    return removed
+
+if __name__ == '__main__':
+    main('../DataModel/small', '../DataModel/small/checks/cleaned_fasta', '../LOG/cleaned_fasta.log', exclude=['../DataModel/small/checks'])
@@ -0,0 +1,137 @@
+import numpy as np
+from Helper import fastaio
+
+# Number of sequences per tile; the one-hot matrices of a tile pair take 8 * TILE_SIZE * alignment length bytes
+TILE_SIZE = 1024
+# Gap character of the alignments
+GAP = ord("-")
+# Distance models: "identity" is Bio's DistanceCalculator('identity'), "pdistance" ignores gap positions
+MODELS = ("identity", "pdistance")
+
+
+def read_alignment(aln_file):
+    """
+    Reads an aligned FASTA file (MUSCLE output) and encodes it, see encode_alignment.
+
+    Args:
+        aln_file (str or Path): Path to the aligned FASTA file.
+    Returns:
+        tuple: (names, matrix) with the first word of every header, as used as
+               name by Bio.AlignIO, and the uint8 alignment matrix.
+    """
+    names = []
+    sequences = []
+    for header, sequence in fastaio.read_fasta(aln_file):
+        words = header.split(maxsplit=1)
+        names.append(words[0] if words else "")
+        sequences.append(sequence)
+    return names, encode_alignment(sequences)
+
+
+def encode_alignment(sequences):
+    """
+    Encodes aligned sequences as a uint8 matrix with one row per sequence and one
+    byte (the ASCII code of the letter, case-sensitive) per alignment column.
+
+    Args:
+        sequences (list): Aligned sequences (str), all of the same length.
+    Returns:
+        np.ndarray: uint8 matrix of shape (sequences, columns).
+    Raises:
+        ValueError: If the sequences differ in length.
+    """
+    lengths = {len(sequence) for sequence in sequences}
+    if len(lengths) > 1:
+        raise ValueError(f"Sequences are not aligned, found lengths {sorted(lengths)}")
+    columns = lengths.pop() if lengths else 0
+    text = "".join(sequences).encode("ascii", "replace")
+    return np.frombuffer(text, dtype=np.uint8).reshape(len(sequences), columns)
+
+
+def condensed_index(n, i, j):
+    """Returns the position of the pair (i, j), i < j, in a condensed matrix of n sequences."""
+    return n * i - i * (i + 1) // 2 + (j - i - 1)
+
+
+def square_matrix(condensed, n, dtype=None):
+    """
+    Expands a condensed matrix (upper triangle, row by row, like scipy's pdist)
+    into a symmetric n x n matrix with zeros on the diagonal.
+
+    Args:
+        condensed (np.ndarray): Condensed matrix, see pairwise_distances.
+        n (int): Number of sequences.
+        dtype: Type of the square matrix (default: type of `condensed`).
+    Returns:
+        np.ndarray: Square matrix.
+    """
+    square = np.zeros((n, n), dtype=dtype or condensed.dtype)
+    # Row by row, index arrays for all pairs would take more memory than the matrix
+    for row in range(n - 1):
+        offset = condensed_index(n, row, row + 1)
+        values = condensed[offset:offset + n - row - 1]
+        square[row, row + 1:] = values
+        square[row + 1:, row] = values
+    return square
+
+
+def pairwise_distances(matrix, model="identity", tile_size=TILE_SIZE, dtype=np.float32):
+    """
+    Computes the distances of all pairs of aligned sequences.
+
+    "identity" gives exactly the values of Bio's DistanceCalculator('identity'):
+    1 - identical columns / alignment length, where two gaps count as identical.
+    "pdistance" only counts columns without a gap in either sequence:
+    1 - identical residues / compared columns (1 if nothing can be compared).
+
+    Instead of comparing every pair of sequences in Python, the identical columns
+    of all pairs are counted with matrix products: for every letter of the
+    alignment, the one-hot matrices (letter present or not) of two tiles of
+    sequences are multiplied. The tiles cap the memory at a few one-hot
+    matrices of TILE_SIZE rows, independent of the number of sequences.
+
+    Args:
+        matrix (np.ndarray): Encoded alignment, see encode_alignment.
+        model (str): One of MODELS.
+        tile_size (int): Number of sequences per tile.
+        dtype: Type of the distances, float64 keeps Bio's values exactly.
+    Returns:
+        np.ndarray: Condensed distance matrix (upper triangle, row by row,
+                    see condensed_index), n * (n - 1) / 2 values.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown distance model '{model}', expected one of {MODELS}")
+    n, columns = matrix.shape
+    condensed = np.empty(n * (n - 1) // 2, dtype=dtype)
+    symbols = np.unique(matrix)
+    if model == "pdistance":
+        symbols = symbols[symbols != GAP]
+
+    for start in range(0, n, tile_size):
+        stop = min(start + tile_size, n)
+        # Counts of the rows of this tile against all later sequences (including the tile itself)
+        matches = np.zeros((stop - start, n - start), dtype=np.float32)
+        compared = np.zeros_like(matches) if model == "pdistance" else None
+        rows = matrix[start:stop]
+        for symbol in symbols:
+            row_hot = (rows == symbol).astype(np.float32)
+            for other in range(start, n, tile_size):
+                other_hot = (matrix[other:other + tile_size] == symbol).astype(np.float32)
+                matches[:, other - start:other - start + len(other_hot)] += row_hot @ other_hot.T
+        if compared is not None:
+            row_residues = (rows != GAP).astype(np.float32)
+            for other in range(start, n, tile_size):
+                other_residues = (matrix[other:other + tile_size] != GAP).astype(np.float32)
+                compared[:, other - start:other - start + len(other_residues)] = row_residues @ other_residues.T
+
+        # Counts are exact integers in float32 (below 2^24), the division is done in float64 like in Bio
+        if compared is None:
+            distances = 1 - matches.astype(np.float64) / columns if columns else np.ones(matches.shape)
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                distances = np.where(compared > 0, 1 - matches.astype(np.float64) / compared, 1.0)
+        for row in range(start, stop):
+            offset = condensed_index(n, row, row + 1)
+            condensed[offset:offset + n - row - 1] = distances[row - start, row - start + 1:]
+    return condensed
+
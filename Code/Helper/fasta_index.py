@@ -0,0 +1,241 @@
+import hashlib
+import os
+from pathlib import Path
+from Helper import compressed_io
+from Helper import fastaio
+
+# Suffix of the index file written next to a FASTA file
+INDEX_SUFFIX = ".fidx"
+# First field of the index header line, changes whenever the format changes
+INDEX_VERSION = "fidx1"
+# Columns of an index line, one line per record
+INDEX_COLUMNS = ["name", "length", "offset", "line_bases", "line_width", "header_offset", "end", "digest"]
+# Width of the header digests in bytes
+DIGEST_SIZE = 8
+
+
+def index_path(fasta_file):
+    """Returns the path of the index file of a FASTA file."""
+    return Path(f"{fasta_file}{INDEX_SUFFIX}")
+
+
+def header_digest(header):
+    """Returns the hex digest of a header (without '>' and line break) stored in the index."""
+    if isinstance(header, str):
+        header = header.encode("utf-8")
+    return hashlib.blake2b(header.rstrip(), digest_size=DIGEST_SIZE).hexdigest()
+
+
+class FastaIndex:
+    """
+    Record index of a plain FASTA file, similar to the .fai index of samtools faidx.
+
+    For every record the index holds the name (first word of the header), the
+    sequence length, the byte offset of the sequence, the residues and bytes per
+    line, the byte range of the whole record and a digest of the header. It is
+    stored next to the FASTA file (suffix INDEX_SUFFIX) together with the size
+    and modification time of the FASTA file, and rebuilt automatically once the
+    FASTA file changed. Counting records then only reads the first line of the
+    index, and single records are read with one seek instead of a full scan.
+
+    Use load_index to get the index of a file.
+
+    Args:
+        fasta_file (str or Path): Path to the FASTA file.
+        entries (list): Index entries as tuples in INDEX_COLUMNS order.
+    """
+
+    def __init__(self, fasta_file, entries):
+        self.fasta_file = Path(fasta_file)
+        self.entries = entries
+        self._positions = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def names(self):
+        """Returns the record names in file order."""
+        return [entry[0] for entry in self.entries]
+
+    def position(self, name):
+        """
+        Returns the position of a record in the file, looked up by its name or by
+        its accession (the part of the name before the first '|').
+
+        Raises:
+            KeyError: If no record has this name or accession.
+        """
+        if self._positions is None:
+            # The first record wins for repeated names and accessions
+            names = {}
+            accessions = {}
+            for position, entry in enumerate(self.entries):
+                names.setdefault(entry[0], position)
+                accessions.setdefault(entry[0].split("|", 1)[0], position)
+            self._positions = (names, accessions)
+        names, accessions = self._positions
+        if name in names:
+            return names[name]
+        return accessions[name]
+
+    def fetch(self, name):
+        """
+        Reads one record by its name or accession, see position.
+
+        Returns:
+            tuple: (header, sequence)
+        """
+        return next(self.records([self.position(name)]))
+
+    def records(self, positions):
+        """
+        Reads the records at the given positions with one seek each.
+
+        Args:
+            positions (iterable): Record positions (0-based, in file order).
+        Returns:
+            generator: Generator of (header, sequence) tuples in the order of positions.
+        Raises:
+            ValueError: If a header does not match its digest, i.e. the FASTA file
+                        was changed without changing its size and modification time.
+        """
+        with open(self.fasta_file, "rb") as handle:
+            for position in positions:
+                entry = self.entries[position]
+                handle.seek(entry[5])
+                text = handle.read(entry[6] - entry[5]).decode("utf-8")
+                header, sequence = fastaio.parse_record(text[1:])
+                if header_digest(header) != entry[7]:
+                    raise ValueError(f"Index {index_path(self.fasta_file)} does not match {self.fasta_file}, delete it to rebuild it")
+                yield header, sequence
+
+
+def load_index(fasta_file, rebuild=False):
+    """
+    Loads the index of a FASTA file, building and saving it first if it is
+    missing or out of date.
+
+    Args:
+        fasta_file (str or Path): Path to a plain (uncompressed) FASTA file.
+        rebuild (bool): Rebuild the index even if it looks current.
+    Returns:
+        FastaIndex: The index.
+    Raises:
+        ValueError: If the FASTA file is compressed.
+    """
+    if not rebuild:
+        entries = _read_index(fasta_file, header_only=False)
+        if entries is not None:
+            return FastaIndex(fasta_file, entries)
+    return build_index(fasta_file)
+
+
+def count_records(fasta_file):
+    """
+    Counts the records of a FASTA file from its index, building the index if needed.
+    Compressed files have no index and are counted with fastaio.count_records.
+
+    Args:
+        fasta_file (str or Path): Path to the FASTA file.
+    Returns:
+        int: Number of records.
+    """
+    if compressed_io.sniff(fasta_file):
+        return fastaio.count_records(fasta_file)
+    count = _read_index(fasta_file, header_only=True)
+    if count is None:
+        count = len(build_index(fasta_file))
+    return count
+
+
+def build_index(fasta_file):
+    """
+    Scans a FASTA file once and writes its index next to it. If the folder is not
+    writable, the index is only kept in memory.
+
+    Args:
+        fasta_file (str or Path): Path to a plain (uncompressed) FASTA file.
+    Returns:
+        FastaIndex: The new index.
+    """
+    if compressed_io.sniff(fasta_file):
+        raise ValueError(f"{fasta_file} is compressed, only plain FASTA files can be indexed")
+    stat = os.stat(fasta_file)
+    entries = []
+    record = None
+
+    def finish(end):
+        name, header_offset, offset, length, line_bases, line_width, regular, digest = record
+        if not regular:
+            # Irregular line lengths, records can still be read as a whole
+            line_bases = line_width = 0
+        entries.append((name, length, offset, line_bases, line_width, header_offset, end, digest))
+
+    position = 0
+    with open(fasta_file, "rb") as handle:
+        for line in handle:
+            if line.startswith(b">"):
+                if record is not None:
+                    finish(position)
+                header = line[1:].rstrip()
+                words = header.split(maxsplit=1)
+                name = words[0].decode("utf-8") if words else ""
+                # [name, header_offset, offset, length, line_bases, line_width, regular, digest]
+                record = [name, position, position + len(line), 0, 0, 0, True, header_digest(header)]
+                last_short = False
+            elif record is not None:
+                bases = len(line.rstrip())
+                if bases:
+                    if not record[4]:
+                        record[4], record[5] = bases, len(line)
+                    elif last_short or bases > record[4]:
+                        # Only the last line of a record may be shorter than the first
+                        record[6] = False
+                    elif bases < record[4]:
+                        last_short = True
+                    record[3] += bases
+            position += len(line)
+    if record is not None:
+        finish(position)
+
+    index = FastaIndex(fasta_file, entries)
+    try:
+        _write_index(index, stat)
+    except OSError as error:
+        print(f"Index for {fasta_file} not saved: {error}")
+    return index
+
+
+def _write_index(index, stat):
+    path = index_path(index.fasta_file)
+    with fastaio.atomic_output(path) as temp_file, open(temp_file, "w", encoding="utf-8") as handle:
+        handle.write(f"#{INDEX_VERSION}\t{stat.st_size}\t{stat.st_mtime_ns}\t{len(index)}\n")
+        handle.writelines("\t".join(map(str, entry)) + "\n" for entry in index.entries)
+
+
+def _read_index(fasta_file, header_only):
+    """
+    Reads the index of a FASTA file if it exists and matches the size and
+    modification time of the file.
+
+    Returns:
+        The number of records (header_only) or the list of entries, None if the
+        index is missing or out of date.
+    """
+    path = index_path(fasta_file)
+    try:
+        stat = os.stat(fasta_file)
+        handle = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    with handle:
+        fields = handle.readline().rstrip("\n").split("\t")
+        if fields[:3] != [f"#{INDEX_VERSION}", str(stat.st_size), str(stat.st_mtime_ns)]:
+            return None
+        if header_only:
+            return int(fields[3])
+        entries = []
+        for line in handle:
+            name, *numbers, digest = line.rstrip("\n").split("\t")
+            entries.append((name, *map(int, numbers), digest))
+    return entries
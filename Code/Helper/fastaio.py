@@ -0,0 +1,422 @@
+import codecs
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from Helper import compressed_io
+
+# Size of the blocks read from and written to disk (1 MiB)
+BLOCK_SIZE = 1 << 20
+# Default number of residues per sequence line, as used throughout the pipelines
+LINE_LENGTH = 60
+
+
+def temp_path(output_file):
+    """
+    Returns the temporary path an output file is written to before it is renamed,
+    a hidden file in the same folder so the rename stays on one file system.
+    """
+    output_file = Path(output_file)
+    return output_file.with_name(f".{output_file.name}.{os.getpid()}.tmp")
+
+
+@contextmanager
+def atomic_output(output_file):
+    """
+    Writes an output file atomically. The caller writes to the yielded temporary
+    path; it replaces `output_file` only if the block finishes without an error,
+    otherwise it is deleted. A crash therefore never leaves a truncated output
+    behind that a later step could read.
+
+    Args:
+        output_file (str or Path): Path of the final output file.
+    Returns:
+        Path: Temporary path to write to.
+    """
+    temp_file = temp_path(output_file)
+    try:
+        yield temp_file
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
+    os.replace(temp_file, output_file)
+
+
+def copy_file(source_file, output_file):
+    """Copies a file (content and permissions) atomically, see atomic_output."""
+    with atomic_output(output_file) as temp_file:
+        shutil.copy(source_file, temp_file)
+
+
+def read_blocks(input_file, block_size=BLOCK_SIZE, start=0, end=None):
+    """
+    Reads a text file in large blocks instead of line by line. gzip, bgzip and
+    zstd compressed files are recognized by their first bytes and decompressed
+    on the fly, see compressed_io.open_input.
+
+    Args:
+        input_file (str or Path): Path to the input file.
+        block_size (int): Number of bytes read per block.
+        start (int): Byte offset to start reading at.
+        end (int): Byte offset to stop reading at. None reads to the end of the file.
+    Returns:
+        generator: Generator of decoded text blocks.
+    Raises:
+        ValueError: If a byte range of a compressed file is requested.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    if (start or end is not None) and compressed_io.sniff(input_file):
+        raise ValueError(f"{input_file} is compressed, byte ranges are only supported for plain files")
+    with compressed_io.open_input(input_file) as handle:
+        if start:
+            handle.seek(start)
+        remaining = float("inf") if end is None else end - start
+        while remaining > 0:
+            raw = handle.read(int(min(block_size, remaining)))
+            if not raw:
+                break
+            remaining -= len(raw)
+            block = decoder.decode(raw)
+            if block:
+                yield block
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_record_texts(blocks):
+    """
+    Splits a stream of text blocks into raw FASTA record texts.
+
+    The first text yielded is always the preamble in front of the first header
+    (usually empty) and has to be skipped by the caller. Every following text is
+    one record without its leading '>'.
+
+    Args:
+        blocks (iterable): Iterable of text blocks, e.g. from read_blocks.
+    Returns:
+        generator: Generator of record texts.
+    """
+    pending = ["\n"]
+    for block in blocks:
+        # A record boundary may be split between two blocks
+        if block[0] == ">" and pending[-1].endswith("\n"):
+            block = "\n" + block
+        parts = block.split("\n>")
+        if len(parts) == 1:
+            pending.append(block)
+            continue
+        pending.append(parts[0])
+        yield "".join(pending)
+        yield from parts[1:-1]
+        pending = [parts[-1]]
+    yield "".join(pending)
+
+
+def parse_record(text):
+    """
+    Parses a raw record text into its header and sequence.
+
+    Args:
+        text (str): Record text without the leading '>'.
+    Returns:
+        tuple: (header, sequence) with trailing whitespace removed from the header
+               and the stripped sequence lines joined together.
+    """
+    header, _, body = text.partition("\n")
+    return header.rstrip(), join_sequence(body)
+
+
+def read_fasta(input_file, block_size=BLOCK_SIZE, start=0, end=None):
+    """
+    Streams the records of a FASTA file.
+
+    Args:
+        input_file (str or Path): Path to the FASTA file.
+        block_size (int): Number of bytes read per block.
+        start (int): Byte offset to start reading at, see record_ranges.
+        end (int): Byte offset to stop reading at. None reads to the end of the file.
+    Returns:
+        generator: Generator of (header, sequence) tuples. The header does not
+                   contain the leading '>'.
+    """
+    texts = iter_record_texts(read_blocks(input_file, block_size, start, end))
+    # Skip the preamble in front of the first header
+    next(texts)
+    for text in texts:
+        yield parse_record(text)
+
+
+def join_sequence(body):
+    """
+    Joins the sequence lines of a record body into one string.
+
+    Args:
+        body (str): Sequence lines of a record, separated by newlines.
+    Returns:
+        str: The stripped sequence lines joined together.
+    """
+    if " " in body or "\t" in body or "\r" in body:
+        return "".join(line.strip() for line in body.split("\n"))
+    return body.replace("\n", "")
+
+
+def is_wrapped(body, line_length=LINE_LENGTH):
+    """
+    Checks whether a record body already consists of full lines of `line_length`
+    characters followed by one shorter or equally long last line, so it can be
+    written without rewrapping.
+
+    Args:
+        body (str): Sequence lines of a record, separated by newlines.
+        line_length (int): Expected characters per sequence line.
+    Returns:
+        bool: True if the body can be written unchanged.
+    """
+    end = len(body) - 1 if body.endswith("\n") else len(body)
+    if not end or not line_length or body[end - 1] == "\n":
+        return False
+    if " " in body or "\t" in body or "\r" in body:
+        return False
+    breaks = body[line_length:end:line_length + 1]
+    return not breaks.strip("\n") and body.count("\n", 0, end) == len(breaks)
+
+
+def wrap_sequence(sequence, line_length=LINE_LENGTH):
+    """
+    Wraps a sequence into lines of at most `line_length` characters.
+
+    Args:
+        sequence (str): Sequence without line breaks.
+        line_length (int): Maximum characters per sequence line.
+    Returns:
+        str: The wrapped sequence including the trailing newline, or an empty
+             string for an empty sequence.
+    """
+    length = len(sequence)
+    if not length:
+        return ""
+    if not line_length or length <= line_length:
+        return sequence + "\n"
+    # Slice in C via map instead of a Python-level loop over the lines
+    starts = range(0, length, line_length)
+    stops = range(line_length, length + line_length, line_length)
+    return "\n".join(map(sequence.__getitem__, map(slice, starts, stops))) + "\n"
+
+
+def record_ranges(input_file, parts):
+    """
+    Splits a FASTA file into byte ranges that each start at a record boundary,
+    so the ranges can be processed independently and in order.
+
+    Args:
+        input_file (str or Path): Path to the FASTA file.
+        parts (int): Desired number of ranges. Fewer are returned for small files.
+    Returns:
+        list: List of (start, end) byte offsets covering the whole file. A
+              compressed file cannot be split and gives the single range (0, None).
+    """
+    if compressed_io.sniff(input_file):
+        return [(0, None)]
+    size = os.path.getsize(input_file)
+    boundaries = [0]
+    with open(input_file, "rb") as handle:
+        for i in range(1, parts):
+            position = max(size * i // parts, boundaries[-1])
+            handle.seek(position)
+            # Search forward for the next header at the start of a line
+            carry = b""
+            while True:
+                block = handle.read(BLOCK_SIZE)
+                if not block:
+                    position = size
+                    break
+                found = (carry + block).find(b"\n>")
+                if found != -1:
+                    position = position - len(carry) + found + 1
+                    break
+                position += len(block)
+                carry = block[-1:]
+            if position >= size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def format_record(header, sequence, line_length=LINE_LENGTH):
+    """
+    Formats a single FASTA record.
+
+    Args:
+        header (str): Header without the leading '>'.
+        sequence (str): Sequence without line breaks.
+        line_length (int): Maximum characters per sequence line. 0 or None writes
+                           the sequence on a single line.
+    Returns:
+        str: The formatted record including the trailing newline.
+    """
+    return f">{header}\n" + wrap_sequence(sequence, line_length)
+
+
+class FastaWriter:
+    """
+    Writes FASTA records one at a time while collecting them into large batches.
+    Useful when records go to several outputs at once. Use as a context manager.
+    In mode 'w' the records go to a temporary file that replaces the output file
+    when the writer is closed; if the with block raises, the output is left untouched.
+
+    Args:
+        output_file (str or Path): Path to the output FASTA file.
+        line_length (int): Maximum characters per sequence line. 0 or None writes
+                           each sequence on a single line.
+        mode (str): File mode, 'w' to overwrite or 'a' to append.
+        block_size (int): Number of characters collected before each write.
+        compression (str): 'gzip', 'bgzip' or 'zstd' to write a compressed file.
+                           By default it follows the suffix of output_file
+                           (.gz, .bgz, .zst), other names are written uncompressed.
+    """
+
+    def __init__(self, output_file, line_length=LINE_LENGTH, mode="w", block_size=BLOCK_SIZE, compression=None):
+        self.line_length = line_length
+        self.block_size = block_size
+        self.count = 0
+        self._batch = []
+        self._batch_size = 0
+        self.output_file = output_file
+        self._temp_file = temp_path(output_file) if mode == "w" else None
+        self.compression = compression or compressed_io.from_suffix(output_file)
+        self._handle = compressed_io.open_text_output(self._temp_file or output_file, self.compression, mode)
+
+    def write(self, header, sequence):
+        """Adds one record with the given header (without '>') and sequence."""
+        text = format_record(header, sequence, self.line_length)
+        self._batch.append(text)
+        self._batch_size += len(text)
+        self.count += 1
+        if self._batch_size >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """Writes all collected records to the file."""
+        if self._batch:
+            self._handle.write("".join(self._batch))
+            self._batch = []
+            self._batch_size = 0
+
+    def close(self):
+        """Writes the remaining records and closes the file."""
+        self.flush()
+        self._handle.close()
+        if self._temp_file is not None:
+            os.replace(self._temp_file, self.output_file)
+            self._temp_file = None
+
+    def discard(self):
+        """Closes the file without replacing the output file (mode 'w' only)."""
+        self._batch = []
+        self._handle.close()
+        if self._temp_file is not None:
+            self._temp_file.unlink(missing_ok=True)
+            self._temp_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def write_fasta(records, output_file, line_length=LINE_LENGTH, mode="w", block_size=BLOCK_SIZE, compression=None):
+    """
+    Writes FASTA records in large batches.
+
+    Args:
+        records (iterable): Iterable of (header, sequence) tuples.
+        output_file (str or Path): Path to the output FASTA file.
+        line_length (int): Maximum characters per sequence line. 0 or None writes
+                           each sequence on a single line.
+        mode (str): File mode, 'w' to overwrite or 'a' to append.
+        block_size (int): Number of characters collected before each write.
+        compression (str): Output compression, see FastaWriter.
+    Returns:
+        int: Number of records written.
+    """
+    with FastaWriter(output_file, line_length, mode, block_size, compression) as writer:
+        for header, sequence in records:
+            writer.write(header, sequence)
+    return writer.count
+
+
+def count_records(input_file, block_size=BLOCK_SIZE):
+    """
+    Counts the records of a plain or compressed FASTA file without parsing them.
+
+    Args:
+        input_file (str or Path): Path to the FASTA file.
+        block_size (int): Number of bytes read per block.
+    Returns:
+        int: Number of headers in the file.
+    """
+    count = 0
+    previous = b"\n"
+    with compressed_io.open_input(input_file) as handle:
+        while True:
+            block = handle.read(block_size)
+            if not block:
+                break
+            count += block.count(b"\n>")
+            if previous.endswith(b"\n") and block.startswith(b">"):
+                count += 1
+            previous = block[-1:]
+    return count
+
+
+def rewrap_fasta(input_file, output_file, line_length=LINE_LENGTH, appendix="", block_size=BLOCK_SIZE, compression=None):
+    """
+    Rewrites a FASTA file with every sequence wrapped to `line_length` characters
+    and `appendix` added to every header.
+
+    Works directly on the raw record texts: records that are already wrapped to
+    `line_length` are copied unchanged, all others are assembled with a single
+    join and wrapped with one slice per output line. Output is collected into
+    large chunks before it is written.
+
+    Args:
+        input_file (str or Path): Path to the input FASTA file.
+        output_file (str or Path): Path to the output FASTA file.
+        line_length (int): Maximum characters per sequence line.
+        appendix (str): Text added to the end of every header.
+        block_size (int): Number of bytes read and characters written per block.
+        compression (str): Output compression, see FastaWriter.
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    chunk = []
+    chunk_size = 0
+    texts = iter_record_texts(read_blocks(input_file, block_size))
+    compression = compression or compressed_io.from_suffix(output_file)
+    with atomic_output(output_file) as temp_file, compressed_io.open_text_output(temp_file, compression) as outfile:
+        # Sequence lines in front of the first header are kept without a header
+        chunk.append(wrap_sequence(join_sequence(next(texts)), line_length))
+        for text in texts:
+            header, _, body = text.partition("\n")
+            if is_wrapped(body, line_length):
+                wrapped = body if body.endswith("\n") else body + "\n"
+            else:
+                wrapped = wrap_sequence(join_sequence(body), line_length)
+            chunk.append(f">{header.rstrip()}{appendix}\n")
+            chunk.append(wrapped)
+            chunk_size += len(wrapped)
+            count += 1
+            if chunk_size >= block_size:
+                outfile.write("".join(chunk))
+                chunk = []
+                chunk_size = 0
+        outfile.write("".join(chunk))
+    return count
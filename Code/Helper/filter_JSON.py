@@ -1,39 +1,47 @@
-import json
 import time
 from pathlib import Path
+from Helper import jsonio
 
-def filter_json_by_subtype_v(input_file, output_file):
+def is_type_v(entry):
+    """
+    Checks whether an operon entry has a subtype in its summary that starts with 'V'
+    (case-insensitive). Works for subtypes like 'V1', 'Vt', 'V 23', etc.
+
+    Args:
+        entry (dict): One operon entry of the CRISPR-Cas Atlas.
+    Returns:
+        bool: True if the entry is a Type V operon.
+    """
+    # Check if 'summary' and 'subtype' exist and subtype starts with 'V'
+    return (
+        "summary" in entry
+        and "subtype" in entry["summary"]
+        and entry["summary"]["subtype"] is not None
+        and str(entry["summary"]["subtype"]).strip().upper().startswith("V")
+    )
+
+def filter_json_by_subtype_v(input_file, output_file, json_lines=False):
     """
     Filters a JSON file and writes all entries where the subtype in the summary starts with 'V' (case-insensitive)
     to a new JSON file. Works for subtypes like 'V1', 'Vt', 'V 23', etc.
 
+    The input is parsed one operon at a time and matching operons are written out as
+    compact JSON immediately, so memory use does not grow with the size of the atlas.
+
     Args:
         input_file (str): Path to the input JSON file.
         output_file (str): Path to the output JSON file where filtered entries will be saved.
+        json_lines (bool): Write one operon per line (JSON Lines) instead of a JSON array.
     """
 
     print(f"Start filtering JSON file: {input_file}")
 
     Path(output_file).parent.mkdir(parents=True, exist_ok=True)
 
-    # Load the JSON data from the input file
-    with open(input_file, "r") as f:
-        data = json.load(f)
-
-    # Filter entries: check if 'summary' and 'subtype' exist and subtype starts with 'V'
-    # and if the operon contains any cas12 genes
-    filtered = [
-        entry for entry in data
-        if "summary" in entry
-        and "subtype" in entry["summary"]
-        and entry["summary"]["subtype"] is not None
-        and str(entry["summary"]["subtype"]).strip().upper().startswith("V")
-    ]
-
-    with open(output_file, "w") as f:
-        json.dump(filtered, f, indent=2)
+    filtered = (entry for entry in jsonio.iter_json_items(input_file) if is_type_v(entry))
+    written = jsonio.write_json_items(filtered, output_file, json_lines)
 
-    print(f"Filtered records written to {output_file}")
+    print(f"{written} filtered records written to {output_file}")
 
 if __name__ == "__main__":
     start_time = time.time()
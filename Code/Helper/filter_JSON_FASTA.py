@@ -1,5 +1,7 @@
 import time
 from pathlib import Path
+from Helper import compressed_io
+from Helper import fastaio
 
 def filter_JSON_FASTA(input_file, output_file, keyword="cas12"):
     """
@@ -18,22 +20,26 @@ def filter_JSON_FASTA(input_file, output_file, keyword="cas12"):
     # Create output directory if it doesn't exist
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Open input and output files simultaneously
-    with open(input_path, 'r') as infile, open(output_path, 'w') as outfile:
-        write_entry = False  # Flag to track whether current sequence should be written
-
-        for line in infile:
-            # Check if line is a FASTA header (starts with '>')
-            if line.startswith('>'):
-                # Check if header contains the keyword (case-insensitive search)
-                if keyword in line.lower():
-                    write_entry = True
-                    outfile.write(line)  # Write the matching header
-                else:
-                    write_entry = False  # Reset flag for non-matching headers
-            # Write sequence lines only if the header matched
-            elif write_entry:
-                outfile.write(line)
+    # Keep only records whose header contains the keyword (case-insensitive search);
+    # the records are copied unchanged, so the line wrapping of the input is kept
+    texts = fastaio.iter_record_texts(fastaio.read_blocks(input_path))
+    # Lines in front of the first header belong to no record and are dropped
+    next(texts)
+    chunk = []
+    chunk_size = 0
+    compression = compressed_io.from_suffix(output_path)
+    with fastaio.atomic_output(output_path) as temp_file, compressed_io.open_text_output(temp_file, compression) as outfile:
+        for text in texts:
+            if keyword not in text.partition("\n")[0].lower():
+                continue
+            # Record texts end without the line break in front of the next header
+            chunk.append(f">{text}" if text.endswith("\n") else f">{text}\n")
+            chunk_size += len(text)
+            if chunk_size >= fastaio.BLOCK_SIZE:
+                outfile.write("".join(chunk))
+                chunk = []
+                chunk_size = 0
+        outfile.write("".join(chunk))
 
 if __name__ == "__main__":
     start_time = time.time()
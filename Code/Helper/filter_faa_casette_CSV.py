@@ -2,81 +2,128 @@ import os
 import csv
 import sys
 import time
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from Helper import fastaio
 
-def filter_faa_casette_CSV(csv_file_path, faa_folder_path, filtered_folder_path):
+# Number of bases the cassette range is extended by on both sides
+BUFFER = 15
+
+def filter_faa_casette_CSV(csv_file_path, faa_folder_path, filtered_folder_path, workers=None):
     """
     This function filters sequences from .faa files based on start and end coordinates
     provided in the CSV file and saves the filtered sequences into a new folder.
+
+    The CSV rows are grouped by genome into one interval index per genome, so every
+    .faa file is read exactly once no matter how many cassettes its genome has. The
+    genomes are processed in parallel. A sequence is kept once if it lies within the
+    range of at least one cassette (extended by BUFFER on both sides).
+
+    Args:
+        csv_file_path (str): Path to the cassette summary CSV (name, ..., start, end in columns 0, 3, 4).
+        faa_folder_path (str): Folder with one '<name>.faa' file per genome.
+        filtered_folder_path (str): Output folder for the filtered .faa files.
+        workers (int): Number of genomes processed in parallel (default: number of CPUs).
     """
 
     # Create the output folder if it doesn't already exist
     os.makedirs(filtered_folder_path, exist_ok=True)
 
-    # List all .faa files in the faa_folder_path and sort them
-    faa_files = sorted(file_name for file_name in os.listdir(faa_folder_path) if file_name.endswith('.faa'))
+    # Map the genome names to the .faa files in the faa_folder_path
+    faa_files = {
+        os.path.splitext(file_name)[0]: file_name
+        for file_name in os.listdir(faa_folder_path) if file_name.endswith('.faa')
+    }
 
-    # Open the CSV file to read genomic data
+    # Group the cassette coordinates of the CSV file by genome
+    cassettes = defaultdict(list)
     with open(csv_file_path, 'r', newline='', encoding='utf-8') as csvfile:
         csv_reader = csv.reader(csvfile)
 
         # Skip the header row of the CSV file
         next(csv_reader)
 
-        # Iterate through each row in the CSV file
         for row in csv_reader:
             # Extract genomic name, start and end coordinates from the CSV row
             name_csv, start_csv, end_csv = row[0], int(row[3]), int(row[4])
-            
-            # Set a buffer value to extend the range around the start and end coordinates
-            buffer = 15
-
-            # Iterate through each .faa file
-            for faa_file in faa_files:
-                # Check if the genome name matches the base name of the .faa file (without the .faa extension)
-                if name_csv == os.path.splitext(faa_file)[0]:
-                    faa_file_path = os.path.join(faa_folder_path, faa_file)
-
-                    # Open the .faa file and read its content
-                    with open(faa_file_path, 'r', encoding='utf-8') as file:
-                        lines = file.readlines()
-                    
-                    # Initialize a list to store filtered lines
-                    filtered_lines = []
-                    keep_sequence = False
-
-                    # Iterate through each line in the .faa file
-                    for line in lines:
-                        line = line.strip()
-                        
-                        # Check if the line is a header (starts with '>')
-                        if line.startswith('>'):
-                            header = line[1:]
-                            parts = header.split('_')  # Split header into parts (assuming the format: '>name_start_end')
-                            
-                            # Extract the start and end coordinates from the header
-                            start = int(parts[1])
-                            end = int(parts[2])
-                            
-                            # Check if the sequence falls within the range defined in the CSV (with buffer)
-                            if start_csv - buffer <= start <= end_csv + buffer and start_csv - buffer <= end <= end_csv + buffer:
-                                keep_sequence = True  # Keep the sequence if it matches the coordinates
-                            else:
-                                keep_sequence = False  # Skip the sequence if it doesn't match the coordinates
-
-                        # If the sequence should be kept, append the line to filtered_lines
-                        if keep_sequence:
-                            filtered_lines.append(line + '\n')
-
-                            # Print header line when added to filtered lines
-                            if line.startswith('>'):
-                                print(f"Header added: {line}")
-
-                    # Path to save the filtered .faa file
-                    filtered_file_path = os.path.join(filtered_folder_path, faa_file)
-
-                    # Append the filtered lines to the corresponding output file
-                    with open(filtered_file_path, 'a', encoding='utf-8') as file:
-                        file.writelines(filtered_lines)
+            if name_csv in faa_files:
+                cassettes[name_csv].append((start_csv - BUFFER, end_csv + BUFFER))
+
+    jobs = [
+        (
+            os.path.join(faa_folder_path, faa_files[name]),
+            os.path.join(filtered_folder_path, faa_files[name]),
+            build_interval_index(intervals),
+        )
+        for name, intervals in sorted(cassettes.items())
+    ]
+    print(f"Filtering {len(jobs)} .faa files with cassettes from {csv_file_path}")
+
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (_, filtered_file_path, _), written in zip(jobs, executor.map(_filter_faa_file, jobs)):
+            print(f"{written} sequences written to {filtered_file_path}")
+
+def build_interval_index(intervals):
+    """
+    Builds a containment index over cassette intervals.
+
+    Args:
+        intervals (list): List of (low, high) tuples.
+    Returns:
+        tuple: (lows, highs) with the intervals sorted by low and highs[i] being the
+               largest high among the first i + 1 intervals.
+    """
+    intervals = sorted(intervals)
+    lows = [low for low, _ in intervals]
+    highs = list(accumulate((high for _, high in intervals), max))
+    return lows, highs
+
+def is_contained(index, start, end):
+    """
+    Checks whether the range start..end lies within at least one interval of the index.
+
+    Args:
+        index (tuple): Index from build_interval_index.
+        start (int): Start coordinate.
+        end (int): End coordinate.
+    Returns:
+        bool: True if an interval with low <= start, end and high >= start, end exists.
+    """
+    lows, highs = index
+    # All intervals starting before the range; the widest reaching one decides
+    count = bisect_right(lows, min(start, end))
+    return count > 0 and highs[count - 1] >= max(start, end)
+
+def _filter_faa_file(job):
+    """
+    Writes the sequences of one .faa file that lie within a cassette of its genome.
+
+    Args:
+        job (tuple): (faa_file_path, filtered_file_path, interval index)
+    Returns:
+        int: Number of sequences written.
+    """
+    faa_file_path, filtered_file_path, index = job
+    return fastaio.write_fasta(_records_in_cassettes(faa_file_path, index), filtered_file_path)
+
+def _records_in_cassettes(faa_file_path, index):
+    """
+    Yields the records of a .faa file whose 'name_start_end' header lies within the interval index.
+    """
+    for header, sequence in fastaio.read_fasta(faa_file_path):
+        # The coordinates are the last two fields of the identifier, the name may contain '_'
+        identifier = header.split(maxsplit=1)[0] if header else ""
+        parts = identifier.rsplit('_', 2)
+
+        # Extract the start and end coordinates from the header
+        start = int(parts[1])
+        end = int(parts[2])
+
+        if is_contained(index, start, end):
+            yield header, sequence
 
 
 if __name__ == "__main__":
@@ -2,8 +2,17 @@
 
 import time
 import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from Helper import compressed_io
+from Helper import fastaio
 
-def filter_uniprot(input_file, output_file, keyword="cas12", keyword2="-like", pe_threshold=5):
+# Digits of the PE value following 'pe=' in a lowercased header
+PE_VALUE = re.compile(r"\d+")
+
+def filter_uniprot(input_file, output_file, keyword="cas12", keyword2="-like", pe_threshold=5, workers=1):
     """
     Filters a UniProt FASTA file based on keywords and protein evidence (PE) score.
     
@@ -13,6 +22,12 @@ def filter_uniprot(input_file, output_file, keyword="cas12", keyword2="-like", p
         keyword (str): Primary keyword to search for in headers (default: "cas")
         keyword2 (str): Keyword to exclude from results (default: "-like")
         pe_threshold (int): Maximum PE value to include (default: 5)
+        workers (int): Number of processes scanning the file in parallel (default: 1).
+                       With more than one worker the file is split into byte ranges
+                       aligned to record boundaries, every range is filtered into its
+                       own shard and the shards are concatenated in order, so the
+                       output is identical to a sequential run. Compressed
+                       inputs cannot be split and are filtered sequentially.
     
     The function keeps sequences where:
     - Header contains the primary keyword (case-insensitive)
@@ -22,54 +37,79 @@ def filter_uniprot(input_file, output_file, keyword="cas12", keyword2="-like", p
     
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    
-    with open(input_file, "r") as infile, open(output_file, "w") as outfile:
-        write_entry = False  # Flag to track whether current entry should be written
-        
-        for line in infile:
-            if line.startswith(">"):  # Header line
-                # Check if header contains the primary keyword
-                if keyword in line.lower():
-                    # Exclude entries containing the secondary keyword
-                    if keyword2 not in line.lower():
-                        # Check for PE value <= threshold
-                        pe_check = False
-                        line_lower = line.lower()
-
-                        line = line.replace(' ', '|')
-                        
-                        # Look for PE= in the header
-                        if "pe=" in line_lower:
-                            try:
-                                # Extract PE value from header
-                                pe_start = line_lower.find("pe=") + 3
-                                pe_end = pe_start
-                                # Find the end of the PE number
-                                while pe_end < len(line_lower) and line_lower[pe_end].isdigit():
-                                    pe_end += 1
-                                
-                                # Parse PE value if found
-                                if pe_end > pe_start:
-                                    pe_value = int(line_lower[pe_start:pe_end])
-                                    if pe_value <= pe_threshold:
-                                        pe_check = True
-                            except ValueError:
-                                pass  # Skip if PE value cannot be parsed
-                        
-                        # Write entry if all conditions are met
-                        if pe_check:
-                            write_entry = True
-                            outfile.write(line)
-                            print(f"{line.strip()} written.")
-                        else:
-                            write_entry = False
-                    else:
-                        write_entry = False  # Skip entries with exclusion keyword
-                else:
-                    write_entry = False  # Skip entries without primary keyword
-            elif write_entry:
-                # Write sequence lines for accepted entries
-                outfile.write(line)
+
+    if workers > 1 and compressed_io.sniff(input_file):
+        print(f"{input_file} is compressed and is filtered in a single pass.")
+        workers = 1
+
+    if workers <= 1:
+        written = fastaio.write_fasta(_filtered_records(input_file, keyword, keyword2, pe_threshold), output_file)
+        print(f"{written} entries written to {output_file}")
+        return
+
+    # Several ranges per worker keep all processes busy until the end of the file
+    ranges = fastaio.record_ranges(input_file, workers * 4)
+    print(f"Filtering {input_file} in {len(ranges)} ranges with {workers} workers.")
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_file) or ".") as shard_dir:
+        jobs = [
+            (input_file, os.path.join(shard_dir, f"shard_{i:05d}.fasta"), keyword, keyword2, pe_threshold, start, end)
+            for i, (start, end) in enumerate(ranges)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(_filter_range, jobs))
+
+        # Concatenate the shards in file order
+        compression = compressed_io.from_suffix(output_file)
+        with fastaio.atomic_output(output_file) as temp_file, compressed_io.open_output(temp_file, compression) as outfile:
+            for job in jobs:
+                with open(job[1], "rb") as shard:
+                    shutil.copyfileobj(shard, outfile, fastaio.BLOCK_SIZE)
+
+    print(f"{written} entries written to {output_file}")
+
+def _filter_range(job):
+    """
+    Filters one byte range of a UniProt FASTA file into a shard file.
+
+    Args:
+        job (tuple): (input_file, shard_file, keyword, keyword2, pe_threshold, start, end)
+    Returns:
+        int: Number of entries written to the shard.
+    """
+    input_file, shard_file, keyword, keyword2, pe_threshold, start, end = job
+    records = _filtered_records(input_file, keyword, keyword2, pe_threshold, start, end)
+    return fastaio.write_fasta(records, shard_file)
+
+def _filtered_records(input_file, keyword, keyword2, pe_threshold, start=0, end=None):
+    """
+    Yields the records of a UniProt FASTA file that pass the filter of filter_uniprot,
+    with spaces in the header replaced by '|'. Only matching records are parsed.
+    """
+    texts = fastaio.iter_record_texts(fastaio.read_blocks(input_file, start=start, end=end))
+    # Skip the preamble in front of the first header
+    next(texts)
+    for text in texts:
+        newline = text.find("\n")
+        line_lower = (text if newline == -1 else text[:newline]).lower()
+        # Check if header contains the primary keyword
+        if keyword not in line_lower:
+            continue  # Skip entries without primary keyword
+        # Exclude entries containing the secondary keyword
+        if keyword2 in line_lower:
+            continue  # Skip entries with exclusion keyword
+
+        # Look for PE= in the header and check for PE value <= threshold
+        pe_start = line_lower.find("pe=")
+        if pe_start == -1:
+            continue
+        match = PE_VALUE.match(line_lower, pe_start + 3)
+        if match is None or int(match.group()) > pe_threshold:
+            continue
+
+        # Write entry if all conditions are met
+        header, sequence = fastaio.parse_record(text)
+        yield header.replace(' ', '|'), sequence
 
 if __name__ == "__main__":
     start_time = time.time()
@@ -78,14 +118,14 @@ if __name__ == "__main__":
     name = "uniprot_trembl"
     input_file = f"../DB/uniprot/raw/{name}.fasta"
     output_file = f"../FASTA/uniprot/{name}_filtered.fasta"
-    filter_uniprot(input_file, output_file, "cas12", "-like", 5)
+    filter_uniprot(input_file, output_file, "cas12", "-like", 5, workers=os.cpu_count() or 1)
     print(f"Filtered UniProt Trembl file saved to {output_file}")
 
     # Process UniProt Sprot database
     name2 = "uniprot_sprot"
     input_file_2 = f"../DB/uniprot/raw/{name2}.fasta"
     output_file_2 = f"../FASTA/uniprot/{name2}_filtered.fasta"
-    filter_uniprot(input_file_2, output_file_2, "cas12", "-like", 5)
+    filter_uniprot(input_file_2, output_file_2, "cas12", "-like", 5, workers=os.cpu_count() or 1)
     print(f"Filtered UniProt Sprot file saved to {output_file_2}")
 
     # Calculate and display timing information
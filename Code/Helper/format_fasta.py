@@ -2,6 +2,7 @@
 
 import time
 from pathlib import Path
+from Helper import fastaio
 
 def format_fasta(input_file: Path, output_file: Path, appendix: str, line_length: int):
     """
@@ -12,27 +13,8 @@ def format_fasta(input_file: Path, output_file: Path, appendix: str, line_length
     """
     # Ensure output directory exists
     output_file.parent.mkdir(parents=True, exist_ok=True)
-    # Create the output file if it does not exist
-    output_file.touch(exist_ok=True)
-
-    with input_file.open("r") as infile, output_file.open("w") as outfile:
-        sequence = ""
-        for line in infile:
-            line = line.strip()
-            if line.startswith(">"):
-                # Write the previous sequence before processing the new header
-                if sequence:
-                    for i in range(0, len(sequence), line_length):
-                        outfile.write(sequence[i:i+line_length] + "\n")
-                # Write the header with appendix
-                outfile.write(f"{line}{appendix}\n")
-                sequence = ""
-            else:
-                sequence += line
-        # Write the last sequence after file is fully read
-        if sequence:
-            for i in range(0, len(sequence), line_length):
-                outfile.write(sequence[i:i+line_length] + "\n")
+
+    fastaio.rewrap_fasta(input_file, output_file, line_length, appendix)
     print(f"Formatted FASTA file written to {output_file}")
 
 input_file = Path("../DB/Marcus_File/marcus_file.fasta")
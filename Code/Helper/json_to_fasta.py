@@ -1,57 +1,193 @@
 import time
-import json
 import os
+from contextlib import ExitStack
+from Helper import fastaio
+from Helper import jsonio
 
-def json_to_fasta_simple(input_file, output_folder):
+# File name of the concatenated FASTA file written in packed mode
+PACKED_FILE_NAME = "operons.fasta"
+# Suffix of the offset index written next to a packed FASTA file
+OPERON_INDEX_SUFFIX = ".idx"
+
+def operon_records(entry):
     """
-    Converts a JSON file with operon entries to separate FASTA files per operon.
+    Builds the FASTA records of all Cas proteins of one operon entry.
     The FASTA header contains operon_id, gene_name, length, score, and all metadata fields.
+
+    Args:
+        entry (dict): One operon entry of the CRISPR-Cas Atlas.
+    Returns:
+        list: List of (header, sequence) tuples, headers without the leading '>'.
     """
-    os.makedirs(output_folder, exist_ok=True)
+    operon_id = entry.get("operon_id", "unknown_operon")
+    records = []
+    for cas in entry.get("cas", []):
+        # Extract fields
+        cas_id = cas.get("id", operon_id)
+        gene_name = cas.get("gene_name", "unknown_gene")
+        length = cas.get("length", "NA")
+        score = cas.get("score", "NA")
+        source_db = cas.get("source_db", "NA")
+        assembly_type = cas.get("assembly_type", "NA")
+        biosample_id = cas.get("biosample_id", "NA")
+        sample_name = cas.get("sample_name", "NA")
+        taxonomy = cas.get("taxonomy", "NA")
+        biome = cas.get("biome", "NA")
+        subtype = cas.get("subtype", "NA")
+        protein_seq = cas.get("protein", "")
 
-    # Load JSON data
-    with open(input_file, "r") as f:
-        data = json.load(f)
+        # Build header
+        header = f"{cas_id}|gene_name={gene_name}|length={length}|score={score}|source_db:{source_db}|assembly_type:{assembly_type}|biosample_id:{biosample_id}|sample_name:{sample_name}|taxonomy:{taxonomy}|biome:{biome}|subtype={subtype}"
+        records.append((header, protein_seq))
+    return records
 
-    print(f"Loaded {len(data)} entries from JSON")
-    print(f"First entry keys: {list(data[0].keys()) if data else 'No data'}")
+class OperonPack:
+    """
+    Writes the records of many operons into one concatenated FASTA file plus an
+    offset index keyed by operon_id, instead of one small FASTA file per operon.
+    Use as a context manager; the index is written when the pack is closed. Pack
+    and index are written to temporary files and only renamed on close, so an
+    interrupted run leaves no pack without a matching index.
+
+    The index is a tab-separated file next to the FASTA file (suffix OPERON_INDEX_SUFFIX)
+    with the columns operon_id, offset, length and records. offset and length are
+    the byte range of the operon in the FASTA file, see read_operon.
+
+    Args:
+        output_file (str or Path): Path to the concatenated FASTA file.
+        block_size (int): Number of bytes collected before each write.
+    """
 
-    # If the JSON is a single dict, wrap it in a list for uniform processing
-    if isinstance(data, dict):
-        data = [data]
+    def __init__(self, output_file, block_size=fastaio.BLOCK_SIZE):
+        self.output_file = output_file
+        self.block_size = block_size
+        self.index = {}
+        self._offset = 0
+        self._batch = []
+        self._batch_size = 0
+        self._temp_file = fastaio.temp_path(output_file)
+        self._handle = open(self._temp_file, "wb")
+
+    def add(self, operon_id, records):
+        """Appends the (header, sequence) records of one operon to the pack."""
+        data = "".join(fastaio.format_record(header, sequence, None) for header, sequence in records).encode("utf-8")
+        # A repeated operon_id points to its last occurrence, as an overwritten file would
+        self.index[operon_id] = (self._offset, len(data), len(records))
+        self._offset += len(data)
+        self._batch.append(data)
+        self._batch_size += len(data)
+        if self._batch_size >= self.block_size:
+            self._handle.write(b"".join(self._batch))
+            self._batch = []
+            self._batch_size = 0
+
+    def close(self):
+        """Writes the remaining records and the offset index."""
+        self._handle.write(b"".join(self._batch))
+        self._batch = []
+        self._handle.close()
+        index_path = f"{self.output_file}{OPERON_INDEX_SUFFIX}"
+        with fastaio.atomic_output(index_path) as temp_index, open(temp_index, "w", encoding="utf-8") as index_file:
+            index_file.write("operon_id\toffset\tlength\trecords\n")
+            index_file.writelines(
+                f"{operon_id}\t{offset}\t{length}\t{count}\n"
+                for operon_id, (offset, length, count) in self.index.items()
+            )
+            # Both renames happen only after pack and index are complete
+            os.replace(self._temp_file, self.output_file)
+
+    def discard(self):
+        """Closes the pack without replacing the output files."""
+        self._batch = []
+        self._handle.close()
+        self._temp_file.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+def load_operon_index(pack_file):
+    """
+    Loads the offset index of an operon pack written by OperonPack.
 
+    Args:
+        pack_file (str or Path): Path to the concatenated FASTA file.
+    Returns:
+        dict: Mapping operon_id -> (offset, length, records).
+    """
+    index = {}
+    with open(f"{pack_file}{OPERON_INDEX_SUFFIX}", "r", encoding="utf-8") as index_file:
+        next(index_file)
+        for line in index_file:
+            operon_id, offset, length, count = line.rstrip("\n").split("\t")
+            index[operon_id] = (int(offset), int(length), int(count))
+    return index
+
+def read_operon(pack_file, operon_id, index=None):
+    """
+    Reads the records of one operon from an operon pack with a single seek.
+
+    Args:
+        pack_file (str or Path): Path to the concatenated FASTA file.
+        operon_id (str): Operon to read.
+        index (dict): Index from load_operon_index. Loaded from disk if not given;
+                      pass it in when reading many operons.
+    Returns:
+        list: List of (header, sequence) tuples. Raises KeyError for an unknown operon_id.
+    """
+    if index is None:
+        index = load_operon_index(pack_file)
+    offset, length, _ = index[operon_id]
+    with open(pack_file, "rb") as handle:
+        handle.seek(offset)
+        data = handle.read(length).decode("utf-8")
+    texts = fastaio.iter_record_texts([data])
+    # Skip the (empty) preamble in front of the first header
+    next(texts)
+    return [fastaio.parse_record(text) for text in texts]
+
+def json_to_fasta_simple(input_file, output_folder, packed=False):
+    """
+    Converts a JSON file with operon entries to separate FASTA files per operon.
+    The FASTA header contains operon_id, gene_name, length, score, and all metadata fields.
+
+    Args:
+        input_file (str or Path): Path to the JSON file with operon entries.
+        output_folder (str or Path): Folder for the FASTA files.
+        packed (bool): Write all operons into one concatenated FASTA file
+                       (PACKED_FILE_NAME in output_folder) with an offset index
+                       instead of one file per operon, see OperonPack.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Stream the entries; a JSON array, a single object and JSON Lines are all supported
+    entries = 0
     processed_operons = 0
-    for entry in data:
-        operon_id = entry.get("operon_id", "unknown_operon")
-        # Write all Cas proteins to a FASTA file for this operon
-        cas_list = entry.get("cas", [])
-        #print(f"Processing operon: {operon_id}, cas_list length: {len(cas_list)}")
-        
-        if cas_list:
-            processed_operons += 1
-            fasta_path = os.path.join(output_folder, f"{operon_id}.fasta")
-            with open(fasta_path, "w") as fasta:
-                for cas in cas_list:
-                    # Extract fields
-                    cas_id = cas.get("id", operon_id)
-                    gene_name = cas.get("gene_name", "unknown_gene")
-                    length = cas.get("length", "NA")
-                    score = cas.get("score", "NA")
-                    source_db = cas.get("source_db", "NA")
-                    assembly_type = cas.get("assembly_type", "NA")
-                    biosample_id = cas.get("biosample_id", "NA")
-                    sample_name = cas.get("sample_name", "NA")
-                    taxonomy = cas.get("taxonomy", "NA")
-                    biome = cas.get("biome", "NA")
-                    subtype = cas.get("subtype", "NA")
-                    protein_seq = cas.get("protein", "")
-                    
-                    # Build header
-                    header = f">{cas_id}|gene_name={gene_name}|length={length}|score={score}|source_db:{source_db}|assembly_type:{assembly_type}|biosample_id:{biosample_id}|sample_name:{sample_name}|taxonomy:{taxonomy}|biome:{biome}|subtype={subtype}"
-                    
-                    fasta.write(header + "\n")
-                    fasta.write(protein_seq + "\n")
+    with ExitStack() as stack:
+        # The pack is discarded if streaming the JSON fails
+        pack = stack.enter_context(OperonPack(os.path.join(output_folder, PACKED_FILE_NAME))) if packed else None
+        for entry in jsonio.iter_json_items(input_file):
+            if not entries:
+                print(f"First entry keys: {list(entry.keys())}")
+            entries += 1
+            operon_id = entry.get("operon_id", "unknown_operon")
+            # Write all Cas proteins to a FASTA file for this operon
+            records = operon_records(entry)
+
+            if records:
+                processed_operons += 1
+                if pack is not None:
+                    pack.add(operon_id, records)
+                else:
+                    fasta_path = os.path.join(output_folder, f"{operon_id}.fasta")
+                    fastaio.write_fasta(records, fasta_path, line_length=None)
 
+    print(f"Loaded {entries} entries from JSON")
     print(f"Processed {processed_operons} operons with cas proteins")
     print(f"Finished creating FASTA out of JSON. File saved in {output_folder}")
 
@@ -63,7 +199,7 @@ output_folder = "../DB/CRISPR-Cas_Atlas/FASTA"
 if __name__ == "__main__":
     start_time = time.time()
 
-    json_to_fasta_simple(input_file, output_folder)
+    json_to_fasta_simple(input_file, output_folder, packed=True)
 
     end_time = time.time()
 
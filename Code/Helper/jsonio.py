@@ -0,0 +1,174 @@
+import json
+import re
+from Helper import compressed_io
+from Helper import fastaio
+
+WHITESPACE = " \t\n\r"
+# Characters that change the nesting of an object or array outside of strings
+STRUCTURE = re.compile(r'["\[\]{}]')
+# Characters that end a string or escape the next character inside it
+STRING_SPECIAL = re.compile(r'["\\]')
+# Characters that end a top-level number or literal
+SCALAR_END = re.compile(r"[\s,\]}]")
+
+
+def iter_json_items(input_file, block_size=fastaio.BLOCK_SIZE):
+    """
+    Streams the items of a JSON file one at a time instead of loading the whole file.
+    Compressed files (gzip, bgzip, zstd) are decompressed on the fly.
+
+    Supports a top-level JSON array (the items of the array are yielded), a single
+    top-level object and JSON Lines (every object is yielded). Only the current
+    item and one read block are held in memory.
+
+    An item that continues in the next block is not decoded again after every
+    block: its end is searched with a scan that resumes where the previous block
+    ended, and the item is decoded once it is complete. A number or literal is
+    only decoded once the character after it has been read, or at the end of the
+    file, so a number cut at a block boundary is never read as a shorter one.
+
+    Args:
+        input_file (str or Path): Path to the JSON or JSON Lines file.
+        block_size (int): Number of bytes read per block.
+    Returns:
+        generator: Generator of the decoded items.
+    """
+    decoder = json.JSONDecoder()
+    blocks = fastaio.read_blocks(input_file, block_size)
+    buffer = ""
+    pos = 0
+    exhausted = False
+    in_array = None
+    # (scan offset relative to pos, nesting depth, inside a string) of an incomplete item
+    scan_state = None
+
+    def refill():
+        nonlocal buffer, pos, exhausted
+        block = next(blocks, None)
+        if block is None:
+            exhausted = True
+            return False
+        buffer = buffer[pos:] + block
+        pos = 0
+        return True
+
+    while True:
+        # Skip whitespace and item separators
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or not refill():
+                break
+        if pos >= len(buffer):
+            if in_array:
+                raise ValueError(f"Unexpected end of JSON array in {input_file}")
+            return
+
+        char = buffer[pos]
+        if in_array is None:
+            in_array = char == "["
+            if in_array:
+                pos += 1
+                continue
+        if in_array and char == "]":
+            return
+        if in_array and char == ",":
+            pos += 1
+            continue
+
+        if char in "{[\"":
+            # Resume the scan of an item that continues in the next block
+            scan, depth, in_string = scan_state or (0, 0, False)
+            end, scan, depth, in_string = _item_end(buffer, pos + scan, depth, in_string)
+            if end is None:
+                scan_state = (scan - pos, depth, in_string)
+                if refill():
+                    continue
+        elif SCALAR_END.search(buffer, pos) is None and refill():
+            # The number or literal may continue in the next block
+            continue
+        scan_state = None
+        item, end = decoder.raw_decode(buffer, pos)
+        pos = end
+        yield item
+
+
+def _item_end(buffer, scan, depth, in_string):
+    """
+    Searches the end of the object, array or string that starts at the scan
+    position, or continues the search with the state returned by a previous call.
+
+    Args:
+        buffer (str): Text that contains the item.
+        scan (int): Offset to continue the scan at.
+        depth (int): Nesting depth of objects and arrays at `scan`.
+        in_string (bool): Whether `scan` is inside a string.
+    Returns:
+        tuple: (offset after the item or None if it continues after the buffer,
+               scan offset, depth, in_string) to continue the scan with.
+    """
+    while True:
+        if in_string:
+            match = STRING_SPECIAL.search(buffer, scan)
+            if match is None:
+                return None, len(buffer), depth, True
+            if match.group() == "\\":
+                if match.end() >= len(buffer):
+                    # The escaped character is in the next block
+                    return None, match.start(), depth, True
+                scan = match.end() + 1
+                continue
+            scan = match.end()
+            in_string = False
+        else:
+            match = STRUCTURE.search(buffer, scan)
+            if match is None:
+                return None, len(buffer), depth, False
+            scan = match.end()
+            if match.group() == '"':
+                in_string = True
+                continue
+            depth += 1 if match.group() in "[{" else -1
+        if depth == 0:
+            return scan, scan, depth, in_string
+
+
+def write_json_items(items, output_file, json_lines=False, block_size=fastaio.BLOCK_SIZE):
+    """
+    Writes items as compact JSON while they are produced. Output files ending in
+    .gz, .bgz or .zst are compressed.
+
+    Args:
+        items (iterable): Iterable of JSON-serializable items.
+        output_file (str or Path): Path to the output file.
+        json_lines (bool): Write one item per line (JSON Lines) instead of a JSON array.
+        block_size (int): Number of characters collected before each write.
+    Returns:
+        int: Number of items written.
+    """
+    count = 0
+    batch = []
+    batch_size = 0
+    separator = "\n" if json_lines else ",\n"
+    compression = compressed_io.from_suffix(output_file)
+    with fastaio.atomic_output(output_file) as temp_file, compressed_io.open_text_output(temp_file, compression) as outfile:
+        if not json_lines:
+            outfile.write("[\n")
+        for item in items:
+            text = json.dumps(item, separators=(",", ":"))
+            if count:
+                batch.append(separator)
+            batch.append(text)
+            batch_size += len(text)
+            count += 1
+            if batch_size >= block_size:
+                outfile.write("".join(batch))
+                batch = []
+                batch_size = 0
+        outfile.write("".join(batch))
+        if json_lines:
+            if count:
+                outfile.write("\n")
+        else:
+            outfile.write("\n]\n")
+    return count
@@ -0,0 +1,371 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from Helper import fastaio
+
+# Amino acids with their own code, all other letters share the code UNKNOWN
+ALPHABET = "ACDEFGHIKLMNPQRSTVWY"
+UNKNOWN = len(ALPHABET)
+ALPHABET_SIZE = UNKNOWN + 1
+# Code used to pad representatives to the same length, never equal to a residue
+PADDING = 255
+# Largest number of k-mer counters per sequence; longer words are hashed into them
+MAX_KMER_BUCKETS = 1 << 12
+# Number of queries handed to a worker at a time
+BATCH_SIZE = 64
+# Number of representatives aligned against a query at once
+ALIGN_CHUNK = 256
+# Cost of a gap position in the alignment, an identical residue scores 1
+GAP_PENALTY = 1
+# Cells on each side of the diagonal aligned (CD-HIT -b)
+BAND_WIDTH = 20
+# Score of cells outside the sequences, low enough to never win a maximum
+NO_SCORE = -(1 << 28)
+# Number of query residues between two checks for hopeless alignments
+ABANDON_INTERVAL = 16
+
+# Byte -> residue code
+CODES = np.full(256, UNKNOWN, dtype=np.uint8)
+for code, residue in enumerate(ALPHABET):
+    CODES[ord(residue)] = CODES[ord(residue.lower())] = code
+
+# Sequences and parameters of the worker processes, see _init_worker
+_state = {}
+
+
+def encode(sequence):
+    """
+    Encodes a protein sequence as an array of residue codes (0 to ALPHABET_SIZE - 1).
+    """
+    return CODES[np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)]
+
+
+def kmer_words(codes, word_length):
+    """
+    Returns the k-mers (words) of an encoded sequence as integers, one per start position.
+    """
+    words = len(codes) - word_length + 1
+    kmers = np.zeros(max(words, 0), dtype=np.int64)
+    for offset in range(word_length):
+        kmers = kmers * ALPHABET_SIZE + codes[offset:offset + len(kmers)]
+    return kmers
+
+
+def kmer_counts(words, buckets):
+    """
+    Counts the k-mers of a sequence.
+
+    Args:
+        words (np.ndarray): Words of the sequence, see kmer_words.
+        buckets (int): Number of counters. Words are hashed into them with a modulo,
+                       so collisions can only increase the counts.
+    Returns:
+        np.ndarray: uint16 counts of length `buckets`.
+    """
+    counts = np.bincount(words % buckets, minlength=buckets)
+    return np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16)
+
+
+def best_diagonal(query_words, rep_words, rep_order):
+    """
+    Finds the diagonal (offset of the representative against the query) with the
+    most shared words, the center of the alignment band like in CD-HIT.
+
+    Args:
+        query_words (np.ndarray): Words of the query, see kmer_words.
+        rep_words (np.ndarray): Sorted words of the representative.
+        rep_order (np.ndarray): Start position of every sorted representative word.
+    Returns:
+        int: Diagonal d, residue i of the query lies on residue i + d of the representative.
+    """
+    low = np.searchsorted(rep_words, query_words, "left")
+    counts = np.searchsorted(rep_words, query_words, "right") - low
+    total = int(counts.sum())
+    if not total:
+        return 0
+    # Positions of all word pairs, without a Python loop over the query words
+    starts = np.repeat(low - (np.cumsum(counts) - counts), counts) + np.arange(total)
+    diagonals = rep_order[starts] - np.repeat(np.arange(len(query_words)), counts)
+    return int(np.bincount(diagonals + len(query_words)).argmax()) - len(query_words)
+
+
+def alignment_scores(query, targets, diagonals, band_width=BAND_WIDTH, gap_penalty=GAP_PENALTY, minimum=None):
+    """
+    Aligns a query with several targets at once within a band around a diagonal
+    per target (CD-HIT -b) and returns the best score per target. Identical
+    residues score 1, different residues 0 and every gap position costs
+    `gap_penalty`. The whole query is aligned, gaps before and after the target
+    are free (semi-global alignment), so a query inside a longer representative
+    is not penalized for the overhanging ends.
+
+    The band cells of one query residue (row) are computed for all targets
+    together. The gaps within a row are resolved with a running maximum
+    (np.maximum.accumulate): H[k] = max over l <= k of (T[l] - g * (k - l)),
+    which is max.accumulate(T + g * k) - g * k.
+
+    With `minimum`, targets that cannot reach it any more (best score of the
+    current row plus one per remaining query residue) are dropped on the way.
+
+    Args:
+        query (np.ndarray): Encoded query sequence.
+        targets (list): Encoded target sequences.
+        diagonals (list): Band center per target, see best_diagonal.
+        band_width (int): Cells on each side of the diagonal.
+        gap_penalty (int): Cost of a gap position.
+        minimum (int): Score of interest, None computes all scores.
+    Returns:
+        np.ndarray: Best alignment score per target. Scores below `minimum` can be
+                    upper bounds instead of exact scores.
+    """
+    length = len(query)
+    width = 2 * band_width + 1
+    lengths = np.array([len(target) for target in targets])
+    # Target position (1-based, j) of the first band cell in row 0
+    first = np.asarray(diagonals, dtype=np.int64) - band_width
+    # shifted[:, i + k] is the target residue j - 1 of band cell k in row i
+    shifted = np.full((len(targets), length + width), PADDING, dtype=np.uint8)
+    for row, target in enumerate(targets):
+        start = max(0, 1 - first[row])
+        stop = min(length + width, len(target) + 1 - first[row])
+        if stop > start:
+            shifted[row, start:stop] = target[start + first[row] - 1:stop + first[row] - 1]
+    # Match table per residue code, looked up instead of compared in every row
+    matches = shifted[None, :, :] == np.arange(ALPHABET_SIZE, dtype=np.uint8)[:, None, None]
+
+    scores = np.full(len(targets), NO_SCORE, dtype=np.int64)
+    alive = np.arange(len(targets))
+    ramp = np.arange(width, dtype=np.int32) * gap_penalty
+    columns = first[:, None] + np.arange(width)[None, :]
+    previous = np.where((columns >= 0) & (columns <= lengths[:, None]), 0, NO_SCORE).astype(np.int32)
+    current = np.empty_like(previous)
+    # Cells behind the end of a target never influence cells within it, they are
+    # only excluded from the result. Cells in front of the target start stay at NO_SCORE.
+    for row in range(1, length + 1):
+        if minimum is not None and not row % ABANDON_INTERVAL:
+            bounds = previous.max(axis=1) + (length - row + 1)
+            keep = bounds >= minimum
+            if not keep.all():
+                scores[alive[~keep]] = bounds[~keep]
+                if not keep.any():
+                    return scores
+                alive, first, matches, previous = alive[keep], first[keep], matches[:, keep], previous[keep]
+                current = np.empty_like(previous)
+        # Diagonal step with a match, or a gap in the target (cell above)
+        np.add(previous, matches[query[row - 1], :, row:row + width], out=current)
+        np.maximum(current[:, :-1], previous[:, 1:] - gap_penalty, out=current[:, :-1])
+        # Query residues in front of the target cost one gap each (column j = 0)
+        start_cells = -first - row
+        in_band = np.flatnonzero((start_cells >= 0) & (start_cells < width))
+        if len(in_band):
+            current[in_band, start_cells[in_band]] = -gap_penalty * row
+        # Gaps in the query (cell to the left)
+        current += ramp
+        np.maximum.accumulate(current, axis=1, out=current)
+        current -= ramp
+        previous, current = current, previous
+    columns = first[:, None] + np.arange(width)[None, :] + length
+    previous[columns > lengths[alive, None]] = NO_SCORE
+    scores[alive] = previous.max(axis=1)
+    return scores
+
+
+def required_common_words(length, identity, word_length):
+    """
+    Smallest number of words a sequence of `length` residues shares with every
+    sequence it is at least `identity` identical to (the short word filter of CD-HIT).
+    """
+    return length - word_length + 1 - math.ceil((1 - identity) * length) * word_length
+
+
+def _init_worker(codes, identity, word_length, band_width):
+    buckets = min(ALPHABET_SIZE ** word_length, MAX_KMER_BUCKETS)
+    _state.update(codes=codes, identity=identity, word_length=word_length, band_width=band_width, buckets=buckets, words={})
+
+
+def _words(index):
+    """Returns (words, counts, sorted words, start positions of the sorted words) of a sequence, cached."""
+    words = _state["words"].get(index)
+    if words is None:
+        kmers = kmer_words(_state["codes"][index], _state["word_length"]).astype(np.int32)
+        order = np.argsort(kmers, kind="stable")
+        words = _state["words"][index] = (kmers, kmer_counts(kmers, _state["buckets"]), kmers[order], order)
+    return words
+
+
+def _first_hit(query, reps, rep_counts=None):
+    """
+    Finds the first representative (in the order of `reps`) the query is at least
+    `identity` identical to. The identity is the alignment score divided by the
+    length of the query, which is never longer than the representatives.
+
+    Returns:
+        tuple: (representative, identity), or (-1, 0.0) if there is none.
+    """
+    if not reps:
+        return -1, 0.0
+    codes = _state["codes"]
+    query_codes = codes[query]
+    length = len(query_codes)
+    if not length:
+        return -1, 0.0
+
+    # Word filter: compare the k-mer counts with all representatives at once
+    query_words, query_counts, _, _ = _words(query)
+    if rep_counts is None:
+        rep_counts = np.stack([_words(rep)[1] for rep in reps])
+    common = np.minimum(rep_counts, query_counts).sum(axis=1, dtype=np.int64)
+    needed = required_common_words(length, _state["identity"], _state["word_length"])
+    candidates = [reps[i] for i in np.flatnonzero(common >= needed)]
+
+    minimum_matches = math.ceil(_state["identity"] * length - 1e-9)
+    for start in range(0, len(candidates), ALIGN_CHUNK):
+        chunk = candidates[start:start + ALIGN_CHUNK]
+        diagonals = [best_diagonal(query_words, *_words(rep)[2:]) for rep in chunk]
+        scores = alignment_scores(
+            query_codes, [codes[rep] for rep in chunk], diagonals, _state["band_width"], minimum=minimum_matches
+        )
+        hits = np.flatnonzero(scores >= minimum_matches)
+        if len(hits):
+            return chunk[hits[0]], float(scores[hits[0]]) / length
+    return -1, 0.0
+
+
+def _compare_batch(queries, reps):
+    """Compares a batch of queries with the same representatives in a worker process."""
+    rep_counts = np.stack([_words(rep)[1] for rep in reps]) if reps else None
+    return [_first_hit(query, reps, rep_counts) for query in queries]
+
+
+def cluster_sequences(sequences, identity=0.5, word_length=2, workers=None, band_width=BAND_WIDTH, batch_size=BATCH_SIZE):
+    """
+    Greedy incremental clustering like CD-HIT: the sequences are visited from the
+    longest to the shortest and each one joins the first representative it is at
+    least `identity` identical to, or becomes a new representative.
+
+    Before any alignment, the k-mer counts of a query are compared with those of
+    all representatives in one vectorized step and only representatives passing
+    the short word filter of CD-HIT are aligned. Like in CD-HIT the alignment is
+    restricted to a band around the diagonal with the most shared words. The
+    identity is the score of this semi-global alignment (identical residue +1,
+    gap position -1, see alignment_scores) divided by the query length. It is a
+    lower bound of the fraction of identical residues, and no substitution matrix
+    is used, so the clusters can differ slightly from those of CD-HIT.
+
+    Batches of queries are compared with the current representatives in worker
+    processes. Queries without a hit are then compared with the representatives
+    created within the same batch in order, so the result is the same as with a
+    single process. That serial part is limited by keeping the batches small
+    while there are few representatives.
+
+    Args:
+        sequences (list): Protein sequences.
+        identity (float): Identity threshold (CD-HIT -c).
+        word_length (int): Word length of the filter (CD-HIT -n).
+        workers (int): Number of worker processes (CD-HIT -T, default: number of CPUs).
+        band_width (int): Band width of the alignment (CD-HIT -b).
+        batch_size (int): Number of queries per worker task.
+    Returns:
+        list: (representative index, identity) per sequence; a representative
+              points to itself with identity 1.0.
+    """
+    workers = workers or os.cpu_count() or 1
+    codes = [encode(sequence) for sequence in sequences]
+    order = sorted(range(len(sequences)), key=lambda index: (-len(codes[index]), index))
+    assignment = [None] * len(sequences)
+    reps = []
+
+    _init_worker(codes, identity, word_length, band_width)
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(codes, identity, word_length, band_width))
+    try:
+        start = 0
+        while start < len(order):
+            # Queries without a hit are compared serially with the new representatives
+            # of their block, up to block size^2 / 2 comparisons. While there are few
+            # representatives most queries miss, so the block is kept at most as large
+            # as the number of representatives and grows with it.
+            step = min(batch_size * workers, max(workers, len(reps)))
+            block = order[start:start + step]
+            start += len(block)
+            size = -(-len(block) // workers)
+            batches = [block[i:i + size] for i in range(0, len(block), size)]
+            if executor is None:
+                results = [_compare_batch(batch, reps) for batch in batches]
+            else:
+                results = list(executor.map(_compare_batch, batches, [tuple(reps)] * len(batches)))
+
+            new_reps = []
+            for query, (rep, query_identity) in zip(block, (hit for result in results for hit in result)):
+                if rep < 0:
+                    rep, query_identity = _first_hit(query, new_reps)
+                if rep < 0:
+                    reps.append(query)
+                    new_reps.append(query)
+                    rep, query_identity = query, 1.0
+                assignment[query] = (rep, query_identity)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return assignment
+
+
+def write_clstr(clstr_file, names, lengths, assignment):
+    """
+    Writes clusters in the .clstr format of CD-HIT: clusters in the order their
+    representatives were created, members in input order, the representative
+    marked with '*' and all others with their identity.
+
+    Args:
+        clstr_file (str or Path): Path to the .clstr file.
+        names (list): Sequence names (first word of the header).
+        lengths (list): Sequence lengths.
+        assignment (list): Result of cluster_sequences.
+    """
+    members = {}
+    for index, (rep, _) in enumerate(assignment):
+        members.setdefault(rep, []).append(index)
+    # Representatives were created from the longest to the shortest sequence
+    clusters = sorted(members, key=lambda rep: (-lengths[rep], rep))
+
+    with fastaio.atomic_output(clstr_file) as temp_file, open(temp_file, "w", encoding="utf-8") as handle:
+        for number, rep in enumerate(clusters):
+            lines = [f">Cluster {number}\n"]
+            for position, index in enumerate(members[rep]):
+                if index == rep:
+                    mark = "*"
+                else:
+                    mark = f"at {assignment[index][1] * 100:.2f}%"
+                lines.append(f"{position}\t{lengths[index]}aa, >{names[index]}... {mark}\n")
+            handle.write("".join(lines))
+
+
+def cluster_fasta(input_file, output_file, identity=0.5, word_length=2, workers=None):
+    """
+    Built-in replacement for `cd-hit -i input_file -o output_file -c identity -n word_length`.
+    Writes the representatives to `output_file` (in input order) and the clusters
+    to `output_file`.clstr, see cluster_sequences and write_clstr.
+
+    Args:
+        input_file (str or Path): Path to the protein FASTA file.
+        output_file (str or Path): Path to the FASTA file of the representatives.
+        identity (float): Identity threshold (CD-HIT -c).
+        word_length (int): Word length of the filter (CD-HIT -n).
+        workers (int): Number of worker processes (CD-HIT -T).
+    Returns:
+        tuple: (number of input sequences, number of clusters)
+    """
+    start = time.perf_counter()
+    records = list(fastaio.read_fasta(input_file))
+    sequences = [sequence for _, sequence in records]
+    assignment = cluster_sequences(sequences, identity, word_length, workers)
+
+    rep_records = [record for index, record in enumerate(records) if assignment[index][0] == index]
+    fastaio.write_fasta(rep_records, output_file)
+    names = [header.split(maxsplit=1)[0] if header else "" for header, _ in records]
+    write_clstr(f"{output_file}.clstr", names, [len(sequence) for sequence in sequences], assignment)
+
+    print(f"{len(records)} sequences clustered into {len(rep_records)} clusters in {time.perf_counter() - start:.1f} s")
+    return len(records), len(rep_records)
@@ -1,71 +1,188 @@
 #!/usr/bin/env python3
 
+import errno
+import os
 import time
 import sys
 from pathlib import Path
+from Helper import compressed_io
+from Helper import fastaio
 
-def merge_fasta_files_all_dict(source_folder: Path, output_file: Path, ending):
+# Largest number of bytes handed to a single kernel copy call
+COPY_CHUNK = 1 << 30
+# Errors of copy_file_range and sendfile that mean the method is not supported here
+FALLBACK_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EBADF, errno.ETXTBSY}
+
+def merge_fasta_files_all_dict(source_folder: Path, output_file: Path, ending, count_sequences=True):
     """
     Merge all FASTA files from the source folder (including subfolders) into a single output file.
 
     Args:
         source_folder (path): path to the source folder
         output_file (path): path to the output_file
+        count_sequences (bool): Count the merged sequences, see merge_files
     """
 
-    #Ensure the output folder exists
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    # Check if the output file already exists
-    output_file.touch(exist_ok=True)
-
-    with open(output_file, 'w') as outfile:
-        processed_sequences = 0
+    # Recursively iterate over all FASTA files
+    fasta_files = [path for pattern in _patterns(ending) for path in Path(source_folder).resolve().rglob(pattern)]
+    processed_files, processed_sequences = merge_files(fasta_files, output_file, count_sequences)
 
-        # Recursively iterate over all FASTA files
-        for fasta_file in Path(source_folder).resolve().rglob(f"*.{ending}"):
-            if fasta_file.resolve() == output_file.resolve():
-                # Skip the output file if it already exists
-                continue
-            with open(fasta_file, 'r') as infile:
-                contents = infile.read()
-                outfile.write(contents)
-        
-            processed_sequences += 1
-            #print(f"Added {fasta_file.name}")
-    
-    print(f"Sequences added: {processed_sequences}")
+    print(_summary(processed_files, processed_sequences))
     print(f"All files have been merged into {output_file}")
 
-def merge_fasta_files_current_dir(source_folder: Path, output_file: Path, ending):
+def merge_fasta_files_current_dir(source_folder: Path, output_file: Path, ending, count_sequences=True):
     """
     Merge all FASTA files from the source folder (only current directory, no subfolders) into a single output file.
 
     Args:
         source_folder (str): path to the source folder
         output_file (str): path to the output_file
+        count_sequences (bool): Count the merged sequences, see merge_files
+    """
+
+    # Iterate only over FASTA files in the current directory
+    fasta_files = [path for pattern in _patterns(ending) for path in Path(source_folder).resolve().glob(pattern)]
+    processed_files, processed_sequences = merge_files(fasta_files, output_file, count_sequences)
+
+    print(f"\n{_summary(processed_files, processed_sequences)}")
+    print(f"All files in current directory have been merged into {output_file}")
+
+def merge_files(fasta_files, output_file: Path, count_sequences=True):
+    """
+    Concatenates FASTA files into one output file.
+
+    By default every input is streamed in large blocks and its headers are
+    counted in the same pass. Without `count_sequences` the file contents are
+    copied inside the kernel (copy_file_range, or sendfile as fallback) without
+    passing through Python. A newline is inserted after every
+    input that does not end with one, so the next header always starts on a new
+    line. The output file itself is skipped if it is among the inputs. The
+    output is written to a temporary file and renamed when all inputs are copied.
+
+    Compressed inputs (gzip, bgzip, zstd) are decompressed while they are copied,
+    and an output ending in .gz, .bgz or .zst is compressed; in these cases the
+    data is streamed through Python instead of the kernel copy.
+
+    Args:
+        fasta_files (iterable): Paths of the FASTA files to merge, in order.
+        output_file (path): path to the output_file
+        count_sequences (bool): Count the headers of the merged files (default: True).
+    Returns:
+        tuple: (number of merged files, number of merged sequences or None
+               without `count_sequences`)
     """
-    
+
     #Ensure the output folder exists
+    output_file = Path(output_file)
     output_file.parent.mkdir(parents=True, exist_ok=True)
-    # Check if the output file already exists
-    output_file.touch(exist_ok=True)
+    output_path = output_file.resolve()
 
-    with open(output_file, 'w') as outfile:
-        processed_sequences = 0
+    compression = compressed_io.from_suffix(output_file)
 
-        # Iterate only over FASTA files in the current directory
-        for fasta_file in Path(source_folder).resolve().glob(f"*.{ending}"):
-            if fasta_file.resolve() == output_file.resolve():
+    processed_files = 0
+    processed_sequences = 0 if count_sequences else None
+    # The merged file replaces the output only once it is complete
+    with fastaio.atomic_output(output_file) as temp_file, _open_output(temp_file, compression) as outfile:
+        for fasta_file in fasta_files:
+            if Path(fasta_file).resolve() == output_path:
                 # Skip the output file if it already exists
                 continue
-            with open(fasta_file, 'r') as infile:
-                contents = infile.read()
-                outfile.write(contents)
-            processed_sequences += 1
+            if count_sequences or compression is not None or compressed_io.sniff(fasta_file):
+                sequences, last_byte = _stream_file(fasta_file, outfile)
+                if last_byte != b"\n":
+                    outfile.write(b"\n")
+                if count_sequences:
+                    processed_sequences += sequences
+                processed_files += 1
+                continue
+            with open(fasta_file, 'rb') as infile:
+                size = os.fstat(infile.fileno()).st_size
+                if size:
+                    _copy_file(infile, outfile, size)
+                    # Repair a missing trailing newline so records are not glued together
+                    infile.seek(size - 1)
+                    if infile.read(1) != b"\n":
+                        outfile.write(b"\n")
+            processed_files += 1
             #print(f"Added {fasta_file.name}")
-    
-    print(f"\nSequences added: {processed_sequences}")
-    print(f"All files in current directory have been merged into {output_file}")
+
+    return processed_files, processed_sequences
+
+def _summary(processed_files, processed_sequences):
+    if processed_sequences is None:
+        return f"Files added: {processed_files}"
+    return f"Sequences added: {processed_sequences} from {processed_files} files"
+
+def _patterns(ending):
+    """Glob patterns of the files with the given ending, plain and compressed."""
+    return [f"*.{ending}"] + [f"*.{ending}{suffix}" for suffix in compressed_io.SUFFIXES]
+
+def _open_output(temp_file, compression):
+    if compression is None:
+        # Unbuffered, so the kernel copies and Python writes do not interleave
+        return open(temp_file, 'wb', buffering=0)
+    return compressed_io.open_output(temp_file, compression)
+
+def _stream_file(fasta_file, outfile):
+    """
+    Appends a plain or compressed FASTA file to an output stream block by block and
+    counts its records on the way.
+
+    Returns:
+        tuple: (number of records, last byte written or b"\\n" for an empty file)
+    """
+    count = 0
+    previous = b"\n"
+    with compressed_io.open_input(fasta_file) as infile:
+        for block in iter(lambda: infile.read(fastaio.BLOCK_SIZE), b""):
+            outfile.write(block)
+            count += block.count(b"\n>")
+            if previous == b"\n" and block.startswith(b">"):
+                count += 1
+            previous = block[-1:]
+    return count, previous
+
+def _copy_file(infile, outfile, size):
+    """
+    Appends `size` bytes of an open input file to an open, unbuffered output file,
+    using the fastest copy the platform and file systems support.
+
+    Raises:
+        OSError: If the input ends before `size` bytes were copied.
+    """
+    in_fd = infile.fileno()
+    out_fd = outfile.fileno()
+    remaining = size
+    for kernel_copy in (_copy_file_range, _sendfile):
+        try:
+            while remaining > 0:
+                copied = kernel_copy(in_fd, out_fd, remaining)
+                if not copied:
+                    break
+                remaining -= copied
+            break
+        except OSError as error:
+            # Only fall back if nothing has been copied by this method yet
+            if error.errno not in FALLBACK_ERRNOS or remaining != size:
+                raise
+    if remaining:
+        # No kernel copy available, or it stopped early: copy the rest through Python
+        infile.seek(size - remaining)
+        for block in iter(lambda: infile.read(min(remaining, fastaio.BLOCK_SIZE)), b""):
+            outfile.write(block)
+            remaining -= len(block)
+    if remaining:
+        raise OSError(errno.EIO, f"{infile.name} ended {remaining} bytes early while it was copied")
+
+def _copy_file_range(in_fd, out_fd, count):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available")
+    return os.copy_file_range(in_fd, out_fd, min(count, COPY_CHUNK))
+
+def _sendfile(in_fd, out_fd, count):
+    if not hasattr(os, "sendfile"):
+        raise OSError(errno.ENOSYS, "sendfile is not available")
+    return os.sendfile(out_fd, in_fd, None, min(count, COPY_CHUNK))
 
 if __name__ == "__main__":
 
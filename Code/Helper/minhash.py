@@ -0,0 +1,140 @@
+import os
+import numpy as np
+from Helper import fastaio
+from Helper import kmer_cluster
+
+# Length of the amino acid k-mers that are hashed
+KMER_SIZE = 6
+# Number of smallest hashes kept per sequence (bottom-s sketch)
+SKETCH_SIZE = 256
+# Version of the sketch file layout, stored in the file
+SKETCH_VERSION = 1
+# Constants of the splitmix64 finalizer used as hash function
+MIX_ADD = np.uint64(0x9E3779B97F4A7C15)
+MIX_MULTIPLY_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_MULTIPLY_2 = np.uint64(0x94D049BB133111EB)
+
+
+def hash_kmers(sequence, kmer_size=KMER_SIZE):
+    """
+    Hashes all k-mers of a protein sequence to 64 bit values. The k-mers are
+    rolled over the encoded sequence as integers (see kmer_cluster.kmer_words)
+    and mixed with the splitmix64 finalizer, so the hash order is random.
+
+    Returns:
+        np.ndarray: uint64 hash per k-mer start position.
+    """
+    words = kmer_cluster.kmer_words(kmer_cluster.encode(sequence), kmer_size).astype(np.uint64)
+    words += MIX_ADD
+    words ^= words >> np.uint64(30)
+    words *= MIX_MULTIPLY_1
+    words ^= words >> np.uint64(27)
+    words *= MIX_MULTIPLY_2
+    words ^= words >> np.uint64(31)
+    return words
+
+
+def sketch_sequence(sequence, kmer_size=KMER_SIZE, sketch_size=SKETCH_SIZE):
+    """Returns the bottom-s sketch of a sequence: its `sketch_size` smallest distinct k-mer hashes, sorted."""
+    return np.unique(hash_kmers(sequence, kmer_size))[:sketch_size]
+
+
+def sketch_fasta(fasta_file, sketch_file, kmer_size=KMER_SIZE, sketch_size=SKETCH_SIZE):
+    """
+    Returns the sketches of all sequences of a FASTA file. They are read from
+    `sketch_file` if it was made from the same FASTA file (size and modification
+    time) with the same parameters, otherwise computed and saved there.
+
+    Args:
+        fasta_file (str or Path): Path to the protein FASTA file.
+        sketch_file (str or Path): Path to the sketch file (.npz).
+        kmer_size (int): Length of the k-mers.
+        sketch_size (int): Number of hashes per sketch.
+    Returns:
+        tuple: (names, sketches) with the first word of every header and one
+               sorted uint64 array per sequence.
+    """
+    stat = os.stat(fasta_file)
+    header = [SKETCH_VERSION, kmer_size, sketch_size, stat.st_size, stat.st_mtime_ns]
+    if os.path.exists(sketch_file):
+        with np.load(sketch_file) as data:
+            if data["header"].tolist() == header:
+                offsets = data["offsets"]
+                hashes = data["hashes"]
+                sketches = [hashes[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+                return data["names"].tolist(), sketches
+
+    names = []
+    sketches = []
+    for record_header, sequence in fastaio.read_fasta(fasta_file):
+        words = record_header.split(maxsplit=1)
+        names.append(words[0] if words else "")
+        sketches.append(sketch_sequence(sequence, kmer_size, sketch_size))
+    offsets = np.zeros(len(sketches) + 1, dtype=np.int64)
+    np.cumsum([len(sketch) for sketch in sketches], out=offsets[1:])
+    with fastaio.atomic_output(sketch_file) as temp_file, open(temp_file, "wb") as handle:
+        np.savez(
+            handle,
+            header=np.array(header, dtype=np.int64),
+            names=np.array(names, dtype=str),
+            offsets=offsets,
+            hashes=np.concatenate(sketches) if sketches else np.zeros(0, dtype=np.uint64),
+        )
+    return names, sketches
+
+
+def mash_distances(sketches, kmer_size=KMER_SIZE, sketch_size=SKETCH_SIZE):
+    """
+    Computes the Mash distance of all pairs of sketches.
+
+    Like Mash, the Jaccard index j of two sequences is estimated from the
+    `sketch_size` smallest hashes of the union of both sketches: the fraction of
+    them that is in both sketches. The distance is -1/k * ln(2j / (1 + j)),
+    an estimate of the substitutions per residue, capped at 1.
+
+    The hashes are replaced by their rank among all hashes, and each sketch is
+    compared with all later sketches at once: a table with the number of hashes
+    of the sketch below every rank gives for every hash of the other sketches
+    whether it is shared and how many hashes of the sketch are smaller, which
+    gives its position in the union.
+
+    Args:
+        sketches (list): Sorted hash arrays, see sketch_fasta.
+        kmer_size (int): Length of the k-mers the sketches were built with.
+        sketch_size (int): Number of hashes per sketch.
+    Returns:
+        np.ndarray: Condensed float32 distance matrix, see distance_matrix.condensed_index.
+    """
+    n = len(sketches)
+    condensed = np.empty(n * (n - 1) // 2, dtype=np.float32)
+    if n < 2:
+        return condensed
+    vocabulary, ranks = np.unique(np.concatenate(sketches), return_inverse=True)
+    sizes = np.array([len(sketch) for sketch in sketches])
+    width = max(int(sizes.max()), 1)
+    # Ranks per sketch, padded with a rank larger than all hashes
+    padded = np.full((n, width), len(vocabulary), dtype=np.int32)
+    padded[np.arange(width)[None, :] < sizes[:, None]] = ranks
+    padded_next = padded + 1
+    positions = np.arange(1, width + 1, dtype=np.int32)
+    smaller = np.empty(len(vocabulary) + 2, dtype=np.int32)
+
+    offset = 0
+    for row in range(n - 1):
+        # smaller[r] = number of hashes of this sketch with a rank below r
+        smaller[:] = 0
+        smaller[padded_next[row, :sizes[row]]] = 1
+        np.cumsum(smaller, out=smaller)
+        below = smaller[padded[row + 1:]]
+        shared = smaller[padded_next[row + 1:]] > below
+        shared_so_far = np.cumsum(shared, axis=1, dtype=np.int32)
+        # Position of every hash of the other sketch in the sorted union of both sketches
+        union_position = positions + below + shared - shared_so_far
+        common = (shared & (union_position <= sketch_size)).sum(axis=1)
+        union = np.minimum(sizes[row] + sizes[row + 1:] - shared_so_far[:, -1], sketch_size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            jaccard = np.where(union > 0, common / np.maximum(union, 1), 0.0)
+            distances = np.where(jaccard > 0, -np.log(2 * jaccard / (1 + jaccard)) / kmer_size, 1.0)
+        condensed[offset:offset + n - row - 1] = np.minimum(distances, 1.0)
+        offset += n - row - 1
+    return condensed
@@ -0,0 +1,295 @@
+import re
+import numpy as np
+from Helper import distance_matrix
+from Helper import fastaio
+
+# Largest number of sequences joined exactly like Bio's DistanceTreeConstructor.nj,
+# larger trees are built in relaxed mode (see neighbor_joining)
+EXACT_LIMIT = 2000
+# Number of matrix rows processed at once, caps the size of temporary arrays
+BLOCK_SIZE = 256
+# Names that can be written to a Newick file without quotes (as in Bio.Phylo.NewickIO)
+UNQUOTED_NAME = re.compile(r"[^\s\(\)\[\]\'\:\;\,]+")
+# Format of the branch lengths, as in the trees written so far with Bio.Phylo (see Results_datasets/*/NWK)
+BRANCH_LENGTH_FORMAT = "%1.5f"
+# Number of Newick parts collected before they are written to the file
+WRITE_BATCH = 4096
+
+
+class Tree:
+    """
+    Tree built by neighbor_joining. Nodes are numbered: the sequences are the
+    nodes 0 to n - 1 (in input order), inner nodes follow in the order they
+    were created.
+
+    Args:
+        names (list): Names of the sequences.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.children = [[] for _ in self.names]
+        self.branch_lengths = [0.0] * len(self.names)
+        self.root = 0 if self.names else None
+
+    def add_node(self, name, children, branch_lengths):
+        """Adds an inner node above `children` and returns its number."""
+        for child, branch_length in zip(children, branch_lengths):
+            self.branch_lengths[child] = branch_length
+        self.names.append(name)
+        self.children.append(list(children))
+        self.branch_lengths.append(0.0)
+        return len(self.names) - 1
+
+    def newick_parts(self):
+        """
+        Generates the Newick string of the tree piece by piece, in the format of
+        Bio.Phylo.write(tree, file, "newick"): every node with its name and
+        branch length (BRANCH_LENGTH_FORMAT), inner nodes with their names as labels.
+        Works without recursion, so deep trees of many sequences can be written.
+        """
+        if self.root is None:
+            return
+        # Stack of (node, index of the next child), children are written in order
+        stack = [(self.root, 0)]
+        while stack:
+            node, index = stack.pop()
+            children = self.children[node]
+            if index < len(children):
+                yield "(" if index == 0 else ","
+                stack.append((node, index + 1))
+                stack.append((children[index], 0))
+            else:
+                if children:
+                    yield ")"
+                yield f"{_label(self.names[node])}:{BRANCH_LENGTH_FORMAT % self.branch_lengths[node]}"
+        yield ";"
+
+    def newick(self):
+        """Returns the Newick string of the tree, see newick_parts."""
+        return "".join(self.newick_parts())
+
+    def write_newick(self, tree_file):
+        """Streams the Newick string to a file, written atomically."""
+        with fastaio.atomic_output(tree_file) as temp_file, open(temp_file, "w", encoding="utf-8") as handle:
+            parts = []
+            for part in self.newick_parts():
+                parts.append(part)
+                if len(parts) >= WRITE_BATCH:
+                    handle.write("".join(parts))
+                    parts.clear()
+            handle.write("".join(parts) + "\n")
+
+
+def _label(name):
+    """Quotes a node name like Bio.Phylo.NewickIO if it contains Newick syntax."""
+    match = UNQUOTED_NAME.match(name)
+    if name and (not match or match.end() < len(name)):
+        return "'%s'" % name.replace("\\", "\\\\").replace("'", "\\'")
+    return name
+
+
+def neighbor_joining(names, condensed, relaxed=None, block_size=BLOCK_SIZE):
+    """
+    Builds a neighbor-joining tree from a condensed distance matrix.
+
+    The exact mode repeats Bio's DistanceTreeConstructor.nj step by step on a
+    NumPy matrix: the same row sums (added in the same order), the same pair
+    (the first minimum of d(i, j) - u(i) - u(j) in the same scan order), the same
+    branch lengths, node names ("Inner1", "Inner2", ...) and the same rooting at
+    the last inner node. The Newick output is therefore the same as before.
+    Every step still scans the whole matrix, so the run time grows with n^3.
+
+    The relaxed mode joins many pairs per scan of the matrix (relaxed neighbor
+    joining, Evans et al. 2006): the pairs of nodes that are each other's best
+    partner are joined from the best pair on, each one only if both rows still
+    have their minimum at the partner after the joins before it. This needs far
+    fewer scans. The tree can differ from the exact one in a few splits.
+
+    The memory is one n x n float64 matrix plus temporary arrays of
+    `block_size` rows.
+
+    Args:
+        names (list): Names of the sequences.
+        condensed (np.ndarray): Condensed distance matrix, see distance_matrix.pairwise_distances.
+        relaxed (bool): Use the relaxed mode. None uses it for more than EXACT_LIMIT sequences.
+        block_size (int): Number of matrix rows processed at once.
+    Returns:
+        Tree: The unrooted tree, stored with the root Bio would choose.
+    """
+    n = len(names)
+    tree = Tree(names)
+    if n < 2:
+        return tree
+    if n == 2:
+        # Bio's special case: one inner node named "Inner" above both sequences
+        distance = float(condensed[0])
+        half = distance / 2.0
+        tree.root = tree.add_node("Inner", [1, 0], [half, distance - half])
+        return tree
+    if relaxed is None:
+        relaxed = n > EXACT_LIMIT
+
+    joiner = _Joiner(distance_matrix.square_matrix(condensed, n, np.float64), block_size)
+    inner_count = 0
+    last = None
+    while joiner.count > 2:
+        if relaxed:
+            pairs = joiner.mutual_pairs()
+        else:
+            pairs = [joiner.first_minimum()]
+        for slot_i, slot_j in pairs:
+            if joiner.count <= 2:
+                break
+            if relaxed and not joiner.is_mutual_best(slot_i, slot_j):
+                continue
+            inner_count += 1
+            branch_i, branch_j = joiner.join(slot_i, slot_j)
+            node_i, node_j = joiner.nodes[slot_i], joiner.nodes[slot_j]
+            last = tree.add_node(f"Inner{inner_count}", [node_i, node_j], [branch_i, branch_j])
+            joiner.nodes[slot_j] = last
+        joiner.compact()
+
+    # The last two nodes: the one joined last becomes the root, the other its third child
+    first, second = np.flatnonzero(joiner.active)
+    distance = float(joiner.matrix[second, first])
+    if joiner.nodes[first] == last:
+        root, other = joiner.nodes[first], joiner.nodes[second]
+    else:
+        root, other = joiner.nodes[second], joiner.nodes[first]
+    tree.children[root].append(other)
+    tree.branch_lengths[root] = 0.0
+    tree.branch_lengths[other] = distance
+    tree.root = root
+    return tree
+
+
+class _Joiner:
+    """
+    Distance matrix of the nodes that are not joined yet. Every node has a slot
+    (row and column of the matrix); joining two nodes puts the new node into the
+    slot of the lower one and empties the other. The order of the slots is the
+    order of Bio's list of nodes, so scans follow the same order. Empty slots
+    hold zeros and are dropped from time to time (compact).
+    """
+
+    def __init__(self, matrix, block_size):
+        self.matrix = matrix
+        self.block_size = block_size
+        self.nodes = list(range(len(matrix)))
+        self.active = np.ones(len(matrix), dtype=bool)
+        self.count = len(matrix)
+        self.sums = None
+
+    def row_sums(self):
+        """Row sums added from left to right like Bio (empty slots add exact zeros)."""
+        sums = np.empty(len(self.matrix))
+        for start in range(0, len(self.matrix), self.block_size):
+            block = self.matrix[start:start + self.block_size]
+            sums[start:start + len(block)] = np.cumsum(block, axis=1)[:, -1]
+        return sums
+
+    def _criterion(self, start, stop, columns, node_dist):
+        """Q = d(i, j) - u(i) - u(j) of the rows start to stop, empty slots set to infinity."""
+        criterion = self.matrix[start:stop, :columns] - node_dist[start:stop, None] - node_dist[None, :columns]
+        criterion[~self.active[start:stop]] = np.inf
+        criterion[:, ~self.active[:columns]] = np.inf
+        return criterion
+
+    def first_minimum(self):
+        """
+        Returns the pair (min_i, min_j) Bio joins: the first minimum of Q in the
+        lower triangle, scanned row by row. If that is the first pair of nodes,
+        Bio keeps its start values min_i = 0, min_j = 1. Sets up the row sums for join.
+        """
+        self.sums = self.row_sums()
+        node_dist = self.sums / (self.count - 2)
+        best_value, best = np.inf, None
+        for start in range(0, len(self.matrix), self.block_size):
+            stop = min(start + self.block_size, len(self.matrix))
+            criterion = self._criterion(start, stop, stop, node_dist)
+            rows = np.arange(start, stop)
+            criterion[np.arange(stop)[None, :] >= rows[:, None]] = np.inf
+            position = int(criterion.argmin())
+            row, column = divmod(position, stop)
+            if criterion[row, column] < best_value:
+                best_value, best = criterion[row, column], (start + row, column)
+        first, second = np.flatnonzero(self.active)[:2]
+        if best is None or best == (second, first):
+            return first, second
+        return best
+
+    def mutual_pairs(self):
+        """
+        Returns all pairs of nodes that have each other as best partner (minimum
+        of Q in their rows), ordered by Q. Sets up the row sums for join.
+        """
+        self.sums = self.row_sums()
+        node_dist = self.sums / (self.count - 2)
+        size = len(self.matrix)
+        partners = np.full(size, -1)
+        values = np.full(size, np.inf)
+        for start in range(0, size, self.block_size):
+            stop = min(start + self.block_size, size)
+            criterion = self._criterion(start, stop, size, node_dist)
+            criterion[np.arange(stop - start), np.arange(start, stop)] = np.inf
+            partners[start:stop] = criterion.argmin(axis=1)
+            values[start:stop] = criterion[np.arange(stop - start), partners[start:stop]]
+        slots = np.flatnonzero(self.active)
+        mutual = slots[(partners[partners[slots]] == slots) & (partners[slots] < slots)]
+        if not len(mutual):
+            # Only possible with ties, fall back to a single exact step
+            return [self.first_minimum()]
+        order = np.argsort(values[mutual], kind="stable")
+        return [(int(slot), int(partners[slot])) for slot in mutual[order]]
+
+    def is_mutual_best(self, slot_i, slot_j):
+        """Checks with the current distances whether i and j have their minimum of Q at each other."""
+        node_dist = self.sums / (self.count - 2)
+        for slot, partner in ((slot_i, slot_j), (slot_j, slot_i)):
+            criterion = self.matrix[slot] - node_dist[slot] - node_dist
+            criterion[~self.active] = np.inf
+            criterion[slot] = np.inf
+            if criterion.argmin() != partner:
+                return False
+        return True
+
+    def join(self, slot_i, slot_j):
+        """
+        Joins two nodes like Bio: the new node takes the slot of j, i is removed.
+
+        Returns:
+            tuple: Branch lengths of i and j.
+        """
+        matrix = self.matrix
+        sums = self.sums
+        distance = matrix[slot_i, slot_j]
+        node_dist_i = sums[slot_i] / (self.count - 2)
+        node_dist_j = sums[slot_j] / (self.count - 2)
+        branch_i = (distance + node_dist_i - node_dist_j) / 2.0
+        branch_j = distance - branch_i
+
+        joined = (matrix[slot_i] + matrix[slot_j] - distance) / 2.0
+        joined[~self.active] = 0.0
+        joined[[slot_i, slot_j]] = 0.0
+        # Further joins of the same scan (relaxed mode) use updated row sums
+        sums += joined - matrix[slot_i] - matrix[slot_j]
+        sums[slot_j] = joined.sum()
+        sums[slot_i] = 0.0
+        matrix[slot_j] = joined
+        matrix[:, slot_j] = joined
+        matrix[slot_i] = 0.0
+        matrix[:, slot_i] = 0.0
+        self.active[slot_i] = False
+        self.count -= 1
+        return float(branch_i), float(branch_j)
+
+    def compact(self):
+        """Drops the empty slots once they make up half of the matrix."""
+        self.sums = None
+        if self.count * 2 > len(self.matrix):
+            return
+        slots = np.flatnonzero(self.active)
+        self.matrix = np.ascontiguousarray(self.matrix[np.ix_(slots, slots)])
+        self.nodes = [self.nodes[slot] for slot in slots]
+        self.active = np.ones(len(slots), dtype=bool)
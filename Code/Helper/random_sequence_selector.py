@@ -1,5 +1,7 @@
+import math
 import random
-from Bio import SeqIO
+from Helper import fasta_index
+from Helper import fastaio
 import argparse
 import sys
 
@@ -8,9 +10,16 @@ input_folder = "../DataModel/small/checks/sorted_fasta_small"
 input_fasta = f"{input_folder}/cas12m.fasta"
 output_fasta = f"{input_folder}/cas12m_subset.fasta"
 
+# Field of the unified header 'accession|subtype|source' used for stratified sampling
+STRATA_FIELDS = {"subtype": 1, "source": 2}
+# Stratum of records whose header has no such field
+UNASSIGNED = "unassigned"
+
 def select_random_sequences(input_fasta, output_fasta, num_sequences=600):
     """
     Selects random sequences from a FASTA file and writes them to a new file.
+    Only the selected records are read, with the record index of the file
+    (see fasta_index), instead of loading all sequences.
     
     Args:
         input_fasta (str): Path to input FASTA file
@@ -18,24 +27,23 @@ def select_random_sequences(input_fasta, output_fasta, num_sequences=600):
         num_sequences (int): Number of sequences to select (default: 600)
     """
     try:
-        # Read all sequences from input file
-        sequences = list(SeqIO.parse(input_fasta, "fasta"))
-        total_sequences = len(sequences)
+        # Count the sequences of the input file from its index
+        index = fasta_index.load_index(input_fasta)
+        total_sequences = len(index)
         
         print(f"Total sequences in input file: {total_sequences}")
         
         # Check if we have enough sequences
         if total_sequences < num_sequences:
             print(f"Warning: Only {total_sequences} sequences available, selecting all of them.")
-            selected_sequences = sequences
+            selected = range(total_sequences)
         else:
-            # Randomly select sequences
-            selected_sequences = random.sample(sequences, num_sequences)
+            # Randomly select record positions, the same choice as sampling the records themselves
+            selected = random.sample(range(total_sequences), num_sequences)
             print(f"Randomly selected {num_sequences} sequences.")
         
-        # Write selected sequences to output file
-        with open(output_fasta, "w") as output_handle:
-            SeqIO.write(selected_sequences, output_handle, "fasta")
+        # Read only the selected sequences and write them to the output file
+        fastaio.write_fasta(index.records(selected), output_fasta)
         
         print(f"Selected sequences written to: {output_fasta}")
         
@@ -46,12 +54,119 @@ def select_random_sequences(input_fasta, output_fasta, num_sequences=600):
         print(f"Error: {e}")
         sys.exit(1)
 
+def sample_sequences(input_fasta, output_fasta, num_sequences=600, seed=42, stratify_by=None):
+    """
+    Draws a reproducible random sample from a FASTA file in one streaming pass.
+
+    Reservoir sampling (Algorithm L) keeps only the sampled record texts in memory,
+    and records that are skipped are not even parsed, so the memory use does not
+    depend on the size of the input and compressed inputs work as well. The same
+    seed always gives the same sample. The sampled records are written in the
+    order of the input file.
+
+    Args:
+        input_fasta (str or Path): Path to the input FASTA file, e.g. a DataModel file.
+        output_fasta (str or Path): Path to the output FASTA file.
+        num_sequences (int): Size of the sample, or of the sample per stratum.
+        seed (int): Seed of the random number generator.
+        stratify_by (str): None for one sample over all records, or 'subtype' or
+                           'source' to draw `num_sequences` records per subtype or
+                           source of the 'accession|subtype|source' header, for
+                           balanced subsets. Strata with fewer records are taken completely.
+    Returns:
+        dict: Number of sampled records per stratum (key None without stratification).
+    """
+    if stratify_by is not None and stratify_by not in STRATA_FIELDS:
+        raise ValueError(f"Unknown stratum '{stratify_by}', expected one of {sorted(STRATA_FIELDS)}")
+    rng = random.Random(seed)
+    reservoirs = {}
+
+    texts = fastaio.iter_record_texts(fastaio.read_blocks(input_fasta))
+    # Skip the preamble in front of the first header
+    next(texts)
+    if stratify_by is None:
+        reservoir = reservoirs[None] = _Reservoir(num_sequences, rng)
+        for position, text in enumerate(texts):
+            reservoir.offer(position, text)
+    else:
+        field = STRATA_FIELDS[stratify_by]
+        for position, text in enumerate(texts):
+            fields = text.partition("\n")[0].split("|")
+            stratum = fields[field].strip().lower() if len(fields) > field and fields[field].strip() else UNASSIGNED
+            reservoir = reservoirs.get(stratum)
+            if reservoir is None:
+                reservoir = reservoirs[stratum] = _Reservoir(num_sequences, rng)
+            reservoir.offer(position, text)
+
+    selected = sorted(item for reservoir in reservoirs.values() for item in reservoir.items)
+    fastaio.write_fasta((fastaio.parse_record(text) for _, text in selected), output_fasta)
+
+    counts = {stratum: len(reservoir.items) for stratum, reservoir in sorted(reservoirs.items(), key=lambda item: str(item[0]))}
+    for stratum, reservoir in reservoirs.items():
+        label = f"{stratify_by} {stratum}" if stratify_by else "input file"
+        print(f"{label}: {len(reservoir.items)} of {reservoir.seen} sequences sampled")
+    print(f"{len(selected)} sampled sequences written to: {output_fasta}")
+    return counts
+
+class _Reservoir:
+    """
+    Reservoir of at most `size` (position, record text) items, filled with
+    Algorithm L: after the reservoir is full, the number of items to skip until
+    the next replacement is drawn directly, so skipped items cost no random numbers.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+        self._weight = 1.0
+        # Number (1-based) of the next record that replaces a sampled one
+        self._next = size
+
+    def offer(self, position, text):
+        """Offers one record to the reservoir."""
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append((position, text))
+            if len(self.items) == self.size:
+                self._advance()
+        elif self.seen == self._next:
+            self.items[self.rng.randrange(self.size)] = (position, text)
+            self._advance()
+
+    def _advance(self):
+        if not self.size:
+            self._next = math.inf
+            return
+        self._weight *= math.exp(math.log(self._uniform()) / self.size)
+        if self._weight >= 1.0:
+            self._next = math.inf
+            return
+        self._next += math.floor(math.log(self._uniform()) / math.log1p(-self._weight)) + 1
+
+    def _uniform(self):
+        # Uniform in (0, 1), log(0) is undefined
+        value = self.rng.random()
+        while value == 0.0:
+            value = self.rng.random()
+        return value
+
 def main():
-    # Set a default seed for reproducibility
-    random.seed(42)
-    
-    # Use the predefined paths
-    select_random_sequences(input_fasta, output_fasta, 400)
+    parser = argparse.ArgumentParser(description="Draw a reproducible random sample of sequences from a FASTA file.")
+    parser.add_argument("--input", default=input_fasta, help=f"Input FASTA file (default: {input_fasta})")
+    parser.add_argument("--output", default=output_fasta, help=f"Output FASTA file (default: {output_fasta})")
+    parser.add_argument("--size", type=int, default=400, help="Number of sequences, per stratum with --stratify-by (default: 400)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random number generator (default: 42)")
+    parser.add_argument("--stratify-by", choices=sorted(STRATA_FIELDS), default=None,
+                        help="Sample --size sequences per subtype or source of the header (default: one sample over all sequences)")
+    args = parser.parse_args()
+
+    try:
+        sample_sequences(args.input, args.output, args.size, args.seed, args.stratify_by)
+    except FileNotFoundError:
+        print(f"Error: Input file '{args.input}' not found.")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,9 @@
 import subprocess
 import os
+import shutil
 import logging
 from datetime import datetime
+from Helper import fasta_index
 
 input_folder = "../DataModel/small/checks/sorted_fasta_small"
 # Input file with 13000 sequences in FASTA format
@@ -32,18 +34,26 @@ def setup_logging():
     logging.info(f"Started sequence selector - Log: {log_filename}")
 
 def count_sequences_in_fasta(fasta_file):
-    """Count the number of sequences in a FASTA file"""
+    """Count the number of sequences in a FASTA file, from its record index"""
     if not os.path.exists(fasta_file):
         return 0
     
-    count = 0
-    with open(fasta_file, 'r') as f:
-        for line in f:
-            if line.startswith('>'):
-                count += 1
-    return count
+    return fasta_index.count_records(fasta_file)
 
-def reduce_sequences(input_file, output_file):
+def reduce_sequences(input_file, output_file, engine="auto"):
+    """
+    Reduces the redundancy of a FASTA file by clustering the sequences at 50 %
+    identity (word length 2) and keeping one representative per cluster.
+
+    Args:
+        input_file (str): Path to the input FASTA file.
+        output_file (str): Path to the FASTA file of the representatives.
+        engine (str): "cdhit" runs CD-HIT, "builtin" the built-in clustering of
+                      kmer_cluster, "auto" uses CD-HIT if it is installed and the
+                      built-in clustering otherwise.
+    Returns:
+        bool: True on success.
+    """
     logging.info(f"Processing: {input_file}")
     
     # Check if input file exists
@@ -55,22 +65,33 @@ def reduce_sequences(input_file, output_file):
     input_seq_count = count_sequences_in_fasta(input_file)
     logging.info(f"Input sequences: {input_seq_count}")
     
-    # CD-HIT command - higher -c value for fewer sequences
-    cmd = [
-        "cd-hit",
-        "-i", input_file,
-        "-o", output_file,
-        "-c", "0.5",
-        "-n", "2",
-        "-M", "16000",
-        "-T", "4"
-    ]
-    
-    logging.info("Running CD-HIT clustering...")
+    if engine == "auto":
+        engine = "cdhit" if shutil.which("cd-hit") else "builtin"
+        if engine == "builtin":
+            logging.warning("CD-HIT not found in PATH, using the built-in k-mer clustering")
     
-    # Execute CD-HIT
     try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        if engine == "builtin":
+            # Imported here, so CD-HIT runs do not need NumPy
+            from Helper import kmer_cluster
+            logging.info("Running built-in k-mer clustering...")
+            kmer_cluster.cluster_fasta(input_file, output_file, identity=0.5, word_length=2, workers=4)
+        else:
+            # CD-HIT command - higher -c value for fewer sequences
+            cmd = [
+                "cd-hit",
+                "-i", input_file,
+                "-o", output_file,
+                "-c", "0.5",
+                "-n", "2",
+                "-M", "16000",
+                "-T", "4"
+            ]
+            
+            logging.info("Running CD-HIT clustering...")
+            
+            # Execute CD-HIT
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
         
         # Count output sequences
         output_seq_count = count_sequences_in_fasta(output_file)
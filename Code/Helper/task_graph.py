@@ -0,0 +1,285 @@
+import csv
+import os
+import resource
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from Helper.build_cache import BuildCache
+from Helper.checkpoint_journal import CheckpointJournal
+
+# Columns of the step statistics CSV written by TaskGraph.run
+STATS_COLUMNS = ["pipeline", "task", "status", "start", "end", "wall_time_s", "peak_memory_mb"]
+
+
+class Task:
+    """
+    One step of a pipeline: a function call plus the files it reads and writes.
+
+    Args:
+        name (str): Unique name of the task, used in logs and for `after`.
+        function (callable): Module-level function run in a worker process.
+        args (tuple): Positional arguments for the function.
+        kwargs (dict): Keyword arguments for the function.
+        inputs (list): Files or folders the task reads.
+        outputs (list): Files or folders the task writes.
+        after (list): Names of tasks that have to finish first, for dependencies
+                      that are not visible from the inputs and outputs.
+        slots (int): Number of worker slots the task occupies, e.g. the number of
+                     processes it starts itself.
+    """
+
+    def __init__(self, name, function, args=(), kwargs=None, inputs=(), outputs=(), after=(), slots=1):
+        self.name = name
+        self.function = function
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.inputs = [Path(path) for path in inputs]
+        self.outputs = [Path(path) for path in outputs]
+        self.after = list(after)
+        self.slots = max(int(slots), 1)
+
+    def __repr__(self):
+        return f"Task({self.name!r})"
+
+
+class TaskGraph:
+    """
+    Runs the tasks of a pipeline in dependency order on a pool of worker processes.
+
+    A task depends on every task that writes one of its inputs (or a folder that
+    contains one of its inputs) and on the tasks named in its `after` list. Tasks
+    without open dependencies run concurrently, as long as their slots together
+    do not exceed `workers`; a task that does not fit waits while smaller ready
+    tasks may start. Every task runs in a fresh worker
+    process, so its peak memory (ru_maxrss) can be measured; wall time and peak
+    memory are printed and appended to a CSV file.
+
+    With a manifest file, tasks whose function, arguments and input files did not
+    change since their last successful run (and whose outputs are unchanged) are
+    skipped, see build_cache.BuildCache.
+
+    With a journal file, a run that failed or was interrupted is resumed by the
+    next run: tasks that already finished are not run again, see
+    checkpoint_journal.CheckpointJournal.
+
+    Args:
+        name (str): Name of the pipeline, used in logs.
+        workers (int): Number of worker slots, the maximum number of tasks
+                       running at the same time (default: number of CPUs).
+        stats_file (str or Path): CSV file the step statistics are appended to.
+                                  None disables the CSV.
+        manifest_file (str or Path): Build manifest for skipping unchanged tasks.
+                                     None runs every task.
+        journal_file (str or Path): Checkpoint journal for resuming failed runs.
+                                    None always starts from the first task.
+    """
+
+    def __init__(self, name, workers=None, stats_file=None, manifest_file=None, journal_file=None):
+        self.name = name
+        self.workers = workers or os.cpu_count() or 1
+        self.stats_file = Path(stats_file) if stats_file is not None else None
+        self.manifest_file = Path(manifest_file) if manifest_file is not None else None
+        self.journal_file = Path(journal_file) if journal_file is not None else None
+        self.tasks = {}
+
+    def add(self, name, function, *args, inputs=(), outputs=(), after=(), slots=1, **kwargs):
+        """
+        Adds a task calling function(*args, **kwargs). A task that runs several
+        processes or threads itself should occupy as many `slots`; more than
+        `workers` slots are capped to `workers`.
+
+        Returns:
+            Task: The new task.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already part of pipeline '{self.name}'")
+        task = Task(name, function, args, kwargs, inputs, outputs, after, slots)
+        self.tasks[name] = task
+        return task
+
+    def dependencies(self):
+        """
+        Derives the dependencies of all tasks.
+
+        Returns:
+            dict: Mapping task name -> set of names of the tasks it waits for.
+        """
+        producers = [
+            (output.resolve(), task.name)
+            for task in self.tasks.values() for output in task.outputs
+        ]
+        dependencies = {}
+        for task in self.tasks.values():
+            needed = set(task.after)
+            for path in task.inputs:
+                path = path.resolve()
+                for output, producer in producers:
+                    if producer != task.name and (path == output or output in path.parents):
+                        needed.add(producer)
+            unknown = needed - self.tasks.keys()
+            if unknown:
+                raise ValueError(f"Task '{task.name}' depends on unknown tasks {sorted(unknown)}")
+            dependencies[task.name] = needed
+        self._check_cycles(dependencies)
+        return dependencies
+
+    def _check_cycles(self, dependencies):
+        done = set()
+        remaining = dict(dependencies)
+        while remaining:
+            ready = [name for name, needed in remaining.items() if needed <= done]
+            if not ready:
+                raise ValueError(f"Pipeline '{self.name}' has a dependency cycle between {sorted(remaining)}")
+            for name in ready:
+                done.add(name)
+                del remaining[name]
+
+    def run(self, force=False):
+        """
+        Runs all tasks and waits for them.
+
+        Args:
+            force (bool): Run all tasks even if the build manifest says they are current
+                          or the journal says they finished in an unfinished run.
+
+        Returns:
+            dict: Mapping task name -> return value of the task function.
+        Raises:
+            RuntimeError: If a task failed. Tasks depending on it are skipped, all
+                          other tasks still run.
+        """
+        dependencies = self.dependencies()
+        pending = dict(dependencies)
+        finished = set()
+        failed = {}
+        results = {}
+        running = {}
+        # Worker slots taken by the running tasks
+        used_slots = 0
+        cache = BuildCache(self.manifest_file) if self.manifest_file is not None else None
+        fingerprints = {}
+        journal = CheckpointJournal(self.journal_file) if self.journal_file is not None else None
+
+        print(f"\nRunning pipeline '{self.name}' with {len(self.tasks)} tasks on {self.workers} workers")
+        if journal is not None and journal.open(fresh=force):
+            print(f"[{self.name}] Resuming unfinished run, {len(journal.done)} tasks already done")
+        # One task per worker process, so ru_maxrss is the peak of exactly that task
+        with ProcessPoolExecutor(max_workers=self.workers, max_tasks_per_child=1) as executor:
+            while pending or running:
+                # Skip everything downstream of a failed task
+                blocked = [name for name, needed in pending.items() if needed & failed.keys()]
+                while blocked:
+                    for name in blocked:
+                        failed[name] = "skipped, a dependency failed"
+                        self._record(name, "skipped", None)
+                        del pending[name]
+                    blocked = [name for name, needed in pending.items() if needed & failed.keys()]
+                skipped = False
+                for name in [name for name, needed in pending.items() if needed <= finished]:
+                    task = self.tasks[name]
+                    slots = min(task.slots, self.workers)
+                    if used_slots + slots > self.workers:
+                        continue
+                    del pending[name]
+                    if journal is not None and journal.is_done(task):
+                        print(f"[{self.name}] Skipping {name}, already finished in the unfinished run")
+                        finished.add(name)
+                        self._record(name, "resumed", None)
+                        skipped = True
+                        continue
+                    if cache is not None:
+                        fingerprints[name] = cache.fingerprint(task)
+                        if not force and cache.is_current(task, fingerprints[name]):
+                            print(f"[{self.name}] Skipping {name}, inputs and parameters unchanged")
+                            finished.add(name)
+                            self._record(name, "cached", None)
+                            skipped = True
+                            continue
+                    print(f"[{self.name}] Starting {name}")
+                    running[executor.submit(_run_task, task.function, task.args, task.kwargs)] = name
+                    used_slots += slots
+                if skipped:
+                    # Tasks after a skipped one may be ready now
+                    continue
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    used_slots -= min(self.tasks[name].slots, self.workers)
+                    try:
+                        result, stats = future.result()
+                    except Exception as error:
+                        failed[name] = repr(error)
+                        if cache is not None:
+                            cache.forget(self.tasks[name])
+                        if journal is not None:
+                            journal.task_failed(self.tasks[name], repr(error))
+                        self._record(name, "failed", None)
+                        print(f"[{self.name}] {name} failed: {error!r}")
+                        continue
+                    results[name] = result
+                    finished.add(name)
+                    if cache is not None:
+                        cache.record(self.tasks[name], fingerprints[name])
+                    if journal is not None:
+                        journal.task_done(self.tasks[name])
+                    self._record(name, "done", stats)
+
+        if journal is not None:
+            journal.close(complete=not failed)
+        if failed:
+            details = "\n".join(f"  {name}: {reason}" for name, reason in failed.items())
+            raise RuntimeError(f"Pipeline '{self.name}' failed:\n{details}")
+        return results
+
+    def _record(self, name, status, stats):
+        """Prints the statistics of a task and appends them to the statistics CSV."""
+        start, end, wall_time, peak_memory = stats if stats else (None, None, None, None)
+        if stats:
+            hours, remainder = divmod(int(wall_time), 3600)
+            minutes, seconds = divmod(remainder, 60)
+            print(f"[{self.name}] Finished {name} in {hours:02d}:{minutes:02d}:{seconds:02d}, peak memory {peak_memory:.1f} MB")
+        if self.stats_file is None:
+            return
+        self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.stats_file.exists()
+        with open(self.stats_file, "a", newline="") as handle:
+            writer = csv.writer(handle)
+            if new_file:
+                writer.writerow(STATS_COLUMNS)
+            writer.writerow([
+                self.name,
+                name,
+                status,
+                _timestamp(start),
+                _timestamp(end),
+                "" if wall_time is None else f"{wall_time:.3f}",
+                "" if peak_memory is None else f"{peak_memory:.1f}",
+            ])
+
+
+def _timestamp(seconds):
+    return "" if seconds is None else datetime.fromtimestamp(seconds).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _run_task(function, args, kwargs):
+    """
+    Runs a task function in a worker process and measures it.
+
+    Returns:
+        tuple: (result, (start, end, wall time in s, peak memory in MB)). The peak
+               memory covers the worker and any processes it started itself.
+    """
+    start = time.time()
+    counter = time.perf_counter()
+    result = function(*args, **kwargs)
+    wall_time = time.perf_counter() - counter
+    # ru_maxrss is given in KiB on Linux
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return result, (start, time.time(), wall_time, peak / 1024)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import argparse
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+from Helper import cas_translator
+
+NAMES = ["Cas12a", "cas14a", "Cas14", "u1", "U2", "u3", "u4", "u5", "TnpB", "tnpb", "Cas12j", "Cas13", "Cas9"]
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+# Headers with their expected translation; aliases inside accessions must not be translated
+KNOWN_HEADERS = [
+    ("A0A2U1ABC4|cas12a|uniprot_tr", "A0A2U1ABC4|cas12a|uniprot_tr"),
+    ("WP_0112U4567.1 Cas12b", "Cas12b"),
+    ("XU1234567_1|u1|CasPedia", "Cas12m"),
+    ("AB12U5|U4|CasPedia", "Cas12n"),
+    ("AC000001_2|u2|CasPedia", "Cas12u"),
+    ("AC000001_3|cas14a|CasPedia", "Cas12f"),
+    ("AC000001_4|tnpb|CasPedia", "AC000001_4|TnpB|CasPedia"),
+]
+
+def legacy_translate_line(line):
+    """
+    Previous header translation of cas_translator.translator, kept as the baseline
+    for the benchmark. Runs seven separate substitutions and one search per header.
+    """
+    line = re.sub(r'cas14', 'Cas12f', line, flags=re.IGNORECASE)
+    line = re.sub(r'u1', 'Cas12m', line, flags=re.IGNORECASE)
+    line = re.sub(r'u2', 'Cas12u2', line, flags=re.IGNORECASE)
+    line = re.sub(r'u3', 'Cas12u3', line, flags=re.IGNORECASE)
+    line = re.sub(r'u4', 'Cas12n', line, flags=re.IGNORECASE)
+    line = re.sub(r'u5', 'Cas12k', line, flags=re.IGNORECASE)
+    line = re.sub(r'tnpb', 'TnpB', line, flags=re.IGNORECASE)
+    # Keep only the Cas12 variant (e.g. Cas12f, Cas12m, ...)
+    match = re.search(r'(Cas12[a-zA-Z])', line)
+    if match:
+        return match.group(1) + '\n'
+    return line
+
+def legacy_translator(input_file: Path, output_file: Path):
+    """Previous line-by-line implementation of cas_translator.translator."""
+    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
+        for line in infile:
+            if line.startswith('>'):
+                line = legacy_translate_line(line)
+                outfile.write(line if line.startswith('>') else ">" + line)
+            else:
+                outfile.write(line)
+
+def synthetic_headers(count, seed=42):
+    """
+    Builds `count` CasPedia-like headers. Accessions contain letter-digit pairs
+    such as 'U1' or 'U4' only by chance, like real ones.
+    """
+    rng = random.Random(seed)
+    headers = []
+    for i in range(count):
+        accession = "".join(rng.choices("ABCDEFGHKMNPRSTUWXYZ0123456789", k=10))
+        headers.append(f"{accession}_{i}|{rng.choice(NAMES)}|CasPedia|score={rng.random():.3f}")
+    return headers
+
+def run_header_benchmark(headers):
+    """
+    Times the legacy and the compiled translation on a list of headers and counts
+    the headers whose translation differs.
+    """
+    compiled = cas_translator.compile_aliases(cas_translator.load_aliases())
+
+    start = time.perf_counter()
+    legacy = [legacy_translate_line(header + "\n").rstrip("\n") for header in headers]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = [cas_translator.translate_header(header, compiled) for header in headers]
+    current_time = time.perf_counter() - start
+
+    differing = sum(old != new for old, new in zip(legacy, current))
+    print(f"Headers: {len(headers)}")
+    print(f"  legacy: {legacy_time:8.2f} s  {len(headers) / legacy_time / 1e6:6.2f} M headers/s")
+    print(f" current: {current_time:8.2f} s  {len(headers) / current_time / 1e6:6.2f} M headers/s")
+    print(f"Speedup: {legacy_time / current_time:.2f}x")
+    print(f"Differing translations: {differing} (the legacy code also translates aliases inside accessions)")
+
+def check_known_headers():
+    """
+    Checks the translation of KNOWN_HEADERS.
+
+    Returns:
+        bool: True if all headers are translated as expected.
+    """
+    compiled = cas_translator.compile_aliases(cas_translator.load_aliases())
+    failures = 0
+    for header, expected in KNOWN_HEADERS:
+        translated = cas_translator.translate_header(header, compiled)
+        if translated != expected:
+            failures += 1
+            print(f"  {header!r}: expected {expected!r}, got {translated!r}")
+    print(f"Known headers: {len(KNOWN_HEADERS) - failures} of {len(KNOWN_HEADERS)} translated as expected")
+    return not failures
+
+def run_file_benchmark(headers, work_dir: Path):
+    """Times the legacy and the streaming translator on a FASTA file with the given headers."""
+    input_file = work_dir / "synthetic.fasta"
+    rng = random.Random(7)
+    pool = "".join(rng.choices(AMINO_ACIDS, k=1 << 12))
+    with input_file.open("w") as outfile:
+        for header in headers:
+            start = rng.randrange(0, len(pool) - 120)
+            outfile.write(f">{header}\n{pool[start:start + 60]}\n{pool[start + 60:start + 120]}\n")
+
+    results = {}
+    for name, function in (("legacy", legacy_translator), ("current", cas_translator.translator)):
+        output_file = work_dir / f"{name}.fasta"
+        start = time.perf_counter()
+        function(input_file, output_file)
+        results[name] = time.perf_counter() - start
+        print(f"{name:>8}: {results[name]:8.2f} s")
+        output_file.unlink()
+    input_file.unlink()
+    print(f"Speedup: {results['legacy'] / results['current']:.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cas_translator against the legacy implementation.")
+    parser.add_argument("--headers", type=int, default=3_000_000, help="Number of synthetic headers (default: 3000000)")
+    parser.add_argument("--work-dir", type=Path, default=None, help="Directory for temporary files (default: system temp directory)")
+    args = parser.parse_args()
+
+    print("\nScenario: known headers")
+    check_known_headers()
+    headers = synthetic_headers(args.headers)
+    print("\nScenario: header translation")
+    run_header_benchmark(headers)
+    print("\nScenario: FASTA file translation")
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as tmp:
+        run_file_benchmark(headers, Path(tmp))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import random
+import tempfile
+import time
+from pathlib import Path
+from Helper import format_fasta
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def legacy_format_fasta(input_file: Path, output_file: Path, appendix: str, line_length: int):
+    """
+    Previous implementation of format_fasta.format_fasta, kept as the baseline
+    for the benchmark. Builds each sequence with repeated string concatenation.
+    """
+    with input_file.open("r") as infile, output_file.open("w") as outfile:
+        sequence = ""
+        for line in infile:
+            line = line.strip()
+            if line.startswith(">"):
+                if sequence:
+                    for i in range(0, len(sequence), line_length):
+                        outfile.write(sequence[i:i+line_length] + "\n")
+                outfile.write(f"{line}{appendix}\n")
+                sequence = ""
+            else:
+                sequence += line
+        if sequence:
+            for i in range(0, len(sequence), line_length):
+                outfile.write(sequence[i:i+line_length] + "\n")
+
+def write_synthetic_fasta(output_file: Path, size_mb: int, input_line_length: int, seed=42):
+    """
+    Writes a synthetic protein FASTA file of roughly `size_mb` megabytes.
+    Sequences are between 100 and 5000 residues long.
+
+    Args:
+        output_file (Path): Path of the synthetic FASTA file.
+        size_mb (int): Target size in megabytes.
+        input_line_length (int): Characters per sequence line in the synthetic file.
+        seed (int): Seed for the random generator.
+    """
+    rng = random.Random(seed)
+    # A pool of residues is sliced instead of drawing every residue separately
+    pool = "".join(rng.choices(AMINO_ACIDS, k=1 << 16))
+    target = size_mb * 1024 * 1024
+    written = 0
+    record = 0
+    with output_file.open("w") as outfile:
+        while written < target:
+            length = rng.randint(100, 5000)
+            start = rng.randrange(0, len(pool) - length)
+            sequence = pool[start:start + length]
+            lines = [f">synthetic_{record}|Cas12{AMINO_ACIDS[record % 20].lower()}|benchmark"]
+            lines.extend(sequence[i:i+input_line_length] for i in range(0, length, input_line_length))
+            text = "\n".join(lines) + "\n"
+            outfile.write(text)
+            written += len(text)
+            record += 1
+    print(f"Synthetic FASTA with {record} records ({written / 1024 / 1024:.0f} MB) written to {output_file}")
+
+def sha256sum(file_path: Path):
+    """Returns the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with file_path.open("rb") as infile:
+        for block in iter(lambda: infile.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def run_benchmark(size_mb: int, work_dir: Path, input_line_length: int, appendix="|benchmark", line_length=60):
+    """
+    Compares the throughput of the legacy and the current format_fasta on a
+    synthetic FASTA file and checks that both outputs are byte-identical.
+
+    Args:
+        size_mb (int): Size of the synthetic input in megabytes.
+        work_dir (Path): Directory for the synthetic input and both outputs.
+        input_line_length (int): Characters per sequence line in the synthetic input.
+        appendix (str): Appendix added to every header.
+        line_length (int): Maximum characters per sequence line.
+    Returns:
+        bool: True if both outputs are byte-identical.
+    """
+    input_file = work_dir / "synthetic.fasta"
+    legacy_output = work_dir / "legacy_formatted.fasta"
+    current_output = work_dir / "current_formatted.fasta"
+
+    print(f"\nScenario: input wrapped at {input_line_length}, output wrapped at {line_length}")
+    write_synthetic_fasta(input_file, size_mb, input_line_length)
+    input_mb = input_file.stat().st_size / 1024 / 1024
+
+    results = {}
+    for name, function, output_file in (
+        ("legacy", legacy_format_fasta, legacy_output),
+        ("current", format_fasta.format_fasta, current_output),
+    ):
+        start = time.perf_counter()
+        function(input_file, output_file, appendix, line_length)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed
+        print(f"{name:>8}: {elapsed:8.2f} s  {input_mb / elapsed:8.1f} MB/s")
+
+    identical = sha256sum(legacy_output) == sha256sum(current_output)
+    print(f"Speedup: {results['legacy'] / results['current']:.2f}x")
+    print(f"Outputs byte-identical: {identical}")
+    for file_path in (input_file, legacy_output, current_output):
+        file_path.unlink()
+    return identical
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark format_fasta against the legacy implementation.")
+    parser.add_argument("--size-mb", type=int, default=1024, help="Size of the synthetic FASTA file in MB (default: 1024)")
+    parser.add_argument("--work-dir", type=Path, default=None, help="Directory for temporary files (default: system temp directory)")
+    args = parser.parse_args()
+
+    # 80 -> 60 forces a rewrap of every record, 60 -> 60 is the common case of
+    # reformatting UniProt or already formatted DataModel files
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as tmp:
+        for input_line_length in (80, 60):
+            run_benchmark(args.size_mb, Path(tmp), input_line_length)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import argparse
+import io
+import random
+import time
+from Bio import Phylo
+from Bio.Align import MultipleSeqAlignment
+from Bio.Phylo.TreeConstruction import DistanceCalculator, DistanceTreeConstructor
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from Helper import distance_matrix
+from Helper import neighbor_joining
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def synthetic_alignment(num_sequences: int, length: int, seed=42):
+    """
+    Evolves a synthetic protein alignment: every sequence is a copy of the root
+    or of an earlier sequence with substitutions and gaps, so the alignment has
+    a tree structure, identical sequences and tied distances like real data.
+
+    Args:
+        num_sequences (int): Number of sequences.
+        length (int): Number of alignment columns.
+        seed (int): Seed for the random generator.
+    Returns:
+        tuple: (names, aligned sequences)
+    """
+    rng = random.Random(seed)
+    sequences = ["".join(rng.choices(AMINO_ACIDS, k=length))]
+    while len(sequences) < num_sequences:
+        sequence = list(rng.choice(sequences))
+        rate = rng.choice([0.0, 0.02, 0.1, 0.3])
+        for position in range(length):
+            if rng.random() < rate:
+                sequence[position] = rng.choice(AMINO_ACIDS + "-")
+        sequences.append("".join(sequence))
+    names = [f"synthetic_{number}|Cas12{AMINO_ACIDS[number % 20].lower()}|benchmark" for number in range(num_sequences)]
+    return names, sequences
+
+def legacy_newick(names, sequences):
+    """Previous tree construction of phylotree_generator: DistanceCalculator, nj and Phylo.write."""
+    alignment = MultipleSeqAlignment([SeqRecord(Seq(sequence), id=name) for name, sequence in zip(names, sequences)])
+    tree = DistanceTreeConstructor().nj(DistanceCalculator('identity').get_distance(alignment))
+    handle = io.StringIO()
+    # Newer Bio versions default to %1.8g, the published trees were written with %1.5f
+    Phylo.write(tree, handle, "newick", format_branch_length=neighbor_joining.BRANCH_LENGTH_FORMAT)
+    return handle.getvalue()
+
+def current_newick(names, sequences):
+    """Current tree construction of phylotree_generator: distance_matrix and neighbor_joining (exact mode)."""
+    condensed = distance_matrix.pairwise_distances(distance_matrix.encode_alignment(sequences), "identity", dtype=float)
+    return neighbor_joining.neighbor_joining(names, condensed, relaxed=False).newick() + "\n"
+
+def run_benchmark(num_sequences: int, length: int, seed: int):
+    """
+    Builds the tree of a synthetic alignment with Bio and with neighbor_joining
+    and checks that both Newick strings are byte-identical.
+
+    Returns:
+        bool: True if both Newick strings are byte-identical.
+    """
+    names, sequences = synthetic_alignment(num_sequences, length, seed)
+    results = {}
+    for name, function in (("legacy", legacy_newick), ("current", current_newick)):
+        start = time.perf_counter()
+        results[name] = function(names, sequences)
+        print(f"{name:>8}: {time.perf_counter() - start:8.2f} s")
+    identical = results["legacy"] == results["current"]
+    print(f"{num_sequences} sequences x {length} columns (seed {seed}), Newick byte-identical: {identical}")
+    return identical
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare neighbor_joining with Bio's DistanceTreeConstructor.nj.")
+    parser.add_argument("--sequences", type=int, default=300, help="Number of sequences of the largest alignment (default: 300)")
+    parser.add_argument("--length", type=int, default=400, help="Number of alignment columns (default: 400)")
+    args = parser.parse_args()
+
+    # Small alignments hit Bio's special cases (2 and 3 sequences) and many ties
+    all_identical = True
+    for seed, num_sequences in enumerate((2, 3, 10, 50, args.sequences)):
+        all_identical &= run_benchmark(num_sequences, args.length, seed)
+    print(f"\nAll Newick strings byte-identical: {all_identical}")
@@ -1,11 +1,11 @@
-import count_distinct_headers_and_sequences
-import delete_duplicate_sequences
-import merge_fasta
+from Helper import count_distinct_headers_and_sequences
+from Helper import delete_duplicate_sequences
+from Helper import merge_fasta
 import sort_datamodel
 from pathlib import Path
 
 
-delete_duplicate_sequences.main('../DataModel/small', '../DataModel/small/checks/cleaned_fasta', '../LOG/cleaned_fasta.log')
+delete_duplicate_sequences.main('../DataModel/small', '../DataModel/small/checks/cleaned_fasta', '../LOG/cleaned_fasta.log', exclude=['../DataModel/small/checks'])
 count_distinct_headers_and_sequences.main('../DataModel/small/checks/cleaned_fasta', '../DataModel/small/checks/header_counts', '../LOG/header_counts.log')
 
 source_folder = Path('../DataModel/small/checks/cleaned_fasta')
@@ -2,13 +2,25 @@ import shutil
 import subprocess
 import time
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from Bio import Phylo, AlignIO
-from Bio.Phylo.TreeConstruction import DistanceCalculator, DistanceTreeConstructor
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from Bio import Phylo
 import matplotlib.pyplot as plt
+import numpy as np
 import os
 import logging
-from Bio import SeqIO
+from Helper import distance_matrix
+from Helper import fasta_index
+from Helper import fastaio
+from Helper import minhash
+from Helper import neighbor_joining
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # Without it, only libraries loaded after limit_threads follow the limit
+    threadpool_limits = None
+
+# Environment variables that set the thread count of BLAS and OpenMP libraries
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS")
 
 Path("../LOG/").mkdir(parents=True, exist_ok=True)
 
@@ -53,70 +65,111 @@ def run_msa(input_faa, aln_file, threads=4):
     logging.info(f"MUSCLE finished for {input_faa}. Output: {aln_file}")
     return True
 
-def process_fasta(fasta_file, output_folder, threads):
+def limit_threads(threads):
+    """
+    Limit the BLAS/OpenMP threads of this worker process to the thread budget of
+    its job, so NumPy's matrix products do not start one thread per core in
+    every worker at the same time.
+
+    The workers are forked after NumPy is loaded, so its BLAS library already
+    exists in the worker; threadpoolctl changes its thread count at runtime.
+    The environment variables cover libraries loaded later.
+
+    Args:
+        threads (int): Number of threads the job may use
+    """
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    if threadpool_limits is not None:
+        threadpool_limits(limits=threads)
+
+def process_fasta(fasta_file, output_folder, threads, tree_mode="msa"):
     """
     Process a single FASTA file through the complete phylogenetic analysis pipeline.
     
     This function performs multiple sequence alignment, constructs a phylogenetic tree
     using neighbor-joining algorithm, and generates both Newick and SVG output files.
     
+    In "sketch" mode no alignment is made: the distances are Mash distances of
+    MinHash sketches of the sequences (see minhash), which takes minutes instead
+    of hours for large files. The sketches are kept in a .sketch.npz file and
+    reused, the tree files get the suffix "_mash".
+    
     Args:
         fasta_file (Path): Path object pointing to the input FASTA file
         output_folder (Path): Directory where output subfolders will be created
         threads (int): Number of threads to use for MSA processing
+        tree_mode (str): "msa" for MUSCLE alignment and identity distances,
+                         "sketch" for alignment-free MinHash distances
     
     Returns:
         tuple: A tuple containing (filename, processing_duration_seconds) where
                processing_duration_seconds is None if processing failed
     """
-    seqs = list(SeqIO.parse(fasta_file, "fasta"))
-    if len(seqs) < 2:
+    num_records = fasta_index.count_records(fasta_file)
+    if num_records < 2:
         logging.warning(f"{fasta_file} enthält weniger als 2 Sequenzen. Überspringe Datei.")
         return fasta_file.name, None
     
-    MAX_SEQUENCES = 1500
-    if len(seqs) > MAX_SEQUENCES:
-        logging.warning(f"{fasta_file} enthält {len(seqs)} Sequenzen (>{MAX_SEQUENCES}). Das könnte zu Speicherproblemen führen. Überspringe Datei.")
-        return fasta_file.name, None
+    # Small files get exactly the tree of Bio's DistanceTreeConstructor.nj, large ones a relaxed NJ tree
+    relaxed = num_records > neighbor_joining.EXACT_LIMIT
+    if relaxed:
+        logging.info(f"{fasta_file} enthält {num_records} Sequenzen (>{neighbor_joining.EXACT_LIMIT}). Verwende relaxed Neighbor Joining.")
 
     start_file = time.time()
     
     file_output_folder = output_folder / fasta_file.stem
     file_output_folder.mkdir(parents=True, exist_ok=True)
 
+    suffix = "_mash" if tree_mode == "sketch" else ""
     aligned_file = file_output_folder / f"{fasta_file.stem}.aln"
-    tree_file = file_output_folder / f"{fasta_file.stem}.nwk"
-    svg_file = file_output_folder / f"{fasta_file.stem}.svg"
+    sketch_file = file_output_folder / f"{fasta_file.stem}.sketch.npz"
+    tree_file = file_output_folder / f"{fasta_file.stem}{suffix}.nwk"
+    svg_file = file_output_folder / f"{fasta_file.stem}{suffix}.svg"
 
     logging.info(f"Processing {fasta_file}...")
 
-    if not run_msa(str(fasta_file), str(aligned_file), threads):
-        logging.error(f"MSA failed for {fasta_file}")
-        return fasta_file.name, None
+    if tree_mode == "sketch":
+        try:
+            names, sketches = minhash.sketch_fasta(fasta_file, sketch_file)
+            logging.info(f"Sketches ready for {fasta_file} ({len(names)} sequences) in {sketch_file}.")
+            condensed = minhash.mash_distances(sketches)
+            logging.info(f"Mash distance matrix calculated for {fasta_file}.")
+        except Exception as e:
+            logging.error(f"Error sketching {fasta_file}: {e}")
+            return fasta_file.name, None
+    else:
+        if not run_msa(str(fasta_file), str(aligned_file), threads):
+            logging.error(f"MSA failed for {fasta_file}")
+            return fasta_file.name, None
 
-    try:
-        alignment = AlignIO.read(aligned_file, "fasta")
-        logging.info(f"Alignment read for {fasta_file} ({len(alignment)} sequences).")
-    except Exception as e:
-        logging.error(f"Error reading alignment for {fasta_file}: {e}")
-        return fasta_file.name, None
+        try:
+            names, alignment = distance_matrix.read_alignment(aligned_file)
+            logging.info(f"Alignment read for {fasta_file} ({len(alignment)} sequences).")
+        except Exception as e:
+            logging.error(f"Error reading alignment for {fasta_file}: {e}")
+            return fasta_file.name, None
+
+        try:
+            # Same values as DistanceCalculator('identity'); float32 halves the memory of large matrices
+            dtype = np.float32 if relaxed else np.float64
+            condensed = distance_matrix.pairwise_distances(alignment, "identity", dtype=dtype)
+            logging.info(f"Distance matrix calculated for {fasta_file}.")
+        except Exception as e:
+            logging.error(f"Error calculating distances for {fasta_file}: {e}")
+            return fasta_file.name, None
 
     try:
-        calculator = DistanceCalculator('identity')
-        dm = calculator.get_distance(alignment)
-        logging.info(f"Distance matrix calculated for {fasta_file}.")
-        
-        constructor = DistanceTreeConstructor()
-        tree = constructor.nj(dm)
-        
-        Phylo.write(tree, tree_file, "newick")
+        nj_tree = neighbor_joining.neighbor_joining(names, condensed, relaxed=relaxed)
+        nj_tree.write_newick(tree_file)
         logging.info(f"Tree written to {tree_file}.")
+        tree = Phylo.read(tree_file, "newick")
     except Exception as e:
         logging.error(f"Error constructing tree for {fasta_file}: {e}")
         return fasta_file.name, None
 
     try:
-        num_seqs = len(alignment)
+        num_seqs = len(names)
         MAX_PLOT_SIZE = 50
         
         width = min(max(10, num_seqs * 0.3), MAX_PLOT_SIZE)
@@ -157,7 +210,111 @@ def print_time(seconds):
     mins, secs = divmod(seconds, 60)
     return f"{int(mins)} min {secs:.2f} s" if mins else f"{secs:.2f} s"
 
+def estimate_cost(fasta_file):
+    """
+    Estimate the relative MUSCLE run time of a FASTA file from its sequence count
+    and mean sequence length, read from the record index.
+    
+    MUSCLE compares all pairs of sequences (n^2 * L) and aligns profiles along the
+    guide tree (n * L^2); the estimate is the sum of both terms, without a constant.
+    
+    Args:
+        fasta_file (Path): Path object pointing to the input FASTA file
+    
+    Returns:
+        tuple: (number of sequences, mean sequence length, estimated cost)
+    """
+    try:
+        lengths = [entry[1] for entry in fasta_index.load_index(fasta_file).entries]
+    except ValueError:
+        # Compressed files have no index
+        lengths = [len(sequence) for _, sequence in fastaio.read_fasta(fasta_file)]
+    num_records = len(lengths)
+    mean_length = sum(lengths) / num_records if num_records else 0
+    return num_records, mean_length, num_records ** 2 * mean_length + num_records * mean_length ** 2
+
+def plan_jobs(fasta_files, cores):
+    """
+    Order the FASTA files largest first and give every file a share of the cores
+    proportional to its estimated cost (at least 1, at most all cores).
+    
+    Args:
+        fasta_files (list): Paths of the FASTA files
+        cores (int): Number of cores available for MUSCLE
+    
+    Returns:
+        list: (fasta_file, threads, estimated cost) tuples, largest cost first
+    """
+    costs = {fasta_file: estimate_cost(fasta_file)[2] for fasta_file in fasta_files}
+    total_cost = sum(costs.values()) or 1
+    jobs = []
+    for fasta_file in sorted(fasta_files, key=lambda fasta_file: (-costs[fasta_file], fasta_file.name)):
+        threads = min(cores, max(1, round(cores * costs[fasta_file] / total_cost)))
+        jobs.append((fasta_file, threads, costs[fasta_file]))
+    return jobs
+
+def run_job(fasta_file, output_folder, threads, tree_mode):
+    """Run process_fasta in a worker process with BLAS/OpenMP limited to the job's threads."""
+    limit_threads(threads)
+    return process_fasta(fasta_file, output_folder, threads, tree_mode)
+
+def run_jobs(jobs, output_folder, cores, tree_mode):
+    """
+    Run the planned jobs so that the running jobs never use more than `cores`
+    MUSCLE threads together. Jobs start largest first; while a large job waits
+    for free cores, smaller jobs that fit into the free cores start instead.
+    Start, end and threads of every job are logged, followed by the makespan.
+    
+    Args:
+        jobs (list): Result of plan_jobs
+        output_folder (Path): Directory where output subfolders will be created
+        cores (int): Number of cores available for MUSCLE
+        tree_mode (str): "msa" or "sketch", see process_fasta
+    
+    Returns:
+        float: Makespan (time from the first start to the last end) in seconds
+    """
+    start_run = time.time()
+    pending = list(jobs)
+    running = {}
+    free = cores
+    busy_time = 0.0
+    # One worker per core, the thread budget decides how many of them are used
+    with ProcessPoolExecutor(max_workers=cores) as executor:
+        while pending or running:
+            for job in list(pending):
+                fasta_file, threads, _ = job
+                if threads <= free:
+                    pending.remove(job)
+                    free -= threads
+                    future = executor.submit(run_job, fasta_file, output_folder, threads, tree_mode)
+                    running[future] = (fasta_file, threads, time.time())
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                fasta_file, threads, start_job = running.pop(future)
+                free += threads
+                end_job = time.time()
+                busy_time += (end_job - start_job) * threads
+                name, duration = future.result()
+                timing = f"start +{print_time(start_job - start_run)}, end +{print_time(end_job - start_run)}, {threads} thread(s)"
+                if duration is not None:
+                    msg = f"{name}: {print_time(duration)} ({timing})"
+                    print(msg)
+                    logging.info(msg)
+                else:
+                    msg = f"{name}: Error during processing. ({timing})"
+                    print(msg)
+                    logging.error(msg)
+    
+    makespan = time.time() - start_run
+    utilization = busy_time / (makespan * cores) * 100 if makespan else 0
+    logging.info(f"Makespan: {print_time(makespan)}, core utilization {utilization:.1f}%")
+    return makespan
+
 submodel = "checks/sorted_fasta_small"
+# "msa": MUSCLE alignment (trees for publication), "sketch": alignment-free MinHash distances (quick overview)
+tree_mode = "msa"
 fasta_folder = Path(f"../DataModel/small/{submodel}")
 output_folder = Path(f"../PHYLOTREE/")
 output_folder.mkdir(parents=True, exist_ok=True)
@@ -166,27 +323,15 @@ start_total = time.time()
 
 fasta_files = list(fasta_folder.rglob("*.fasta"))
 
-max_workers = min(os.cpu_count() or 4, 4)
-muscle_threads = max(1, (os.cpu_count() or 4) // max_workers)
-
-logging.info(f"Starting processing of {len(fasta_files)} FASTA files with {max_workers} workers and {muscle_threads} MUSCLE thread(s) per file.")
-
-with ProcessPoolExecutor(max_workers=max_workers) as executor:
-    futures = [
-        executor.submit(process_fasta, fasta_file, output_folder, muscle_threads)
-        for fasta_file in fasta_files
-    ]
-    
-    for future in as_completed(futures):
-        name, duration = future.result()
-        if duration is not None:
-            msg = f"{name}: {print_time(duration)}"
-            print(msg)
-            logging.info(msg)
-        else:
-            msg = f"{name}: Error during processing."
-            print(msg)
-            logging.error(msg)
+cores = os.cpu_count() or 4
+# MUSCLE threads only help the alignment, sketches are computed with one thread each
+jobs = plan_jobs(fasta_files, cores if tree_mode == "msa" else 1)
+
+logging.info(f"Starting processing of {len(fasta_files)} FASTA files ({tree_mode} mode) on {cores} cores, largest first.")
+for fasta_file, threads, cost in jobs:
+    logging.info(f"Planned {fasta_file.name}: estimated cost {cost:.3g}, {threads} thread(s)")
+
+run_jobs(jobs, output_folder, cores, tree_mode)
 
 end_total = time.time()
 logging.info(f"Total runtime: {print_time(end_total - start_total)}")
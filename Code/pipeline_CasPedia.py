@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
 
+from Helper import fastaio
 from Helper import format_fasta
 from Helper import merge_fasta
 from Helper import cas_translator
-from Annotater import annotate_CasPedia
+from Helper import task_graph
+from Annotater import annotate_headers
 from pathlib import Path
 import time
-import shutil
 
 def main():
     """
@@ -19,126 +20,105 @@ def main():
     temp_folder = "FASTA"
     dataset_small_folder = "DataModel/small/CasPedia"
     dataset_big_folder = "DataModel/big/CasPedia"
+    log_folder = "LOG"
 
     # Create destination directories if they don't exist
     Path(f"../{dataset_small_folder}").mkdir(parents=True, exist_ok=True)
     Path(f"../{dataset_big_folder}").mkdir(parents=True, exist_ok=True)
 
+    # Every section declares the files it reads and writes; the three CasPedia
+    # files (phylogeny, blastp and tblastn) run as independent branches on the worker pool.
+    pipeline = task_graph.TaskGraph(
+        "CasPedia",
+        stats_file=f"../{log_folder}/pipeline_stats.csv",
+        # Tasks whose inputs and parameters did not change since the last run are skipped
+        manifest_file=f"../{log_folder}/build_manifest_CasPedia.json",
+        # A failed or interrupted run continues after its last finished task
+        journal_file=f"../{log_folder}/journal_CasPedia.jsonl",
+    )
+
     # =============================================================================
-    # SECTION 2: MERGE MULTIPLE FASTA FILES
+    # SECTION 1: MERGE MULTIPLE FASTA FILES
     # =============================================================================
-    if(True):
-        print("\nMERGE_FASTA")
-        
-        # This section merges different FASTA files from a specified folder.
-        # Can process files from a single folder or include all subfolders recursively.
-        # All files with the specified ending will be combined into one output file.
-
-        input_folder = f"../{data_folder}/CasPedia/2_CasPedia_tblastn_blasted"
-        output_file = f"../{temp_folder}/CasPedia/4_MERGED/merged_tblastn_CasPedia.fasta"
-        
-        input_folder_2 = f"../{data_folder}/CasPedia/3_CasPedia_local_blastp_blasted"
-        output_file_2 = f"../{temp_folder}/CasPedia/4_MERGED/merged_blastp_CasPedia.fasta"
-
-        # File extension to look for in the containing folder (e.g.: .fa, .faa, .fasta)
-        ending = "fasta"
-        use_subfolders = False  # Set to True to include files from subdirectories
-
-        # Merge all FASTA files with specified ending into one file
-        if use_subfolders:
-            merge_fasta.merge_fasta_files_all_dict(Path(input_folder), Path(output_file), ending)
-        else:
-            merge_fasta.merge_fasta_files_current_dir(Path(input_folder), Path(output_file), ending)
-            merge_fasta.merge_fasta_files_current_dir(Path(input_folder_2), Path(output_file_2), ending)
-        print(f"Merged FASTA files saved to {output_file}")
+    # This section merges different FASTA files from a specified folder.
+    # Can process files from a single folder or include all subfolders recursively.
+    # All files with the specified ending will be combined into one output file.
+
+    # File extension to look for in the containing folder (e.g.: .fa, .faa, .fasta)
+    ending = "fasta"
+    use_subfolders = False  # Set to True to include files from subdirectories
+    merge = merge_fasta.merge_fasta_files_all_dict if use_subfolders else merge_fasta.merge_fasta_files_current_dir
+
+    for blast, input_folder in (
+        ("tblastn", f"../{data_folder}/CasPedia/2_CasPedia_tblastn_blasted"),
+        ("blastp", f"../{data_folder}/CasPedia/3_CasPedia_local_blastp_blasted"),
+    ):
+        output_file = Path(f"../{temp_folder}/CasPedia/4_MERGED/merged_{blast}_CasPedia.fasta")
+        pipeline.add(
+            f"merge_{blast}", merge,
+            Path(input_folder), output_file, ending,
+            inputs=[input_folder], outputs=[output_file],
+        )
 
     # =============================================================================
     # SECTION 2: TRANSLATE OLD NAMES OF CAS14 TO CAS12f
     # =============================================================================
-    if True:
-        print("\nTRANSLATE FASTA")
-
-        input_file = Path(f"../{data_folder}/CasPedia/1_raw/phylogeny_type5.faa")
-        output_file = Path(f"../{temp_folder}/CasPedia/5_TRANSLATED/translated_casPedia.fasta")
-
-        input_file_2 = Path(f"../{temp_folder}/CasPedia/4_MERGED/merged_blastp_CasPedia.fasta")
-        output_file_2 = Path(f"../{temp_folder}/CasPedia/5_TRANSLATED/translated_blastp_casPedia.fasta")
-
-        input_file_3 = Path(f"../{temp_folder}/CasPedia/4_MERGED/merged_tblastn_CasPedia.fasta")
-        output_file_3 = Path(f"../{temp_folder}/CasPedia/5_TRANSLATED/translated_tblastn_casPedia.fasta")
-
-        cas_translator.translator(input_file, output_file)
-        cas_translator.translator(input_file_2, output_file_2)
-        cas_translator.translator(input_file_3, output_file_3)
+    # (branch, input file, suffix of the intermediate files, header appendix, DataModel file name)
+    branches = (
+        ("casPedia", Path(f"../{data_folder}/CasPedia/1_raw/phylogeny_type5.faa"), "casPedia", "|CasPedia", "CasPedia"),
+        ("blastp", Path(f"../{temp_folder}/CasPedia/4_MERGED/merged_blastp_CasPedia.fasta"), "blastp_casPedia", "|blastp_CasPedia", "blastp_CasPedia"),
+        ("tblastn", Path(f"../{temp_folder}/CasPedia/4_MERGED/merged_tblastn_CasPedia.fasta"), "tblastn_casPedia", "|tblastn_CasPedia", "tblastn_CasPedia"),
+    )
+
+    for branch, input_file, suffix, _, _ in branches:
+        # Uses the alias map in Helper/cas_aliases.tsv
+        output_file = Path(f"../{temp_folder}/CasPedia/5_TRANSLATED/translated_{suffix}.fasta")
+        pipeline.add(
+            f"translate_{branch}", cas_translator.translator,
+            input_file, output_file,
+            inputs=[input_file, cas_translator.ALIAS_FILE], outputs=[output_file],
+        )
 
     # =============================================================================
     # SECTION 3: FORMAT SPECIFIC FASTA FILE
     # =============================================================================
-    if True:
-        print("\nFORMAT_FASTA")
-        
-        # This section formats a specific FASTA file for standardization.
-        # It is used to unify different FASTA files for proper comparability 
-        # and adds a subtype appendix to the header for later recognition.
-        # The sequence lines are also wrapped to a specified line length.
-
-        input_file = Path(f"../{temp_folder}/CasPedia/5_TRANSLATED/translated_casPedia.fasta")
-        output_file = Path(f"../{temp_folder}/CasPedia/6_FORMATTED/formatted_casPedia.fasta")
-
-        input_file_2 = Path(f"../{temp_folder}/CasPedia/5_TRANSLATED/translated_blastp_casPedia.fasta")
-        output_file_2 = Path(f"../{temp_folder}/CasPedia/6_FORMATTED/formatted_blastp_casPedia.fasta")
-
-        input_file_3 = Path(f"../{temp_folder}/CasPedia/5_TRANSLATED/translated_tblastn_casPedia.fasta")
-        output_file_3 = Path(f"../{temp_folder}/CasPedia/6_FORMATTED/formatted_tblastn_casPedia.fasta")
-        
-        appendix = "|CasPedia"  # Subtype information added to each header
-        line_length = 60  # Maximum characters per sequence line
-
-        # Format the FASTA file with specified parameters
-        format_fasta.format_fasta(input_file, output_file, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_file}")
-
-        appendix = "|blastp_CasPedia"
-        format_fasta.format_fasta(input_file_2, output_file_2, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_file_2}")
-
-        appendix = "|tblastn_CasPedia"
-        format_fasta.format_fasta(input_file_3, output_file_3, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_file_3}")
+    # This section formats a specific FASTA file for standardization.
+    # It is used to unify different FASTA files for proper comparability
+    # and adds a subtype appendix to the header for later recognition.
+    # The sequence lines are also wrapped to a specified line length.
+    line_length = 60  # Maximum characters per sequence line
+
+    for branch, _, suffix, appendix, _ in branches:
+        input_file = Path(f"../{temp_folder}/CasPedia/5_TRANSLATED/translated_{suffix}.fasta")
+        output_file = Path(f"../{temp_folder}/CasPedia/6_FORMATTED/formatted_{suffix}.fasta")
+        pipeline.add(
+            f"format_{branch}", format_fasta.format_fasta,
+            input_file, output_file, appendix, line_length,
+            inputs=[input_file], outputs=[output_file],
+        )
 
     # =============================================================================
     # SECTION 4: UNIFY HEADERS
     # =============================================================================
-    if True:
-        print("\nUNIFY HEADERS")
-
-        input_folder = f"../{temp_folder}/CasPedia/6_FORMATTED"
-
-        input_file = Path(f"{input_folder}/formatted_casPedia.fasta")
-        output_file = Path(f"../{dataset_small_folder}/CasPedia.fasta")
-
-        input_file_2 = Path(f"{input_folder}/formatted_blastp_casPedia.fasta")
-        output_file_2 = Path(f"../{dataset_small_folder}/blastp_CasPedia.fasta")
-
-        input_file_3 = Path(f"{input_folder}/formatted_tblastn_casPedia.fasta")
-        output_file_3 = Path(f"../{dataset_small_folder}/tblastn_CasPedia.fasta")
-
-        annotate_CasPedia.annotate_CasPedia(input_file, output_file)
-        annotate_CasPedia.annotate_CasPedia(input_file_2, output_file_2)
-        annotate_CasPedia.annotate_CasPedia(input_file_3, output_file_3)
-
-        source = f"../{dataset_small_folder}/CasPedia.fasta"
-        destination = f"../{dataset_big_folder}/CasPedia.fasta"
-
-        source_2 = f"../{dataset_small_folder}/blastp_CasPedia.fasta"
-        destination_2 = f"../{dataset_big_folder}/blastp_CasPedia.fasta"
-
-        source_3 = f"../{dataset_small_folder}/tblastn_CasPedia.fasta"
-        destination_3 = f"../{dataset_big_folder}/tblastn_CasPedia.fasta"
-
-        shutil.copy(source, destination)
-        shutil.copy(source_2, destination_2)
-        shutil.copy(source_3, destination_3)
+    for branch, _, suffix, _, name in branches:
+        input_file = Path(f"../{temp_folder}/CasPedia/6_FORMATTED/formatted_{suffix}.fasta")
+        output_file = Path(f"../{dataset_small_folder}/{name}.fasta")
+        metadata_file = Path(f"../{temp_folder}/CasPedia/7_METADATA/{name}.tsv")
+        pipeline.add(
+            f"unify_{branch}", annotate_headers.annotate_file,
+            "caspedia", input_file, output_file, metadata_file,
+            inputs=[input_file], outputs=[output_file, metadata_file],
+        )
+
+        # The big DataModel gets the same file
+        destination = Path(f"../{dataset_big_folder}/{name}.fasta")
+        pipeline.add(
+            f"copy_{branch}", fastaio.copy_file,
+            output_file, destination,
+            inputs=[output_file], outputs=[destination],
+        )
+
+    pipeline.run()
 
     # Calculate and display timing information
     end_time = time.time()
@@ -1,18 +1,13 @@
 #!/usr/bin/env python3
 
-from Helper import format_fasta
-from Helper import merge_fasta
-from Helper import filter_JSON
-from Helper import json_to_fasta
-from Helper import filter_JSON_FASTA
+from Helper import task_graph
 from Annotater import annotate_CRISPRCas_Atlas
-from pathlib import Path
 import time
 
 def main():
     """
     Main function to run all filtering and formatting operations.
-    Processes CRISPR Cas Atlas database, formats FASTA files, and merges multiple files.
+    Processes CRISPR Cas Atlas database into annotated FASTA files for the DataModel.
     """
     start_time = time.time()
 
@@ -20,147 +15,54 @@ def main():
     temp_folder = "FASTA"
     dataset_small_folder = "DataModel/small"
     dataset_big_folder = "DataModel/big"
+    log_folder = "LOG"
+
+    # Every section declares the files it reads and writes
+    pipeline = task_graph.TaskGraph(
+        "JSON",
+        stats_file=f"../{log_folder}/pipeline_stats.csv",
+        # Tasks whose inputs and parameters did not change since the last run are skipped
+        manifest_file=f"../{log_folder}/build_manifest_JSON.json",
+        # A failed or interrupted run continues after its last finished task
+        journal_file=f"../{log_folder}/journal_JSON.jsonl",
+    )
 
     # =============================================================================
-    # SECTION 1: FILTER JSON FILE
+    # SECTION 1: JSON TO ANNOTATED FASTA
     # =============================================================================
-    if(True):
-        print("FILTER_JSON")
-        
-        # This section filters a JSON file to extract relevant Type V CRISPR-Cas information.
-        # It reads the input JSON, processes it according to specific criteria,
-        # and writes the filtered data to an output file for further analysis.
-        
-        # Define input and output file paths for JSON filtering
-        file_name = "crispr-cas-atlas-v1.0.json"
-        filter_prefix = "Type_V_filtered_"
-        input_file = f"../{data_folder}/CRISPR-Cas_Atlas/{file_name}"
-        output_file = f"../{temp_folder}/CRISPR-Cas_Atlas/{filter_prefix}{file_name}"
-        
-        # Filter the JSON file using the filter_JSON function
-        # This extracts only Type V CRISPR-Cas systems from the complete atlas
-        filter_JSON.filter_json_by_subtype_v(input_file, output_file)
-        print(f"Filtered JSON file saved to {output_file}")
-
-    # =============================================================================
-    # SECTION 2: CONVERT JSON TO FASTA FILES
-    # =============================================================================
-    if(True):
-        print("\nJSON_TO_FASTA")
-        
-        # This section converts the filtered JSON file to FASTA format.
-        # It extracts protein sequences from the JSON data and creates separate
-        # FASTA files for different Cas proteins or combined files as needed.
-        
-        # Define input and output paths for JSON to FASTA conversion
-        input_json = f"../{temp_folder}/CRISPR-Cas_Atlas/Type_V_filtered_crispr-cas-atlas-v1.0.json"
-        output_folder = f"../{temp_folder}/CRISPR-Cas_Atlas/1_FASTA/"
-        
-        # Convert JSON to FASTA files using the json_to_fasta function
-        # This creates FASTA files from the filtered JSON data
-        json_to_fasta.json_to_fasta_simple(input_json, output_folder)
-        print(f"FASTA files created in {output_folder}")
-
-    # =============================================================================
-    # SECTION 3: MERGE MULTIPLE FASTA FILES
-    # =============================================================================
-    if(True):
-        print("\nMERGE_FASTA")
-        
-        # This section merges different FASTA files from a specified folder.
-        # Can process files from a single folder or include all subfolders recursively.
-        # All files with the specified ending will be combined into one output file.
-
-        input_folder = f"../{temp_folder}/CRISPR-Cas_Atlas/1_FASTA"
-        output_file = f"../{temp_folder}/CRISPR-Cas_Atlas/2_FASTA_PROCESSED/merged_CRISPR-Cas_Atlas.fasta"
-        # File extension to look for in the containing folder (e.g.: .fa, .faa, .fasta)
-        ending = "fasta"
-        use_subfolders = False  # Set to True to include files from subdirectories
-
-        # Merge all FASTA files with specified ending into one file
-        if use_subfolders:
-            merge_fasta.merge_fasta_files_all_dict(Path(input_folder), Path(output_file), ending)
-        else:
-            merge_fasta.merge_fasta_files_current_dir(Path(input_folder), Path(output_file), ending)
-        print(f"Merged FASTA files saved to {output_file}")
-
-
-    # =============================================================================
-    # SECTION 4: FILTER FASTA BY KEYWORD
-    # =============================================================================
-    if(True):
-        print("\nFILTER_JSON_FASTA")
-        
-        # This section filters a FASTA file to extract sequences whose headers contain
-        # a specific keyword. It performs case-insensitive search and writes only
-        # matching sequences (header + sequence data) to the output file.
-        # This is useful for isolating specific protein families or types.
-
-        input_file = Path(f"../{temp_folder}/CRISPR-Cas_Atlas/2_FASTA_PROCESSED/merged_CRISPR-Cas_Atlas.fasta")
-        output_file = Path(f"../{temp_folder}/CRISPR-Cas_Atlas/2_FASTA_PROCESSED/filtered_CRISPR-Cas_Atlas.fasta")
-        keyword = "cas12"  # Keyword to search for in sequence headers (case-insensitive)
-
-        # Filter the FASTA file using the filter_JSON_FASTA function
-        # This extracts only sequences containing the specified keyword in their headers
-        filter_JSON_FASTA.filter_JSON_FASTA(input_file, output_file, keyword)
-        print(f"Filtered FASTA file saved to {output_file}")
-
-    # =============================================================================
-    # SECTION 5: FORMAT SPECIFIC FASTA FILE
-    # =============================================================================
-    if(True):
-        print("\nFORMAT_FASTA")
-        
-        # This section formats a specific FASTA file for standardization.
-        # It is used to unify different FASTA files for proper comparability 
-        # and adds a subtype appendix to the header for later recognition.
-        # The sequence lines are also wrapped to a specified line length.
-
-        # Small DataModel
-        input_file = Path(f"../{temp_folder}/CRISPR-Cas_Atlas/2_FASTA_PROCESSED/filtered_CRISPR-Cas_Atlas.fasta")
-        output_file = Path(f"../{temp_folder}/CRISPR-Cas_Atlas/3.1_FASTA_FORMATTED/formatted_CRISPR-Cas_Atlas.fasta")
-        appendix = ""  # Subtype information added to each header
-        line_length = 60  # Maximum characters per sequence line
-
-        # Format the FASTA file with specified parameters
-        format_fasta.format_fasta(input_file, output_file, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_file}")
-
-        # Big DataModel
-        input_file = Path(f"../{temp_folder}/CRISPR-Cas_Atlas/2_FASTA_PROCESSED/merged_CRISPR-Cas_Atlas.fasta")
-        output_file = Path(f"../{temp_folder}/CRISPR-Cas_Atlas/3.2_FASTA_FORMATTED/formatted_CRISPR-Cas_Atlas.fasta")
-        appendix = ""  # Subtype information added to each header
-        line_length = 60  # Maximum characters per sequence line
-
-        # Format the FASTA file with specified parameters
-        format_fasta.format_fasta(input_file, output_file, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_file}")
-
-    # =============================================================================
-    # SECTION 6: UNIFY HEADER
-    # =============================================================================
-    if(True):
-        print("\nUNIFY_HEADER")
-
-        # Small DataModel
-        # Define input file path
-        fasta_folder = f"../{temp_folder}/CRISPR-Cas_Atlas/3.1_FASTA_FORMATTED"
-
-        file_counter = 1
-        for fasta_file in Path(fasta_folder).glob("*.fasta"):
-            output_file = f"../{dataset_small_folder}/CRISPR-Cas_Atlas/CRISPR-Cas_Atlas_{file_counter}.fasta"
-            annotate_CRISPRCas_Atlas.annotate_crispr_cas_atlas(fasta_file, output_file)
-            file_counter += 1
-        print(f"Unified file saved to {output_file}.")
-
-        # Big DataModel
-        fasta_folder = f"../{temp_folder}/CRISPR-Cas_Atlas/3.2_FASTA_FORMATTED"
-
-        file_counter = 1
-        for fasta_file in Path(fasta_folder).glob("*.fasta"):
-            output_file = f"../{dataset_big_folder}/CRISPR-Cas_Atlas/CRISPR-Cas_Atlas_{file_counter}.fasta"
-            annotate_CRISPRCas_Atlas.annotate_crispr_cas_atlas(fasta_file, output_file)
-            file_counter += 1
+    # This section streams the CRISPR-Cas Atlas once and writes the annotated
+    # DataModel files directly. Only Type V operons are kept; the small DataModel
+    # gets the proteins whose header contains the keyword, the big DataModel all
+    # Cas proteins of these operons. Sequences are wrapped to the line length.
+    # The filtered JSON, the per-operon FASTA files and the merged, filtered and
+    # formatted intermediate files of the former sections are no longer written.
+
+    file_name = "crispr-cas-atlas-v1.0.json"
+    input_file = f"../{data_folder}/CRISPR-Cas_Atlas/{file_name}"
+    small_output_file = f"../{dataset_small_folder}/CRISPR-Cas_Atlas/CRISPR-Cas_Atlas_1.fasta"
+    big_output_file = f"../{dataset_big_folder}/CRISPR-Cas_Atlas/CRISPR-Cas_Atlas_1.fasta"
+    keyword = "cas12"  # Keyword to search for in sequence headers (case-insensitive)
+    line_length = 60  # Maximum characters per sequence line
+
+    # Set to True to additionally write the operons as an optional side output
+    write_operon_files = False
+    # Format of that side output (no effect without write_operon_files): True packs the
+    # operons into one FASTA file with an offset index, False writes one FASTA file per operon
+    pack_operon_files = True
+    operon_folder = f"../{temp_folder}/CRISPR-Cas_Atlas/1_FASTA/" if write_operon_files else None
+
+    pipeline.add(
+        "json_to_annotated_fasta", annotate_CRISPRCas_Atlas.annotate_atlas_json,
+        input_file, small_output_file, keyword,
+        unfiltered_output_file=big_output_file,
+        operon_folder=operon_folder,
+        line_length=line_length,
+        pack_operons=pack_operon_files,
+        inputs=[input_file],
+        outputs=[small_output_file, big_output_file] + ([operon_folder] if operon_folder else []),
+    )
+
+    pipeline.run()
 
     # Calculate and display timing information
     end_time = time.time()
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 
+from Helper import fastaio
 from Helper import format_fasta
-from Annotater import annotate_Marcus
+from Helper import task_graph
+from Annotater import annotate_headers
 from pathlib import Path
 import time
-import shutil
 
 def main():
     """
@@ -17,47 +18,63 @@ def main():
     temp_folder = "FASTA"
     dataset_small_folder = "DataModel/small"
     dataset_big_folder = "DataModel/big"
+    log_folder = "LOG"
 
     # Create necessary directories
     Path(f"../{temp_folder}/Marcus_File").mkdir(parents=True, exist_ok=True)
     Path(f"../{dataset_small_folder}/Marcus_File").mkdir(parents=True, exist_ok=True)
     Path(f"../{dataset_big_folder}/Marcus_File").mkdir(parents=True, exist_ok=True)
 
+    # Every section declares the files it reads and writes
+    pipeline = task_graph.TaskGraph(
+        "Marcus",
+        stats_file=f"../{log_folder}/pipeline_stats.csv",
+        # Tasks whose inputs and parameters did not change since the last run are skipped
+        manifest_file=f"../{log_folder}/build_manifest_Marcus.json",
+        # A failed or interrupted run continues after its last finished task
+        journal_file=f"../{log_folder}/journal_Marcus.jsonl",
+    )
+
     # =============================================================================
     # SECTION 1: FORMAT AND STANDARDIZE MARCUS FASTA FILE
     # =============================================================================
-    if(True):
-        print("FORMAT_FASTA")
-        
-        # Format the Marcus FASTA file and add cas12k subtype annotation
-        # This standardizes the file format and adds subtype information to headers
-        input_file = Path(f"../{data_folder}/Marcus_File/marcus_file.fasta")
-        output_file = Path(f"../{temp_folder}/Marcus_File/marcus_file_formatted.fasta")
-        appendix = " | subtype=cas12k"  # Subtype information added to each header
-        line_length = 60  # Maximum characters per sequence line
+    # Format the Marcus FASTA file and add cas12k subtype annotation
+    # This standardizes the file format and adds subtype information to headers
+    input_file = Path(f"../{data_folder}/Marcus_File/marcus_file.fasta")
+    output_file = Path(f"../{temp_folder}/Marcus_File/marcus_file_formatted.fasta")
+    appendix = " | subtype=cas12k"  # Subtype information added to each header
+    line_length = 60  # Maximum characters per sequence line
 
-        format_fasta.format_fasta(input_file, output_file, appendix, line_length)
+    pipeline.add(
+        "format", format_fasta.format_fasta,
+        input_file, output_file, appendix, line_length,
+        inputs=[input_file], outputs=[output_file],
+    )
 
     # =============================================================================
     # SECTION 2: ANNOTATE FORMATTED FASTA FILE
     # =============================================================================
-    if(True):
-        print("ANNOTATE_FASTA")
-        
-        # Annotate the formatted Marcus FASTA file with additional metadata
-        # This processes the formatted file and adds comprehensive annotations
-        
-        # Define input and output file paths
-        fasta_file = f"../{temp_folder}/Marcus_File/marcus_file_formatted.fasta"
-        output_file=f"../{dataset_small_folder}/Marcus_File/marcus_annotated.fasta"
-
-        annotate_Marcus.annotate_marcus_fasta(fasta_file, output_file)
+    # Annotate the formatted Marcus FASTA file with additional metadata
+    # This processes the formatted file and adds comprehensive annotations
+    fasta_file = Path(f"../{temp_folder}/Marcus_File/marcus_file_formatted.fasta")
+    output_file = Path(f"../{dataset_small_folder}/Marcus_File/marcus_annotated.fasta")
+    metadata_file = Path(f"../{temp_folder}/Marcus_File/marcus_metadata.tsv")
 
+    pipeline.add(
+        "annotate", annotate_headers.annotate_file,
+        "marcus", fasta_file, output_file, metadata_file,
+        inputs=[fasta_file], outputs=[output_file, metadata_file],
+    )
 
-    source = f"../{dataset_small_folder}/Marcus_File/marcus_annotated.fasta"
-    destination = f"../{dataset_big_folder}/Marcus_File/marcus_annotated.fasta"
+    # The big DataModel gets the same file
+    destination = Path(f"../{dataset_big_folder}/Marcus_File/marcus_annotated.fasta")
+    pipeline.add(
+        "copy", fastaio.copy_file,
+        output_file, destination,
+        inputs=[output_file], outputs=[destination],
+    )
 
-    shutil.copy(source, destination)
+    pipeline.run()
 
     # Calculate and display timing information
     end_time = time.time()
@@ -3,6 +3,7 @@
 from Helper import format_fasta
 from Helper import merge_fasta
 from Helper import filter_faa_casette_CSV
+from Helper import task_graph
 from Annotater import annotate_NCBI
 from pathlib import Path
 import time
@@ -14,95 +15,88 @@ def main():
     temp_folder = "FASTA"
     dataset_small_folder = "DataModel/small"
     dataset_big_folder = "DataModel/big"
+    log_folder = "LOG"
+
+    # Every section declares the files it reads and writes; the small and the big
+    # DataModel run as independent branches on the worker pool.
+    pipeline = task_graph.TaskGraph(
+        "NCBI",
+        stats_file=f"../{log_folder}/pipeline_stats.csv",
+        # Tasks whose inputs and parameters did not change since the last run are skipped
+        manifest_file=f"../{log_folder}/build_manifest_NCBI.json",
+        # A failed or interrupted run continues after its last finished task
+        journal_file=f"../{log_folder}/journal_NCBI.jsonl",
+    )
+    csv_file = Path(f"../{data_folder}/NCBI/Complete_Cassette_summary.csv")
+    processed_folder = Path(f"../{data_folder}/NCBI/2_NCBI_Processed")
 
     # =============================================================================
     # SECTION 1: FILTER FASTA FILES ACCORDING TO CASSETTE CSV
     # =============================================================================
-    if(True):
-        #Small DataModel
-        fasta_folder = f"../{data_folder}/NCBI/2_NCBI_Processed/"
-        csv_file = f"../{data_folder}/NCBI/Complete_Cassette_summary.csv"
-        output_dir = f"../{temp_folder}/NCBI/3_NCBI_Filtered/"
+    #Small DataModel
+    filtered_folder = Path(f"../{temp_folder}/NCBI/3_NCBI_Filtered")
 
-        # Call function once with the entire folder (not per file)
-        filter_faa_casette_CSV.filter_faa_casette_CSV(csv_file, fasta_folder, output_dir)
+    # The filter and subtype tasks process their files in a pool of their own; each
+    # occupies all worker slots of the pipeline, so they run one after the other
+    workers = pipeline.workers
 
+    # Call function once with the entire folder (not per file)
+    pipeline.add(
+        "filter_cassettes", filter_faa_casette_CSV.filter_faa_casette_CSV,
+        csv_file, processed_folder, filtered_folder, workers,
+        inputs=[csv_file, processed_folder], outputs=[filtered_folder], slots=workers,
+    )
 
     # =============================================================================
     # SECTION 2: ANNOTATE AND SUBTYPE FASTA FILES
     # =============================================================================
-    if(True):
-        #Small DataModel
-        fasta_folder = f"../{temp_folder}/NCBI/3_NCBI_Filtered/"
-        csv_file = f"../{data_folder}/NCBI/Complete_Cassette_summary.csv"
-        output_dir = f"../{temp_folder}/NCBI/4.1_NCBI_subtyped/"
-
-        for fasta_file in Path(fasta_folder).glob("*.faa"):
-            annotate_NCBI.process_fasta_file(fasta_file, csv_file, output_dir)
-
-        #Big DataModel
-        fasta_folder = f"../{data_folder}/NCBI/2_NCBI_Processed/"
-        csv_file = f"../{data_folder}/NCBI/Complete_Cassette_summary.csv"
-        output_dir = f"../{temp_folder}/NCBI/4.2_NCBI_subtyped/"
-
-        for fasta_file in Path(fasta_folder).glob("*.faa"):
-            annotate_NCBI.process_fasta_file(fasta_file, csv_file, output_dir)
+    # (DataModel, input folder, number of the intermediate folders, DataModel folder)
+    models = (
+        ("small", filtered_folder, "1", dataset_small_folder),
+        ("big", processed_folder, "2", dataset_big_folder),
+    )
+
+    for model, fasta_folder, number, _ in models:
+        output_dir = Path(f"../{temp_folder}/NCBI/4.{number}_NCBI_subtyped")
+        # Only the CSV path is passed, the task builds the subtype mapping once for its workers
+        pipeline.add(
+            f"subtype_{model}", annotate_NCBI.process_fasta_folder,
+            fasta_folder, csv_file, output_dir, workers=workers,
+            inputs=[fasta_folder, csv_file], outputs=[output_dir], slots=workers,
+        )
 
     # =============================================================================
     # SECTION 3: MERGE ANNOTATED FASTA FILES
     # =============================================================================
-    if(True):
-        #Small DataModel
-        print("MERGE_FASTA")
-        input_folder = f"../{temp_folder}/NCBI/4.1_NCBI_subtyped"
-        output_file = f"../{temp_folder}/NCBI/5.1_NCBI_merged/merged_NCBI.fasta"
-        ending = "fasta"
-        use_subfolders = False
-
-        if use_subfolders:
-            merge_fasta.merge_fasta_files_all_dict(Path(input_folder), Path(output_file), ending)
-        else:
-            merge_fasta.merge_fasta_files_current_dir(Path(input_folder), Path(output_file), ending)
-        print(f"Merged FASTA files saved to {output_file}")
-
-        #Big DataModel
-        print("MERGE_FASTA")
-        input_folder = f"../{temp_folder}/NCBI/4.2_NCBI_subtyped"
-        output_file = f"../{temp_folder}/NCBI/5.2_NCBI_merged/merged_NCBI.fasta"
-        ending = "fasta"
-        use_subfolders = False
-
-        if use_subfolders:
-            merge_fasta.merge_fasta_files_all_dict(Path(input_folder), Path(output_file), ending)
-        else:
-            merge_fasta.merge_fasta_files_current_dir(Path(input_folder), Path(output_file), ending)
-        print(f"Merged FASTA files saved to {output_file}")
+    ending = "fasta"
+    use_subfolders = False
+    merge = merge_fasta.merge_fasta_files_all_dict if use_subfolders else merge_fasta.merge_fasta_files_current_dir
+
+    for model, _, number, _ in models:
+        input_folder = Path(f"../{temp_folder}/NCBI/4.{number}_NCBI_subtyped")
+        output_file = Path(f"../{temp_folder}/NCBI/5.{number}_NCBI_merged/merged_NCBI.fasta")
+        pipeline.add(
+            f"merge_{model}", merge,
+            input_folder, output_file, ending,
+            inputs=[input_folder], outputs=[output_file],
+        )
 
     # =============================================================================
     # SECTION 4: FORMAT AND STANDARDIZE FINAL FASTA FILE
     # =============================================================================
-    if(True):
-        #Small DataModel
-        print("FORMAT_FASTA")
-        input_file = Path(f"../{temp_folder}/NCBI/5.1_NCBI_merged/merged_NCBI.fasta")
-        output_file = Path(f"../{dataset_small_folder}/NCBI/NCBI.fasta")
-        appendix = ""
-        line_length = 60
-
-        format_fasta.format_fasta(input_file, output_file, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_file}")
-
-        #Big DataModel
-        print("FORMAT_FASTA")
-        input_file = Path(f"../{temp_folder}/NCBI/5.2_NCBI_merged/merged_NCBI.fasta")
-        output_file = Path(f"../{dataset_big_folder}/NCBI/NCBI.fasta")
-        appendix = ""
-        line_length = 60
-
-        format_fasta.format_fasta(input_file, output_file, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_file}")
-
-
+    appendix = ""
+    line_length = 60
+
+    for model, _, number, dataset_folder in models:
+        input_file = Path(f"../{temp_folder}/NCBI/5.{number}_NCBI_merged/merged_NCBI.fasta")
+        output_file = Path(f"../{dataset_folder}/NCBI/NCBI.fasta")
+        pipeline.add(
+            f"format_{model}", format_fasta.format_fasta,
+            input_file, output_file, appendix, line_length,
+            inputs=[input_file], outputs=[output_file],
+        )
+
+    pipeline.run()
 
     # Calculate and display execution timing information
     end_time = time.time()
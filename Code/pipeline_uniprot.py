@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
 from Helper import format_fasta
-from Annotater import annotate_uniprot
+from Annotater import annotate_headers
 from Helper import filter_uniprot
+from Helper import task_graph
 from pathlib import Path
 import time
 
@@ -13,113 +14,85 @@ def main():
     temp_folder = "FASTA"
     dataset_small_folder = "DataModel/small"
     dataset_big_folder = "DataModel/big"
+    log_folder = "LOG"
 
     Path(f"../{dataset_small_folder}").mkdir(parents=True, exist_ok=True)
     Path(f"../{dataset_big_folder}").mkdir(parents=True, exist_ok=True)
 
+    # Every section declares the files it reads and writes; the TrEMBL and SwissProt
+    # branches and the small and big DataModel run concurrently on the worker pool.
+    pipeline = task_graph.TaskGraph(
+        "uniprot",
+        stats_file=f"../{log_folder}/pipeline_stats.csv",
+        # Tasks whose inputs and parameters did not change since the last run are skipped
+        manifest_file=f"../{log_folder}/build_manifest_uniprot.json",
+        # A failed or interrupted run continues after its last finished task
+        journal_file=f"../{log_folder}/journal_uniprot.jsonl",
+    )
+    names = ("uniprot_trembl", "uniprot_sprot")
+
     # =============================================================================
     # SECTION 1: FILTER UNIPROT
     # =============================================================================
-    if(True):
-        print("FILTER UNIPROT")
-
-        input_folder = f"../{data_folder}/uniprot/1_raw/"
-        output_folder = f"../{temp_folder}/uniprot/2_filtered/"
+    input_folder = f"../{data_folder}/uniprot/1_raw"
+    output_folder = f"../{temp_folder}/uniprot/2_filtered"
+    # Both raw files are scanned at the same time, each with half of the pipeline's
+    # worker slots; a filter task occupies as many slots as it starts processes
+    workers = max(pipeline.workers // len(names), 1)
 
-        name = "uniprot_trembl"
+    for name in names:
         input_file = f"{input_folder}/{name}.fasta"
         output_file = f"{output_folder}/{name}_filtered.fasta"
-        filter_uniprot.filter_uniprot(input_file, output_file, "cas12", "-like", 5)
-        print(f"Filtered UniProt Trembl file saved to {output_file}")
-
-        name_2 = "uniprot_sprot"
-        input_file_2 = f"{input_folder}/{name_2}.fasta"
-        output_file_2 = f"{output_folder}/{name_2}_filtered.fasta"
-        filter_uniprot.filter_uniprot(input_file_2, output_file_2, "cas12", "-like", 5)
-        print(f"Filtered UniProt Sprot file saved to {output_file_2}")
+        pipeline.add(
+            f"filter_{name}", filter_uniprot.filter_uniprot,
+            input_file, output_file, "cas12", "-like", 5, workers,
+            inputs=[input_file], outputs=[output_file], slots=workers,
+        )
 
     # =============================================================================
     # SECTION 2: FORMAT SPECIFIC FASTA FILE
     # =============================================================================
-    if(True):
-        print("\nFORMAT_FASTA")
+    appendix = ""
+    line_length = 60
 
+    for name in names:
         #Small DataModel
-        input_folder = f"../{temp_folder}/uniprot/2_filtered"
-        output_folder = f"../{temp_folder}/uniprot/3.1_formatted"
-
-        name = "uniprot_trembl"
-        input_file = Path(f"{input_folder}/{name}_filtered.fasta")
-        output_file = Path(f"{output_folder}/{name}_formatted.fasta")
-
-        name_2 = "uniprot_sprot"
-        input_file_2 = Path(f"{input_folder}/{name_2}_filtered.fasta")
-        output_file_2 = Path(f"{output_folder}/{name_2}_formatted.fasta")
-
-        appendix = ""
-        line_length = 60
-
-        format_fasta.format_fasta(input_file, output_file, appendix, line_length)
-        format_fasta.format_fasta(input_file_2, output_file_2, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_folder}")
+        input_file = Path(f"../{temp_folder}/uniprot/2_filtered/{name}_filtered.fasta")
+        output_file = Path(f"../{temp_folder}/uniprot/3.1_formatted/{name}_formatted.fasta")
+        pipeline.add(
+            f"format_small_{name}", format_fasta.format_fasta,
+            input_file, output_file, appendix, line_length,
+            inputs=[input_file], outputs=[output_file],
+        )
 
         #Big DataModel
-        input_folder = f"../{data_folder}/uniprot/1_raw/"
-        output_folder = f"../{temp_folder}/uniprot/3.2_formatted"
-
-        name = "uniprot_trembl"
-        input_file = Path(f"{input_folder}/{name}.fasta")
-        output_file = Path(f"{output_folder}/{name}_formatted.fasta")
-
-        name_2 = "uniprot_sprot"
-        input_file_2 = Path(f"{input_folder}/{name_2}.fasta")
-        output_file_2 = Path(f"{output_folder}/{name_2}_formatted.fasta")
+        input_file = Path(f"../{data_folder}/uniprot/1_raw/{name}.fasta")
+        output_file = Path(f"../{temp_folder}/uniprot/3.2_formatted/{name}_formatted.fasta")
+        pipeline.add(
+            f"format_big_{name}", format_fasta.format_fasta,
+            input_file, output_file, appendix, line_length,
+            inputs=[input_file], outputs=[output_file],
+        )
 
-        appendix = ""
-        line_length = 60
-
-        format_fasta.format_fasta(input_file, output_file, appendix, line_length)
-        format_fasta.format_fasta(input_file_2, output_file_2, appendix, line_length)
-        print(f"Formatted FASTA file saved to {output_folder}")
     # =============================================================================
     # SECTION 3: UNIFY HEADER
     # =============================================================================
-    if(True):
-        print("\nUNIFY_HEADER")
-
-        #Small DataModel
-        input_folder = f"../{temp_folder}/uniprot/3.1_formatted"
-        output_folder = f"../{dataset_small_folder}/uniprot"
-
-        name = "uniprot_trembl"
-        input_file = Path(f"{input_folder}/{name}_formatted.fasta")
-        output_file = Path(f"{output_folder}/{name}.fasta")
-
-        name_2 = "uniprot_sprot"
-        input_file_2 = Path(f"{input_folder}/{name_2}_formatted.fasta")
-        output_file_2 = Path(f"{output_folder}/{name_2}.fasta")
-
-        annotate_uniprot.annotate_uniprot_fasta(input_file, output_file)
-        annotate_uniprot.annotate_uniprot_fasta(input_file_2, output_file_2)
-
-        #Big DataModel
-        input_folder = f"../{temp_folder}/uniprot/3.2_formatted"
-        output_folder = f"../{dataset_big_folder}/uniprot"
-
-        name = "uniprot_trembl"
-        input_file = Path(f"{input_folder}/{name}_formatted.fasta")
-        output_file = Path(f"{output_folder}/{name}.fasta")
-
-        name_2 = "uniprot_sprot"
-        input_file_2 = Path(f"{input_folder}/{name_2}_formatted.fasta")
-        output_file_2 = Path(f"{output_folder}/{name_2}.fasta")
-
-        annotate_uniprot.annotate_uniprot_fasta(input_file, output_file)
-        annotate_uniprot.annotate_uniprot_fasta(input_file_2, output_file_2)
-        
-
-
-
+    # The parsed fields and original headers are kept in a metadata table per file.
+    for input_folder, output_folder, model in (
+        (f"../{temp_folder}/uniprot/3.1_formatted", f"../{dataset_small_folder}/uniprot", "small"),
+        (f"../{temp_folder}/uniprot/3.2_formatted", f"../{dataset_big_folder}/uniprot", "big"),
+    ):
+        for name in names:
+            input_file = Path(f"{input_folder}/{name}_formatted.fasta")
+            output_file = Path(f"{output_folder}/{name}.fasta")
+            metadata_file = Path(f"../{temp_folder}/uniprot/4_metadata/{model}_{name}.tsv")
+            pipeline.add(
+                f"unify_{model}_{name}", annotate_headers.annotate_file,
+                "uniprot", input_file, output_file, metadata_file,
+                inputs=[input_file], outputs=[output_file, metadata_file],
+            )
+
+    pipeline.run()
 
     # Calculate and display timing information
     end_time = time.time()
@@ -1,44 +1,76 @@
+import os
 import re
-from collections import defaultdict
+from collections import OrderedDict
 from pathlib import Path
+from Helper import fastaio
 
-def sort_fasta_by_subtype(input_fasta_path, output_dir_path):
+# Subtype field between the first two '|' of a unified header (accession|subtype|source)
+SUBTYPE_FIELD = re.compile(r"\|([^|]+)\|")
+# Name of the bucket for records without a subtype field
+UNASSIGNED = "unassigned"
+# Characters collected per subtype before they are written
+BUCKET_BLOCK_SIZE = 1 << 16
+
+def sort_fasta_by_subtype(input_fasta_path, output_dir_path, max_open_files=64):
     """
     Sorts sequences from a FASTA file by subtype and writes separate files for each subtype.
-    
+
+    The input is streamed and every record is appended to its subtype file right
+    away, so memory does not grow with the input. At most `max_open_files` subtype
+    files are open at a time; the least recently used one is closed when another
+    one is needed and reopened for appending later. Records without a subtype
+    field in the header are written to unassigned.fasta. The subtype files are
+    collected in temporary files and replace the outputs only once the whole
+    input is sorted; if sorting fails, the temporary files are deleted.
+
     Args:
         input_fasta_path (str or Path): Path to the input FASTA file.
         output_dir_path (str or Path): Path to the output directory.
+        max_open_files (int): Maximum number of subtype files open at the same time.
+    Returns:
+        dict: Number of records written per subtype.
     """
     input_fasta = Path(input_fasta_path)
     output_dir = Path(output_dir_path)
     output_dir.mkdir(exist_ok=True)
 
-    subtype_dict = defaultdict(list)
+    # subtype -> open writer, ordered from least to most recently used
+    writers = OrderedDict()
+    # subtype -> temporary file the records are collected in
+    temp_files = {}
+    counts = {}
+    try:
+        for header, sequence in fastaio.read_fasta(input_fasta):
+            if not sequence:
+                continue
+            match = SUBTYPE_FIELD.search(header)
+            subtype = match.group(1).lower() if match else UNASSIGNED
 
-    with input_fasta.open("r") as infile:
-        header = None
-        seq_lines = []
-        for line in infile:
-            line = line.strip()
-            if line.startswith(">"):
-                if header and seq_lines:
-                    match = re.search(r"\|([^|]+)\|", header)
-                    if match:
-                        subtype = match.group(1).lower()
-                        subtype_dict[subtype].append((header, "".join(seq_lines)))
-                header = line
-                seq_lines = []
+            writer = writers.get(subtype)
+            if writer is None:
+                if len(writers) >= max_open_files:
+                    writers.popitem(last=False)[1].close()
+                if subtype not in temp_files:
+                    temp_files[subtype] = fastaio.temp_path(output_dir / f"{subtype}.fasta")
+                    temp_files[subtype].unlink(missing_ok=True)
+                writer = writers[subtype] = fastaio.FastaWriter(
+                    temp_files[subtype], line_length=None, mode="a", block_size=BUCKET_BLOCK_SIZE
+                )
             else:
-                seq_lines.append(line)
-        if header and seq_lines:
-            match = re.search(r"\|([^|]+)\|", header)
-            if match:
-                subtype = match.group(1).lower()
-                subtype_dict[subtype].append((header, "".join(seq_lines)))
+                writers.move_to_end(subtype)
+            writer.write(header, sequence)
+            counts[subtype] = counts.get(subtype, 0) + 1
+        while writers:
+            writers.popitem()[1].close()
+    except BaseException:
+        for writer in writers.values():
+            writer.discard()
+        for temp_file in temp_files.values():
+            temp_file.unlink(missing_ok=True)
+        raise
+    for subtype, temp_file in temp_files.items():
+        os.replace(temp_file, output_dir / f"{subtype}.fasta")
 
-    for subtype, entries in subtype_dict.items():
-        out_path = output_dir / f"{subtype}.fasta"
-        with out_path.open("w") as out_f:
-            for header, seq in entries:
-                out_f.write(f"{header}\n{seq}\n")
\ No newline at end of file
+    if UNASSIGNED in counts:
+        print(f"{counts[UNASSIGNED]} records without subtype written to {output_dir / (UNASSIGNED + '.fasta')}")
+    return counts